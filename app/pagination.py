@@ -0,0 +1,156 @@
+"""
+Paginação por cursor (keyset) para listagens grandes.
+
+PageNumberPagination faz COUNT(*) a cada requisição e usa OFFSET, que fica mais
+lento quanto mais funda a página. A KeysetPagination ordena por (-<campo>, -id) e
+busca a próxima página com "(campo, id) < (último campo, último id)", usando o
+índice composto correspondente: a página N custa o mesmo que a página 1.
+
+É opcional: OptInKeysetPagination só usa o cursor quando a requisição traz
+?pagination=cursor (primeira página) ou ?cursor=... (páginas seguintes); sem eles
+mantém a paginação por número de página da view.
+"""
+import base64
+import json
+
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação keyset ordenada por (-keyset_field, -id).
+    A view pode trocar o campo com o atributo keyset_field (ex.: 'received_at').
+    """
+    keyset_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field = getattr(view, 'keyset_field', self.keyset_field)
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        descending = (f'-{self.field}', '-id')
+        ascending = (self.field, 'id')
+        queryset = queryset.order_by(*(ascending if reverse else descending))
+        if position is not None:
+            value, pk = position
+            if reverse:
+                condition = Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, 'id__gt': pk})
+            else:
+                condition = Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'id__lt': pk})
+            queryset = queryset.filter(condition)
+
+        # Um item a mais indica se existe outra página naquela direção
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        """Retorna ((valor, id), reverse) do cursor da URL, ou (None, False) na primeira página."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = parse_datetime(data['v'])
+            pk = int(data['id'])
+            if value is None:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk), bool(data.get('r'))
+
+    def encode_cursor(self, obj, reverse):
+        data = {'v': getattr(obj, self.field).isoformat(), 'id': obj.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def keyset_requested(request):
+    """True quando o cliente pediu paginação por cursor (?pagination=cursor ou ?cursor=...)."""
+    return (
+        request.query_params.get('pagination') == 'cursor'
+        or KeysetPagination.cursor_query_param in request.query_params
+    )
+
+
+class OptInKeysetPagination(BasePagination):
+    """
+    Usa KeysetPagination quando pedida (ver keyset_requested) e a paginação por
+    número de página (fallback_class) nos demais casos, inclusive quando a view
+    pagina uma lista já montada em memória.
+    """
+    fallback_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if isinstance(queryset, QuerySet) and keyset_requested(request):
+            self.paginator = KeysetPagination()
+        else:
+            self.paginator = self.fallback_class()
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.fallback_class().get_paginated_response_schema(schema)
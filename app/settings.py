@@ -108,6 +108,54 @@ DATABASES = {
 }
 
 
+# Cache
+# DatabaseCache é compartilhado entre todos os workers, o que garante que a
+# invalidação do catálogo (courses/cache.py) vale para todos os processos.
+# Criar a tabela com: python manage.py createcachetable
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+    }
+}
+
+# Tempo máximo (segundos) das respostas do catálogo público em cache
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '3600'))
+
+# Tempo máximo (segundos) das estatísticas de vendas do admin em cache; mudanças de
+# status das vendas já invalidam antes (ver sales/cache.py)
+SALES_STATISTICS_CACHE_TIMEOUT = int(os.getenv('SALES_STATISTICS_CACHE_TIMEOUT', '300'))
+
+# Idempotency-Key dos checkouts (ver sales/idempotency.py): por quanto tempo (segundos)
+# a resposta fica gravada, quanto uma duplicata simultânea espera pela primeira e
+# depois de quanto tempo uma chave presa em processamento é liberada
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_WAIT_TIMEOUT = int(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '30'))
+IDEMPOTENCY_PROCESSING_TIMEOUT = int(os.getenv('IDEMPOTENCY_PROCESSING_TIMEOUT', '120'))
+
+# Expiração/arquivamento de vendas (python manage.py expire_stale_sales, ver sales/archive.py):
+# pendentes são canceladas N dias após o vencimento do pagamento Asaas e as canceladas
+# há mais de N dias vão para a tabela de vendas arquivadas
+SALE_EXPIRY_GRACE_DAYS = int(os.getenv('SALE_EXPIRY_GRACE_DAYS', '3'))
+SALE_ARCHIVE_AFTER_DAYS = int(os.getenv('SALE_ARCHIVE_AFTER_DAYS', '90'))
+
+# Status de pagamento da página de sucesso (sales.views.get_payment_status): o estado
+# local atualizado há menos de PAYMENT_STATUS_MAX_AGE segundos é usado sem consultar o
+# Asaas; pollers simultâneos do mesmo pagamento aguardam até PAYMENT_STATUS_COALESCE_WAIT
+# segundos pela consulta em andamento
+PAYMENT_STATUS_MAX_AGE = int(os.getenv('PAYMENT_STATUS_MAX_AGE', '15'))
+PAYMENT_STATUS_COALESCE_WAIT = int(os.getenv('PAYMENT_STATUS_COALESCE_WAIT', '3'))
+PAYMENT_STATUS_LOCK_TIMEOUT = int(os.getenv('PAYMENT_STATUS_LOCK_TIMEOUT', '10'))
+# Long-poll (?wait=<s>, ver sales/events.py): espera máxima por requisição (cada uma
+# ocupa um worker síncrono enquanto aguarda) e intervalo de leitura da confirmação
+PAYMENT_STATUS_MAX_WAIT = int(os.getenv('PAYMENT_STATUS_MAX_WAIT', '20'))
+PAYMENT_STATUS_WAIT_INTERVAL = float(os.getenv('PAYMENT_STATUS_WAIT_INTERVAL', '1'))
+
+# Listagem/detalhe públicos de cursos servidos dos snapshots materializados
+# Regerar todos com: python manage.py rebuild_course_snapshots
+COURSE_SNAPSHOTS_ENABLED = os.getenv('COURSE_SNAPSHOTS_ENABLED', 'True') == 'True'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -236,6 +284,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 # CORS Methods
@@ -263,6 +312,20 @@ THEMEMBERS_PLATFORM_ID = os.getenv('THEMEMBERS_PLATFORM_ID', '')
 ASAAS_API_KEY = os.getenv('ASAAS_API_KEY', '')
 ASAAS_ENVIRONMENT = os.getenv('ASAAS_ENVIRONMENT', 'production')  # 'sandbox' ou 'production'
 ASAAS_BASE_URL = 'https://sandbox.asaas.com/api/v3' if ASAAS_ENVIRONMENT == 'sandbox' else 'https://www.asaas.com/api/v3'
+# Cliente HTTP do Asaas (integration_asas/client.py): timeouts (segundos) de conexão e de
+# leitura, retentativas com backoff exponencial das chamadas idempotentes e conexões
+# mantidas abertas por processo
+ASAAS_CONNECT_TIMEOUT = float(os.getenv('ASAAS_CONNECT_TIMEOUT', '3.05'))
+ASAAS_READ_TIMEOUT = float(os.getenv('ASAAS_READ_TIMEOUT', '20'))
+ASAAS_MAX_RETRIES = int(os.getenv('ASAAS_MAX_RETRIES', '3'))
+ASAAS_RETRY_BACKOFF = float(os.getenv('ASAAS_RETRY_BACKOFF', '0.5'))
+ASAAS_POOL_SIZE = int(os.getenv('ASAAS_POOL_SIZE', '10'))
+# Fila de webhooks (python manage.py process_asaas_webhooks, ver integration_asas/webhooks.py):
+# tentativas por webhook, base do backoff exponencial e por quanto tempo um lote
+# reivindicado fica reservado ao worker
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5'))
+WEBHOOK_RETRY_BASE_SECONDS = int(os.getenv('WEBHOOK_RETRY_BASE_SECONDS', '30'))
+WEBHOOK_LEASE_SECONDS = int(os.getenv('WEBHOOK_LEASE_SECONDS', '300'))
 
 # Static files configuration
 
@@ -0,0 +1,17 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+
+class MigrationStateTests(TestCase):
+    """O estado dos modelos de todos os apps precisa bater com as migrations."""
+
+    @override_settings(MIGRATION_MODULES={})
+    def test_model_state_matches_migrations(self):
+        # Índices e campos alterados nos modelos precisam ter migration (e vice-versa)
+        output = io.StringIO()
+        try:
+            call_command('makemigrations', '--check', '--dry-run', stdout=output)
+        except SystemExit:
+            self.fail(f'Modelos divergem das migrations:\n{output.getvalue()}')
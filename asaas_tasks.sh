@@ -0,0 +1,68 @@
+#!/bin/bash
+
+# Script das tarefas periódicas do Asaas e das vendas
+# Use este script em cron jobs (ver SETUP_THEMEMBERS_SYNC.txt, PASSO 4):
+#   asaas_tasks.sh hourly  -> reconciliação dos pagamentos e fila de webhooks (rede de segurança do worker)
+#   asaas_tasks.sh daily   -> expiração/arquivamento das vendas e limpeza das chaves de idempotência
+
+# Configurações
+PROJECT_DIR="/path/to/your/backend_passei"  # Altere para o caminho correto
+LOG_FILE="/var/log/asaas_tasks.log"
+PYTHON_PATH="/usr/bin/python3"  # Altere se necessário
+MODE="${1:-hourly}"
+
+# Função de logging
+log() {
+    echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" >> "$LOG_FILE"
+}
+
+# Executa um comando do Django e registra o resultado
+run() {
+    log "Executando: manage.py $*"
+    if $PYTHON_PATH manage.py "$@" >> "$LOG_FILE" 2>&1; then
+        log "Concluído: manage.py $1"
+    else
+        log "ERRO: Falha em manage.py $1"
+    fi
+}
+
+# Verificar se o diretório do projeto existe
+if [ ! -d "$PROJECT_DIR" ]; then
+    log "ERRO: Diretório do projeto não encontrado: $PROJECT_DIR"
+    exit 1
+fi
+
+# Navegar para o diretório do projeto
+cd "$PROJECT_DIR" || {
+    log "ERRO: Não foi possível navegar para o diretório do projeto"
+    exit 1
+}
+
+# Verificar se o ambiente virtual existe (se usado)
+if [ -d "venv" ]; then
+    source venv/bin/activate
+    log "Ambiente virtual ativado"
+fi
+
+case "$MODE" in
+    hourly)
+        # Pagamentos cujo webhook se perdeu
+        run reconcile_asaas_payments --days 2
+        # Webhooks que ficaram na fila se o worker (always-on) estiver parado
+        run process_asaas_webhooks --once
+        ;;
+    daily)
+        run expire_stale_sales
+        run purge_idempotency_keys
+        ;;
+    *)
+        log "ERRO: Modo desconhecido: $MODE (use hourly ou daily)"
+        exit 1
+        ;;
+esac
+
+# Desativar ambiente virtual se foi ativado
+if [ -n "$VIRTUAL_ENV" ]; then
+    deactivate
+    log "Ambiente virtual desativado"
+fi
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course_reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coursereview',
+            index=models.Index(fields=['-created_at', '-id'], name='review_created_id_idx'),
+        ),
+    ]
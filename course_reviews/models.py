@@ -22,6 +22,10 @@ class CourseReview(models.Model):
         ordering = ['-created_at']
         verbose_name = "Avaliação de Curso"
         verbose_name_plural = "Avaliações de Cursos"
+        indexes = [
+            # Paginação por cursor (-created_at, -id) da listagem admin (app/pagination.py)
+            models.Index(fields=['-created_at', '-id'], name='review_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_name} - {self.course.title} ({self.rating}★)"
@@ -11,6 +11,7 @@ from .serializers import (
     CourseReviewAdminSerializer
 )
 from django.db import models
+from app.pagination import OptInKeysetPagination
 
 # Create your views here.
 
@@ -49,10 +50,14 @@ class CourseReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [AllowAny]
 
 class CourseReviewAdminListView(generics.ListAPIView):
-    """View para administradores listarem todas as avaliações"""
+    """
+    View para administradores listarem todas as avaliações
+    Com ?pagination=cursor, pagina por cursor (-created_at, -id) (ver app/pagination.py)
+    """
     queryset = CourseReview.objects.all()
     serializer_class = CourseReviewAdminSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = OptInKeysetPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['course', 'rating', 'is_approved', 'created_at']
     search_fields = ['user_name', 'user_email', 'title', 'comment', 'course__title']
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        # Invalida o cache do catálogo público quando cursos/relacionados mudam
+        from .signals import connect_catalog_signals
+        connect_catalog_signals()
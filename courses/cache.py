@@ -0,0 +1,158 @@
+"""
+Cache de respostas das views públicas do catálogo (cursos e categorias).
+
+As respostas ficam em cache sob uma "versão do catálogo" global. Qualquer
+alteração em Course, Module, Lesson, Category, Professor ou TheMembersIntegration
+troca a versão (ver courses/signals.py), invalidando de uma vez todas as
+respostas cacheadas sem precisar conhecer suas chaves.
+
+Também expõe ConditionalGetMixin (ETag/Last-Modified/304) para as views públicas
+e as contagens de cursos por categoria em cache (category_course_counts).
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def _new_catalog_state():
+    return {'version': uuid.uuid4().hex, 'modified_at': time.time()}
+
+
+def get_catalog_state():
+    """Retorna a versão atual do catálogo e quando ela foi gerada, criando se não existir."""
+    state = cache.get(CATALOG_VERSION_KEY)
+    if state is None:
+        new_state = _new_catalog_state()
+        # add() evita sobrescrever uma versão criada em paralelo por outro worker
+        cache.add(CATALOG_VERSION_KEY, new_state, timeout=None)
+        state = cache.get(CATALOG_VERSION_KEY) or new_state
+    return state
+
+
+def get_catalog_version():
+    return get_catalog_state()['version']
+
+
+def bump_catalog_version():
+    """Gera uma nova versão do catálogo após o commit da transação atual."""
+    transaction.on_commit(
+        lambda: cache.set(CATALOG_VERSION_KEY, _new_catalog_state(), timeout=None)
+    )
+
+
+def catalog_cache_key(request, prefix='catalog'):
+    """Chave de cache para a requisição (URL completa) na versão atual do catálogo."""
+    url_hash = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'{prefix}:{get_catalog_version()}:{url_hash}'
+
+
+def category_course_counts(active_only=False):
+    """
+    {category_id: número de cursos} contando o vínculo legado (Course.category) e o
+    M2M (Course.categories) sem duplicar cursos, numa única query anotada.
+    Fica em cache na versão atual do catálogo (invalidado junto com ele).
+    active_only conta apenas cursos ativos (listagem pública).
+    """
+    from .models import Category, Course
+
+    key = f"catalog:{get_catalog_version()}:category_counts:{'active' if active_only else 'all'}"
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    courses = Course.objects.filter(Q(category=OuterRef('pk')) | Q(categories=OuterRef('pk')))
+    if active_only:
+        courses = courses.filter(status='active')
+    # COUNT(DISTINCT) correlacionado: o curso vinculado por FK e por M2M conta uma vez
+    total = courses.order_by().annotate(
+        group=Value(1)
+    ).values('group').annotate(total=Count('pk', distinct=True)).values('total')
+
+    counts = dict(Category.objects.order_by().annotate(
+        courses_count=Coalesce(Subquery(total, output_field=IntegerField()), 0)
+    ).values_list('id', 'courses_count'))
+    cache.set(key, counts, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    return counts
+
+
+class CatalogCacheMixin:
+    """
+    Mixin para views GET públicas: serve os dados serializados do cache
+    enquanto a versão do catálogo não mudar.
+    """
+
+    def get(self, request, *args, **kwargs):
+        key = catalog_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag / Last-Modified / 304) para views públicas somente leitura.
+
+    Os validadores vêm de uma única query de agregação (max(updated_at) e número de
+    linhas do queryset filtrado), sem serializar o corpo. Views cujo corpo embute
+    dados de outras tabelas do catálogo (professores, categorias, cursos) definem
+    conditional_uses_catalog = True para incluir também a versão do catálogo.
+    """
+    conditional_uses_catalog = False
+
+    def get_conditional_queryset(self):
+        queryset = self.get_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            return queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.filter_queryset(queryset)
+
+    def get_conditional_validators(self, request):
+        """Retorna (etag, last_modified_timestamp) da requisição."""
+        state = self.get_conditional_queryset().aggregate(
+            last_updated=Max('updated_at'),
+            rows=Count('pk'),
+        )
+        last_updated = state['last_updated']
+        last_modified = last_updated.timestamp() if last_updated else None
+        parts = [
+            request.build_absolute_uri(),
+            str(state['rows']),
+            last_updated.isoformat() if last_updated else '',
+        ]
+        if self.conditional_uses_catalog:
+            catalog = get_catalog_state()
+            parts.append(catalog['version'])
+            last_modified = max(last_modified or 0, catalog['modified_at'])
+
+        etag = 'W/' + quote_etag(hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest())
+        return etag, int(last_modified) if last_modified else None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            # Força o navegador a revalidar (e receber 304) em vez de usar cópia heurística
+            patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,41 @@
+"""
+Comando Django para regerar os snapshots materializados dos cursos
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from courses.snapshots import rebuild_course_snapshots, REBUILD_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Regera os snapshots (listagem/detalhe públicos) de todos os cursos ou dos informados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course-id',
+            type=int,
+            action='append',
+            dest='course_ids',
+            help='ID do curso a regerar (pode ser repetido). Sem ele, regera todos',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help=f'Cursos por transação (padrão: {REBUILD_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+        self.stdout.write(self.style.SUCCESS('🚀 Regerando snapshots de cursos...'))
+
+        total = rebuild_course_snapshots(
+            course_ids=options['course_ids'],
+            batch_size=options['batch_size'],
+        )
+
+        duration = timezone.now() - start_time
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {total} snapshots gerados em {duration.total_seconds():.2f} segundos"
+            )
+        )
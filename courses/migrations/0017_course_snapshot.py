@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:11
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_convert_to_utf8mb4'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSnapshot',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='courses.course', verbose_name='Curso')),
+                ('list_data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dados da Listagem')),
+                ('detail_data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dados do Detalhe')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='Gerado em')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Curso',
+                'verbose_name_plural': 'Snapshots de Cursos',
+            },
+        ),
+    ]
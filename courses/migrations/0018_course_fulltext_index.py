@@ -0,0 +1,29 @@
+# Generated manually for indexed full-text search (courses/search.py)
+
+from django.db import migrations
+
+
+def add_fulltext_index(apps, schema_editor):
+    # FULLTEXT só existe no MySQL; nos demais bancos a busca usa índice em memória
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        "CREATE FULLTEXT INDEX courses_course_search_ft ON courses_course (title, description);"
+    )
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("DROP INDEX courses_course_search_ft ON courses_course;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_course_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.21 on 2026-10-17 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_course_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='benefits',
+            field=models.TextField(blank=True, null=True, verbose_name='Benefícios'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='requirements',
+            field=models.TextField(blank=True, null=True, verbose_name='Requisitos'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 from professors.models import Professor
@@ -94,12 +95,17 @@ class Course(models.Model):
     def get_themembers_product_ids(self):
         """Retorna a lista de product_ids vinculados ao curso (via integrações + legado)."""
         try:
-            from themembers.models import TheMembersIntegration
-            ids = list(
-                TheMembersIntegration.objects.filter(course=self).values_list(
-                    'product__product_id', flat=True
+            prefetched = getattr(self, '_prefetched_objects_cache', {})
+            if 'themembersintegration_set' in prefetched:
+                # Integrações já carregadas via prefetch_related (sem query extra)
+                ids = [i.product.product_id for i in self.themembersintegration_set.all()]
+            else:
+                from themembers.models import TheMembersIntegration
+                ids = list(
+                    TheMembersIntegration.objects.filter(course=self).values_list(
+                        'product__product_id', flat=True
+                    )
                 )
-            )
         except Exception:
             ids = []
         if not ids and self.themembers_product_id:
@@ -141,3 +147,22 @@ class Lesson(models.Model):
     
     def __str__(self):
         return f"{self.module.title} - {self.title}"
+
+
+class CourseSnapshot(models.Model):
+    """
+    Cartão do curso pré-serializado para as views públicas.
+    Guarda o JSON da listagem e do detalhe, regerado sempre que o curso ou algo
+    que ele embute muda (ver courses/snapshots.py).
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='snapshot', verbose_name='Curso')
+    list_data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='Dados da Listagem')
+    detail_data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='Dados do Detalhe')
+    built_at = models.DateTimeField(auto_now=True, verbose_name='Gerado em')
+
+    class Meta:
+        verbose_name = 'Snapshot de Curso'
+        verbose_name_plural = 'Snapshots de Cursos'
+
+    def __str__(self):
+        return f"Snapshot {self.course_id}"
@@ -0,0 +1,162 @@
+"""
+Busca textual indexada para as listagens públicas (cursos, notícias, depoimentos).
+
+Substitui o SearchFilter (LIKE '%termo%' sobre colunas TEXT, sem índice) por:
+- MySQL: índice FULLTEXT sobre os search_fields da view e MATCH ... AGAINST em
+  BOOLEAN MODE (todos os termos obrigatórios, casando por prefixo). A collation
+  utf8mb4_unicode_ci das tabelas torna a comparação insensível a acentos.
+- Demais bancos (SQLite local/testes): índice invertido em memória por modelo,
+  com os mesmos termos normalizados (minúsculas, sem acentos) e ranking TF-IDF.
+
+Sem ?ordering= explícito, os resultados vêm ordenados por relevância.
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import BooleanField, Case, Count, FloatField, Max, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+# Igual ao innodb_ft_min_token_size padrão: termos menores não são indexados no MySQL
+MIN_TERM_LENGTH = 3
+
+TOKEN_RE = re.compile(r'\w+')
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize(text):
+    """Minúsculas e sem acentos ("Educação" -> "educacao")."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class InvertedIndex:
+    """Índice invertido termo -> {pk: peso} com busca por prefixo e ranking TF-IDF."""
+
+    def __init__(self, rows, weights):
+        self.postings = defaultdict(lambda: defaultdict(float))
+        self.doc_count = 0
+        for pk, *values in rows:
+            self.doc_count += 1
+            for weight, value in zip(weights, values):
+                for token in tokenize(value):
+                    self.postings[token][pk] += weight
+        self.tokens = sorted(self.postings)
+
+    def _prefixed(self, term):
+        position = bisect_left(self.tokens, term)
+        while position < len(self.tokens) and self.tokens[position].startswith(term):
+            yield self.tokens[position]
+            position += 1
+
+    def search(self, terms):
+        """Retorna {pk: score} dos documentos que contêm todos os termos."""
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for token in self._prefixed(term):
+                postings = self.postings[token]
+                idf = math.log(1 + self.doc_count / len(postings))
+                for pk, weight in postings.items():
+                    term_scores[pk] += (1 + math.log(weight)) * idf
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+            if not scores:
+                return {}
+        return scores or {}
+
+
+def get_inverted_index(model, fields, weights):
+    """
+    Índice do modelo inteiro, reaproveitado entre requisições enquanto a tabela não
+    mudar (mesmo número de linhas e mesmo max(updated_at)).
+    """
+    stamp = model._default_manager.aggregate(rows=Count('pk'), last_updated=Max('updated_at'))
+    stamp = (stamp['rows'], stamp['last_updated'])
+    key = (model._meta.label, fields, weights)
+
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    rows = model._default_manager.order_by().values_list('pk', *fields).iterator()
+    index = InvertedIndex(rows, weights)
+    with _indexes_lock:
+        _indexes[key] = (stamp, index)
+    return index
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter com índice textual. Usa os search_fields da view (que no MySQL
+    devem corresponder exatamente a um índice FULLTEXT) e o peso opcional de cada
+    campo em search_weights (padrão 1) no ranking em memória.
+    Deve vir depois do OrderingFilter em filter_backends para ordenar por relevância.
+    """
+
+    def get_search_terms(self, request):
+        terms = []
+        for term in super().get_search_terms(request):
+            terms.extend(token for token in tokenize(term) if len(token) >= MIN_TERM_LENGTH)
+        return terms
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        if not search_fields or not super().get_search_terms(request):
+            return queryset
+
+        terms = self.get_search_terms(request)
+        if not terms:
+            # Só termos curtos (não indexáveis): mantém o comportamento do SearchFilter
+            return super().filter_queryset(request, queryset, view)
+
+        fields = tuple(search_fields)
+        if connections[queryset.db].vendor == 'mysql':
+            queryset = self._mysql_search(queryset, fields, terms)
+        else:
+            weights = tuple(getattr(view, 'search_weights', {}).get(field, 1) for field in fields)
+            queryset = self._inverted_index_search(queryset, fields, weights, terms)
+
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+            queryset = queryset.order_by('-search_rank', *ordering)
+        return queryset
+
+    @staticmethod
+    def _mysql_search(queryset, fields, terms):
+        quote_name = connections[queryset.db].ops.quote_name
+        table = quote_name(queryset.model._meta.db_table)
+        columns = ', '.join(
+            f'{table}.{quote_name(queryset.model._meta.get_field(field).column)}' for field in fields
+        )
+        match = f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)'
+        against = ' '.join(f'+{term}*' for term in terms)
+        return queryset.filter(
+            RawSQL(match, [against], output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(match, [against], output_field=FloatField()))
+
+    @staticmethod
+    def _inverted_index_search(queryset, fields, weights, terms):
+        scores = get_inverted_index(queryset.model, fields, weights).search(terms)
+        if not scores:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset.filter(pk__in=scores).annotate(search_rank=Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
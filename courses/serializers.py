@@ -1,14 +1,26 @@
 from rest_framework import serializers
 import re
 from .models import Course, Module, Lesson, Category
-from professors.serializers import ProfessorSerializer
+from professors.serializers import ProfessorSerializer, CoursesCountMixin
 from professors.models import Professor
 from django.utils.text import slugify
+from django.db.models import Count, Prefetch
 from themembers.models import TheMembersProduct, TheMembersIntegration
 import json
+from functools import lru_cache
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategoryCoursesCountMixin(CoursesCountMixin):
+    """Nas listagens de categorias, usa as contagens em cache (FK + M2M, ver category_course_counts)"""
+
+    def get_courses_count(self, obj):
+        counts = self.context.get('category_courses_counts')
+        if counts is not None:
+            return counts.get(obj.id, 0)
+        return super().get_courses_count(obj)
+
+
+class CategorySerializer(CategoryCoursesCountMixin, serializers.ModelSerializer):
     # Torna o slug opcional para permitir geração automática
     slug = serializers.CharField(required=False, allow_blank=True)
     courses_count = serializers.SerializerMethodField()
@@ -17,9 +29,6 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = '__all__'
     
-    def get_courses_count(self, obj):
-        return obj.course_set.count()
-    
     def create(self, validated_data):
         # Gerar slug automaticamente se não fornecido
         if 'slug' not in validated_data or not validated_data['slug']:
@@ -33,15 +42,12 @@ class CategorySerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class CategoryPublicSerializer(serializers.ModelSerializer):
+class CategoryPublicSerializer(CategoryCoursesCountMixin, serializers.ModelSerializer):
     courses_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'slug', 'color', 'icon', 'is_active', 'courses_count']
-    
-    def get_courses_count(self, obj):
-        return obj.course_set.count()
 
 
 class LessonSerializer(serializers.ModelSerializer):
@@ -327,7 +333,147 @@ class CourseListSerializer(serializers.ModelSerializer):
         ]
 
 
-class CoursePublicListSerializer(serializers.ModelSerializer):
+@lru_cache(maxsize=2048)
+def _split_comma_list(value):
+    return tuple(item.strip() for item in value.split(','))
+
+
+def split_comma_list(value):
+    """
+    Lista de tópicos/benefícios/requisitos guardada como texto separado por vírgula.
+    O resultado fica em cache por conteúdo: o mesmo texto não é re-dividido a cada requisição.
+    """
+    if not value:
+        return []
+    return list(_split_comma_list(value))
+
+
+# Colunas lidas pela árvore pública (ModulePublicSerializer / LessonPublicSerializer)
+PUBLIC_MODULE_COLUMNS = ('id', 'course_id', 'title', 'lessons_count', 'duration', 'order', 'topics')
+PUBLIC_LESSON_COLUMNS = ('id', 'module_id', 'title', 'duration', 'order', 'is_free', 'video_url')
+
+
+def with_course_tree(queryset):
+    """
+    Carrega a árvore módulo -> aulas dos cursos em duas queries (uma por nível),
+    só com as colunas da árvore pública (sem descrições).
+    """
+    return queryset.prefetch_related(
+        Prefetch('modules', queryset=Module.objects.only(*PUBLIC_MODULE_COLUMNS).prefetch_related(
+            Prefetch('lessons', queryset=Lesson.objects.only(*PUBLIC_LESSON_COLUMNS))
+        )),
+    )
+
+
+class SparseFieldsetMixin:
+    """
+    Permite restringir os campos do serializer (?fields=a,b nas views públicas).
+    Campos desconhecidos são ignorados.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+# Colunas de Course lidas pelos campos calculados dos serializers públicos
+COMPUTED_FIELD_COLUMNS = {
+    'benefits_list': ['benefits'],
+    'requirements_list': ['requirements'],
+    'themembers_product_ids': ['themembers_product_id'],
+}
+
+
+def serializer_columns(serializer):
+    """Colunas do modelo efetivamente lidas pelo serializer (para .only())."""
+    model = serializer.Meta.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    columns = {model._meta.pk.name}
+    for name, field in serializer.fields.items():
+        source = name if field.source == '*' else field.source.split('.')[0]
+        if source in concrete:
+            columns.add(source)
+        columns.update(COMPUTED_FIELD_COLUMNS.get(name, []))
+    return sorted(columns)
+
+
+def _relation_queryset(model, nested=None):
+    queryset = model.objects.all()
+    if nested is None or 'courses_count' in nested.fields:
+        queryset = queryset.annotate(courses_count=Count('course', distinct=True))
+    if nested is not None:
+        queryset = queryset.only(*serializer_columns(nested))
+    return queryset
+
+
+def with_public_relations(queryset, serializer=None):
+    """
+    Carrega professores, categorias e produtos TheMembers de uma lista de cursos
+    com um número fixo de queries, independente do tamanho da página.
+    As contagens de cursos vêm anotadas (courses_count) para os serializers aninhados.
+
+    Com serializer (projeções/?fields= das views públicas), lê apenas as colunas e
+    relações que ele usa: colunas TEXT não pedidas nem chegam a ser lidas.
+    """
+    fields = serializer.fields if serializer is not None else None
+    lookups = []
+    for name, model in (
+        ('professor', Professor), ('professors', Professor),
+        ('category', Category), ('categories', Category),
+    ):
+        if fields is None:
+            lookups.append(Prefetch(name, queryset=_relation_queryset(model)))
+        elif name in fields:
+            nested = getattr(fields[name], 'child', fields[name])
+            lookups.append(Prefetch(name, queryset=_relation_queryset(model, nested)))
+    if fields is None or 'themembers_product_ids' in fields:
+        lookups.append(Prefetch(
+            'themembersintegration_set',
+            queryset=TheMembersIntegration.objects.select_related('product'),
+        ))
+    if fields is not None:
+        queryset = queryset.only(*serializer_columns(serializer))
+    return queryset.prefetch_related(*lookups)
+
+
+class ProfessorCardSerializer(serializers.ModelSerializer):
+    """Professor resumido para os cartões de curso (sem biografia)"""
+    class Meta:
+        model = Professor
+        fields = ['id', 'name', 'image']
+
+
+class CategoryCardSerializer(serializers.ModelSerializer):
+    """Categoria resumida para os cartões de curso"""
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'color', 'icon']
+
+
+class CourseCardSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Projeção "card" (?view=card) das views públicas de cursos:
+    só o necessário para os cartões, sem textos longos nem cópias M2M
+    """
+    professor = ProfessorCardSerializer(read_only=True)
+    category = CategoryCardSerializer(read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    original_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+    class Meta:
+        model = Course
+        fields = [
+            'id', 'title', 'description', 'price', 'original_price', 'duration',
+            'students_count', 'rating', 'reviews_count', 'professor', 'category',
+            'course_image', 'status', 'created_at',
+            'is_bestseller', 'is_complete', 'is_new', 'is_featured',
+        ]
+
+
+class CoursePublicListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer para listagem pública de cursos
     Inclui o professor completo para o frontend
@@ -362,21 +508,34 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     original_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
 
 
+class LessonPublicSerializer(serializers.ModelSerializer):
+    """
+    Aula na árvore pública do curso (detalhe e snapshot, acesso anônimo).
+    A URL do vídeo só é exposta nas aulas gratuitas: as pagas ficam na área do aluno.
+    """
+    video_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'duration', 'order', 'is_free', 'video_url']
+
+    def get_video_url(self, obj):
+        return obj.video_url if obj.is_free else None
+
+
 class ModulePublicSerializer(serializers.ModelSerializer):
     """Serializer público de Módulo com lista de tópicos"""
-    lessons = LessonSerializer(many=True, read_only=True)
+    lessons = LessonPublicSerializer(many=True, read_only=True)
     topics_list = serializers.SerializerMethodField()
 
     class Meta:
         model = Module
-        fields = ['id', 'title', 'lessons_count', 'duration', 'order', 'topics_list']
+        fields = ['id', 'title', 'lessons_count', 'duration', 'order', 'topics_list', 'lessons']
 
     def get_topics_list(self, obj):
-        if obj.topics:
-            return [t.strip() for t in obj.topics.split(',')]
-        return []
+        return split_comma_list(obj.topics)
 
-class CoursePublicDetailSerializer(serializers.ModelSerializer):
+class CoursePublicDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer público de detalhes de curso"""
     professor = ProfessorSerializer(read_only=True)
     professors = ProfessorSerializer(many=True, read_only=True)
@@ -403,19 +562,42 @@ class CoursePublicDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_benefits_list(self, obj):
-        if obj.benefits:
-            return [b.strip() for b in obj.benefits.split(',')]
-        return []
+        return split_comma_list(obj.benefits)
 
     def get_requirements_list(self, obj):
-        if obj.requirements:
-            return [r.strip() for r in obj.requirements.split(',')]
-        return [] 
+        return split_comma_list(obj.requirements)
 
     def get_themembers_product_ids(self, obj):
         return obj.get_themembers_product_ids()
 
 
+class LessonTreeSerializer(serializers.ModelSerializer):
+    """Aula dentro da árvore de conteúdo (sem id cria, com id atualiza)"""
+    id = serializers.IntegerField(required=False)
+    order = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Lesson
+        fields = ['id', 'title', 'description', 'video_url', 'duration', 'order', 'is_free']
+
+
+class ModuleTreeSerializer(serializers.ModelSerializer):
+    """Módulo dentro da árvore de conteúdo, com as aulas aninhadas (opcionais)"""
+    id = serializers.IntegerField(required=False)
+    order = serializers.IntegerField(required=False)
+    lessons = LessonTreeSerializer(many=True, required=False)
+
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'description', 'lessons_count', 'duration', 'order', 'topics', 'lessons']
+        read_only_fields = ['lessons_count']
+
+
+class CourseContentTreeSerializer(serializers.Serializer):
+    """Árvore completa de módulos/aulas de um curso (ver CourseContentService)"""
+    modules = ModuleTreeSerializer(many=True)
+
+
 class ModuleCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer para criação/atualização de módulos (admin)"""
     class Meta:
@@ -0,0 +1,122 @@
+"""
+Serviços de conteúdo dos cursos (módulos e aulas)
+"""
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_catalog_version
+from .models import Course, Module, Lesson
+from .signals import catalog_signals_suppressed
+from .snapshots import schedule_snapshot_rebuild
+
+MODULE_FIELDS = ['title', 'description', 'duration', 'order', 'topics', 'lessons_count']
+LESSON_FIELDS = ['module', 'title', 'description', 'video_url', 'duration', 'order', 'is_free']
+
+
+class CourseContentService:
+    """
+    Aplica a árvore completa de módulos/aulas de um curso numa única transação:
+    bulk_create dos novos, bulk_update dos existentes e delete dos que sumiram.
+    A posição na lista define o order quando ele não é informado.
+    """
+
+    def __init__(self, course):
+        self.course = course
+
+    def apply_tree(self, modules_data):
+        """
+        modules_data: lista validada de módulos, cada um com "lessons" opcional.
+        Módulos fora da lista são excluídos; as aulas só são sincronizadas nos
+        módulos que trazem "lessons" (sem a chave, ficam como estão).
+        Retorna os módulos do curso com as aulas pré-carregadas.
+        """
+        with transaction.atomic(), catalog_signals_suppressed():
+            # Serializa edições concorrentes da árvore do mesmo curso
+            Course.objects.select_for_update().only('id').get(pk=self.course.pk)
+
+            existing_modules = Module.objects.filter(course=self.course).in_bulk()
+            existing_lessons = Lesson.objects.filter(module__course=self.course).in_bulk()
+            self._validate_ids(modules_data, existing_modules, existing_lessons)
+
+            modules = self._save_modules(modules_data, existing_modules)
+            self._save_lessons(modules_data, modules, existing_lessons)
+            # Só depois de mover as aulas: o cascade levaria junto as que mudaram de módulo
+            Module.objects.filter(course=self.course).exclude(
+                pk__in=[module.pk for module in modules]
+            ).delete()
+
+            # bulk_* não disparam sinais: invalida o catálogo e regera o snapshot aqui
+            bump_catalog_version()
+            schedule_snapshot_rebuild([self.course.pk])
+
+        return Module.objects.filter(course=self.course).prefetch_related('lessons')
+
+    def _validate_ids(self, modules_data, existing_modules, existing_lessons):
+        errors = []
+        seen_modules, seen_lessons = set(), set()
+        for module_data in modules_data:
+            module_id = module_data.get('id')
+            if module_id and (module_id not in existing_modules or module_id in seen_modules):
+                errors.append(f"Módulo {module_id} inválido ou repetido para este curso")
+            seen_modules.add(module_id)
+            for lesson_data in module_data.get('lessons') or []:
+                lesson_id = lesson_data.get('id')
+                if lesson_id and (lesson_id not in existing_lessons or lesson_id in seen_lessons):
+                    errors.append(f"Aula {lesson_id} inválida ou repetida para este curso")
+                seen_lessons.add(lesson_id)
+        if errors:
+            raise ValidationError({'modules': errors})
+
+    def _save_modules(self, modules_data, existing_modules):
+        """Retorna os módulos na ordem do payload (novos já com pk)."""
+        modules, to_create, to_update = [], [], []
+        for position, data in enumerate(modules_data):
+            module = existing_modules.get(data.get('id')) or Module(course=self.course)
+            for field in ('title', 'description', 'duration', 'topics'):
+                if field in data:
+                    setattr(module, field, data[field])
+            module.order = data.get('order', position)
+            if data.get('lessons') is not None:
+                module.lessons_count = len(data['lessons'])
+            modules.append(module)
+            (to_update if module.pk else to_create).append(module)
+
+        if to_update:
+            Module.objects.bulk_update(to_update, MODULE_FIELDS)
+        if to_create:
+            Module.objects.bulk_create(to_create)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                # MySQL não devolve os ids do bulk_create: busca os recém-criados (ids crescentes)
+                created_ids = Module.objects.filter(course=self.course).exclude(
+                    pk__in=list(existing_modules)
+                ).order_by('pk').values_list('pk', flat=True)
+                for module, pk in zip(to_create, created_ids):
+                    module.pk = pk
+        return modules
+
+    def _save_lessons(self, modules_data, modules, existing_lessons):
+        to_create, to_update, kept_ids = [], [], set()
+        synced_module_ids = set()
+        for module, data in zip(modules, modules_data):
+            if data.get('lessons') is None:
+                continue
+            synced_module_ids.add(module.pk)
+            for position, lesson_data in enumerate(data['lessons']):
+                lesson = existing_lessons.get(lesson_data.get('id')) or Lesson()
+                for field in ('title', 'description', 'video_url', 'duration', 'is_free'):
+                    if field in lesson_data:
+                        setattr(lesson, field, lesson_data[field])
+                lesson.module = module
+                lesson.order = lesson_data.get('order', position)
+                if lesson.pk:
+                    kept_ids.add(lesson.pk)
+                    to_update.append(lesson)
+                else:
+                    to_create.append(lesson)
+
+        # Aulas removidas dos módulos sincronizados (as movidas continuam em kept_ids)
+        Lesson.objects.filter(module_id__in=synced_module_ids).exclude(pk__in=kept_ids).delete()
+        if to_update:
+            Lesson.objects.bulk_update(to_update, LESSON_FIELDS)
+        if to_create:
+            Lesson.objects.bulk_create(to_create)
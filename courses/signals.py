@@ -0,0 +1,125 @@
+"""
+Sinais que invalidam o cache do catálogo público (ver courses/cache.py)
+e regeram os snapshots dos cursos afetados (ver courses/snapshots.py).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+
+from professors.models import Professor
+from themembers.models import TheMembersIntegration
+from .cache import bump_catalog_version
+from .models import Course, Module, Lesson, Category
+from .snapshots import schedule_snapshot_rebuild, courses_linked_to
+
+CATALOG_MODELS = (Course, Module, Lesson, Category, Professor, TheMembersIntegration)
+
+_state = threading.local()
+
+
+@contextmanager
+def catalog_signals_suppressed():
+    """
+    Desliga os receptores abaixo na thread atual durante operações em lote: quem usa
+    deve invalidar o catálogo e regerar os snapshots explicitamente ao final
+    (bulk_create/bulk_update nem disparam sinais, e os deletes disparariam um por linha).
+    """
+    previous = getattr(_state, 'suppressed', False)
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+def _suppressed():
+    return getattr(_state, 'suppressed', False)
+
+
+def invalidate_catalog(sender, **kwargs):
+    if _suppressed():
+        return
+    bump_catalog_version()
+
+
+def invalidate_catalog_m2m(sender, action, **kwargs):
+    if _suppressed():
+        return
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
+
+
+def _affected_course_ids(instance):
+    """Cursos cujo snapshot embute a instância (professor/categoria entram via courses_count)."""
+    if isinstance(instance, Course):
+        professor_ids = [instance.professor_id] + list(getattr(instance, '_snapshot_old_links', {}).get('professor', []))
+        category_ids = [instance.category_id] + list(getattr(instance, '_snapshot_old_links', {}).get('category', []))
+        return courses_linked_to(
+            professor_ids=[i for i in professor_ids if i],
+            category_ids=[i for i in category_ids if i],
+        ) | {instance.pk}
+    if isinstance(instance, Professor):
+        return courses_linked_to(professor_ids=[instance.pk])
+    if isinstance(instance, Category):
+        return courses_linked_to(category_ids=[instance.pk])
+    if isinstance(instance, (Module, TheMembersIntegration)):
+        return {instance.course_id}
+    if isinstance(instance, Lesson):
+        return set(Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True))
+    return set()
+
+
+def remember_course_links(sender, instance, **kwargs):
+    """Guarda professor/categoria anteriores: a troca muda o courses_count de outros cursos."""
+    if _suppressed():
+        return
+    if instance.pk:
+        old = Course.objects.filter(pk=instance.pk).values('professor_id', 'category_id').first()
+        if old:
+            instance._snapshot_old_links = {
+                'professor': [old['professor_id']],
+                'category': [old['category_id']],
+            }
+
+
+def rebuild_snapshots_on_save(sender, instance, **kwargs):
+    if _suppressed():
+        return
+    schedule_snapshot_rebuild(_affected_course_ids(instance))
+
+
+def rebuild_snapshots_on_delete(sender, instance, **kwargs):
+    if _suppressed():
+        return
+    # pre_delete: os vínculos ainda existem para descobrir os cursos afetados
+    affected = _affected_course_ids(instance)
+    if isinstance(instance, Course):
+        affected.discard(instance.pk)
+    schedule_snapshot_rebuild(affected)
+
+
+def rebuild_snapshots_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if _suppressed():
+        return
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        affected = {instance.pk}
+    elif action == 'pre_clear':
+        affected = set(instance.courses.values_list('id', flat=True))
+    else:
+        affected = set(pk_set or ())
+    schedule_snapshot_rebuild(affected)
+
+
+def connect_catalog_signals():
+    for model in CATALOG_MODELS:
+        post_save.connect(invalidate_catalog, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+        post_delete.connect(invalidate_catalog, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+        post_save.connect(rebuild_snapshots_on_save, sender=model, dispatch_uid=f'snapshot_save_{model.__name__}')
+        pre_delete.connect(rebuild_snapshots_on_delete, sender=model, dispatch_uid=f'snapshot_delete_{model.__name__}')
+    pre_save.connect(remember_course_links, sender=Course, dispatch_uid='snapshot_course_links')
+    for through in (Course.professors.through, Course.categories.through):
+        m2m_changed.connect(invalidate_catalog_m2m, sender=through, dispatch_uid=f'catalog_m2m_{through.__name__}')
+        m2m_changed.connect(rebuild_snapshots_m2m, sender=through, dispatch_uid=f'snapshot_m2m_{through.__name__}')
@@ -0,0 +1,136 @@
+"""
+Snapshots materializados dos cartões de curso (ver CourseSnapshot).
+
+O JSON da listagem e do detalhe público é gerado pelos mesmos serializers das
+views e guardado por curso. As views públicas servem esses snapshots com uma
+única query (Course JOIN CourseSnapshot), e os sinais em courses/signals.py
+regeram os snapshots afetados após o commit de qualquer alteração.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import bump_catalog_version
+from .models import Course, CourseSnapshot
+from .serializers import (
+    CoursePublicListSerializer, CoursePublicDetailSerializer, with_public_relations, with_course_tree
+)
+
+# Campos de arquivo serializados como URL relativa no snapshot
+MEDIA_FIELDS = ('course_image', 'course_video')
+NESTED_MEDIA_FIELDS = {'professor': ('image',), 'professors': ('image',)}
+
+REBUILD_BATCH_SIZE = 200
+
+
+def snapshots_enabled():
+    return getattr(settings, 'COURSE_SNAPSHOTS_ENABLED', True)
+
+
+def _snapshot_queryset(course_ids=None):
+    queryset = Course.objects.all()
+    if course_ids is not None:
+        queryset = queryset.filter(id__in=course_ids)
+    return with_course_tree(with_public_relations(queryset))
+
+
+def build_snapshots(courses):
+    """Serializa os cursos (sem request, URLs de mídia relativas) em CourseSnapshot não salvos."""
+    courses = list(courses)
+    list_data = CoursePublicListSerializer(courses, many=True).data
+    detail_data = CoursePublicDetailSerializer(courses, many=True).data
+    return [
+        CourseSnapshot(course=course, list_data=list_item, detail_data=detail_item)
+        for course, list_item, detail_item in zip(courses, list_data, detail_data)
+    ]
+
+
+def rebuild_course_snapshots(course_ids=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Regera os snapshots dos cursos informados (ou de todos) em lote e numa transação.
+    Retorna o número de snapshots gravados.
+    """
+    if course_ids is not None:
+        course_ids = list(set(course_ids))
+        if not course_ids:
+            return 0
+        batches = [course_ids[i:i + batch_size] for i in range(0, len(course_ids), batch_size)]
+    else:
+        all_ids = list(Course.objects.order_by('id').values_list('id', flat=True))
+        batches = [all_ids[i:i + batch_size] for i in range(0, len(all_ids), batch_size)]
+
+    total = 0
+    for batch in batches:
+        with transaction.atomic():
+            snapshots = build_snapshots(_snapshot_queryset(batch))
+            CourseSnapshot.objects.filter(course_id__in=batch).delete()
+            CourseSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+        total += len(snapshots)
+
+    # bulk_create/delete não disparam sinais: invalida o cache de respostas depois
+    # de gravar, para nenhuma resposta ficar em cache com o snapshot antigo
+    if total:
+        bump_catalog_version()
+    return total
+
+
+def schedule_snapshot_rebuild(course_ids):
+    """Agenda a regeração dos snapshots para depois do commit da transação atual."""
+    course_ids = set(course_ids)
+    if course_ids and snapshots_enabled():
+        transaction.on_commit(lambda: rebuild_course_snapshots(course_ids))
+
+
+def courses_linked_to(professor_ids=(), category_ids=()):
+    """IDs dos cursos que embutem os professores/categorias informados."""
+    condition = Q(pk__in=[])
+    if professor_ids:
+        condition |= Q(professor_id__in=professor_ids) | Q(professors__in=professor_ids)
+    if category_ids:
+        condition |= Q(category_id__in=category_ids) | Q(categories__in=category_ids)
+    return set(Course.objects.filter(condition).values_list('id', flat=True))
+
+
+def snapshot_payload(courses, field, request):
+    """
+    Retorna o JSON (list_data ou detail_data) de cada curso. Os cursos devem vir com
+    select_related('snapshot'). Os que ainda não têm snapshot são serializados na hora
+    sem gravar nada: a leitura não regera snapshots nem invalida o cache do catálogo
+    (isso fica com os sinais e o comando rebuild_course_snapshots).
+    """
+    missing = [course.id for course in courses if not _has_snapshot(course)]
+    built = {}
+    if missing:
+        built = {snapshot.course_id: snapshot for snapshot in build_snapshots(_snapshot_queryset(missing))}
+
+    payload = []
+    for course in courses:
+        snapshot = built[course.id] if course.id in built else course.snapshot
+        payload.append(absolute_media_urls(getattr(snapshot, field), request))
+    return payload
+
+
+def _has_snapshot(course):
+    try:
+        return course.snapshot is not None
+    except CourseSnapshot.DoesNotExist:
+        return False
+
+
+def absolute_media_urls(data, request):
+    """Converte as URLs de mídia relativas do snapshot em absolutas (como os serializers fazem)."""
+    def absolute(url):
+        if url and url.startswith('/'):
+            return request.build_absolute_uri(url)
+        return url
+
+    for field in MEDIA_FIELDS:
+        if field in data:
+            data[field] = absolute(data[field])
+    for key, fields in NESTED_MEDIA_FIELDS.items():
+        nested = data.get(key)
+        for item in (nested if isinstance(nested, list) else [nested] if nested else []):
+            for field in fields:
+                if field in item:
+                    item[field] = absolute(item[field])
+    return data
@@ -1,3 +1,618 @@
-from django.test import TestCase
+from django.db import connection
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from professors.models import Professor
+from themembers.models import TheMembersProduct, TheMembersIntegration
+from .cache import get_catalog_version
+from .models import Course, Category, CourseSnapshot, Module, Lesson
+
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+# Sem cache de resposta nem snapshots: mede apenas as queries do ORM/serialização
+@override_settings(CACHES=NO_CACHE, COURSE_SNAPSHOTS_ENABLED=False)
+class CourseListQueryCountTests(TestCase):
+    """Garante que a listagem pública de cursos não sofre de N+1 queries."""
+
+    def _create_course(self, index, extra_links=0):
+        professor = Professor.objects.create(
+            name=f'Professor {index}', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        category = Category.objects.create(name=f'Categoria {index}', slug=f'categoria-{index}')
+        course = Course.objects.create(
+            title=f'Curso {index}', description='Descrição', price=100, duration='10h',
+            professor=professor, category=category, status='active',
+        )
+        course.professors.add(professor)
+        course.categories.add(category)
+        for extra in range(extra_links):
+            course.professors.add(Professor.objects.create(
+                name=f'Professor {index}-{extra}', bio='Bio', specialties='Direito', experience='1 ano'
+            ))
+            course.categories.add(Category.objects.create(
+                name=f'Categoria {index}-{extra}', slug=f'categoria-{index}-{extra}'
+            ))
+            product = TheMembersProduct.objects.create(
+                product_id=f'prod-{index}-{extra}', title=f'Produto {index}-{extra}', price=0
+            )
+            TheMembersIntegration.objects.create(course=course, product=product, status='active')
+        return course
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/courses/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_query_count_is_constant(self):
+        self._create_course(0)
+        baseline, _ = self._count_list_queries()
+
+        for index in range(1, 10):
+            self._create_course(index, extra_links=3)
+        grown, data = self._count_list_queries()
+
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(baseline, grown)
+
+    def test_nested_counts_and_product_ids(self):
+        course = self._create_course(0, extra_links=2)
+        Course.objects.create(
+            title='Rascunho', description='Descrição', price=50, duration='1h',
+            professor=course.professor, category=course.category, status='draft',
+        )
+
+        _, data = self._count_list_queries()
+        item = data['results'][0]
+
+        # Contagens seguem o relacionamento principal (FK), incluindo todos os status
+        self.assertEqual(item['professor']['courses_count'], 2)
+        self.assertEqual(item['category']['courses_count'], 2)
+        self.assertEqual(len(item['professors']), 3)
+        self.assertEqual(len(item['categories']), 3)
+        self.assertEqual(sorted(item['themembers_product_ids']), ['prod-0-0', 'prod-0-1'])
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'}}
+
+
+# Sem snapshots: o que chega do banco depende só do cache de respostas
+@override_settings(CACHES=LOCMEM_CACHE, COURSE_SNAPSHOTS_ENABLED=False)
+class CatalogCacheTests(TestCase):
+    """Respostas públicas do catálogo em cache até os sinais trocarem a versão."""
+
+    def setUp(self):
+        cache.clear()
+        self.professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        self.category = Category.objects.create(name='Categoria', slug='categoria')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = Course.objects.create(
+                title='Curso', description='Descrição', price=100, duration='10h',
+                professor=self.professor, category=self.category, status='active',
+            )
+            self.module = Module.objects.create(course=self.course, title='Módulo', description='d', duration='1h')
+            self.lesson = Lesson.objects.create(
+                module=self.module, title='Aula', description='d', video_url='https://example.com/v', duration='10min',
+            )
+        self.detail_url = f'/api/v1/courses/{self.course.id}/'
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_second_get_is_served_from_cache(self):
+        for url in ('/api/v1/courses/', self.detail_url, '/api/v1/categories/'):
+            first, first_queries = self._get(url)
+            second, second_queries = self._get(url)
+            self.assertEqual(first, second)
+            # Só a agregação dos validadores do GET condicional vai ao banco
+            self.assertEqual(second_queries, 1)
+            self.assertLess(second_queries, first_queries)
+
+        # update() não dispara sinais: a resposta em cache continua valendo
+        Course.objects.filter(pk=self.course.pk).update(title='Sem sinal')
+        self.assertEqual(self._get(self.detail_url)[0]['title'], 'Curso')
+
+    def _assert_save_refreshes(self, instance, field, value, read):
+        self._get(self.detail_url)
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            setattr(instance, field, value)
+            instance.save()
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(read(self._get(self.detail_url)[0]), value)
+
+    def test_course_save_bumps_version(self):
+        self._assert_save_refreshes(self.course, 'title', 'Curso Novo', lambda data: data['title'])
+
+    def test_module_save_bumps_version(self):
+        self._assert_save_refreshes(self.module, 'title', 'Módulo Novo', lambda data: data['modules'][0]['title'])
+
+    def test_lesson_save_bumps_version(self):
+        self._assert_save_refreshes(
+            self.lesson, 'title', 'Aula Nova', lambda data: data['modules'][0]['lessons'][0]['title']
+        )
+
+    def test_category_save_bumps_version(self):
+        self._assert_save_refreshes(self.category, 'name', 'Categoria Nova', lambda data: data['category']['name'])
+        categories = self._get('/api/v1/categories/')[0]['results']
+        self.assertEqual([item['name'] for item in categories], ['Categoria Nova'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified das views públicas e 304 enquanto nada muda."""
+
+    def setUp(self):
+        cache.clear()
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses = [
+                Course.objects.create(
+                    title=f'Curso {index}', description='Descrição', price=100, duration='10h',
+                    professor=professor, status='active',
+                )
+                for index in range(2)
+            ]
+        self.detail_url = f'/api/v1/courses/{self.courses[0].id}/'
+
+    def test_validators_are_sent(self):
+        for url in ('/api/v1/courses/', self.detail_url, '/api/v1/categories/', '/api/v1/professors/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertIn('Last-Modified', response)
+            self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_matching_validators_return_304(self):
+        response = self.client.get(self.detail_url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        not_modified = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH='W/"outro"').status_code, 200)
+
+    def test_validator_changes_after_edit(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[0].title = 'Curso Editado'
+            self.courses[0].save()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['title'], 'Curso Editado')
+
+    def test_validator_changes_after_delete(self):
+        etag = self.client.get('/api/v1/courses/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[1].delete()
+
+        response = self.client.get('/api/v1/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+@override_settings(CACHES=NO_CACHE, COURSE_SNAPSHOTS_ENABLED=True)
+class CourseSnapshotTests(TestCase):
+    """Listagem/detalhe públicos servidos dos snapshots materializados."""
+
+    def setUp(self):
+        self.professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        self.category = Category.objects.create(name='Categoria', slug='categoria')
+
+    def _create_course(self, title='Curso'):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(
+                title=title, description='Descrição', price=100, duration='10h',
+                professor=self.professor, category=self.category, status='active',
+            )
+        return course
+
+    def test_snapshot_built_on_commit(self):
+        course = self._create_course()
+        snapshot = CourseSnapshot.objects.get(course=course)
+        self.assertEqual(snapshot.list_data['title'], 'Curso')
+        self.assertEqual(snapshot.detail_data['modules'], [])
+
+    def test_list_and_detail_use_single_query(self):
+        course = self._create_course()
+        self._create_course('Outro')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/courses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        # ConditionalGet (agregação) + COUNT da paginação + página com os snapshots
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/v1/courses/{course.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Curso')
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_embedded_changes_rebuild_snapshot(self):
+        course = self._create_course()
+        self._create_course('Outro')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            module = Module.objects.create(
+                course=course, title='Módulo 1', description='Descrição', duration='1h'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(
+                module=module, title='Aula 1', description='Descrição',
+                video_url='https://example.com/v', duration='10min',
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.professor.name = 'Professor Renomeado'
+            self.professor.save()
+
+        detail = self.client.get(f'/api/v1/courses/{course.id}/').json()
+        self.assertEqual(detail['modules'][0]['lessons'][0]['title'], 'Aula 1')
+        self.assertEqual(detail['professor']['name'], 'Professor Renomeado')
+        self.assertEqual(detail['professor']['courses_count'], 2)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_missing_snapshot_is_served_live_without_writes(self):
+        course = self._create_course()
+        CourseSnapshot.objects.all().delete()
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            detail = self.client.get(f'/api/v1/courses/{course.id}/')
+            listing = self.client.get('/api/v1/courses/')
+        self.assertEqual(detail.json()['title'], 'Curso')
+        self.assertEqual(listing.json()['results'][0]['title'], 'Curso')
+        # A leitura não grava snapshots nem troca a versão do catálogo
+        self.assertEqual(callbacks, [])
+        self.assertFalse(CourseSnapshot.objects.exists())
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_rebuild_command(self):
+        self._create_course()
+        self._create_course('Outro')
+        CourseSnapshot.objects.all().delete()
+
+        call_command('rebuild_course_snapshots', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(CourseSnapshot.objects.count(), 2)
+
+
+@override_settings(CACHES=NO_CACHE)
+class PublicLessonTests(TestCase):
+    """O detalhe público (anônimo) só expõe o vídeo das aulas gratuitas."""
+
+    def setUp(self):
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = Course.objects.create(
+                title='Curso', description='Descrição', price=100, duration='10h',
+                professor=professor, status='active',
+            )
+            module = Module.objects.create(course=self.course, title='Módulo', description='d', duration='1h')
+            Lesson.objects.create(
+                module=module, title='Paga', description='d', video_url='https://vimeo.com/secret',
+                duration='10min', order=0,
+            )
+            Lesson.objects.create(
+                module=module, title='Gratuita', description='d', video_url='https://vimeo.com/free',
+                duration='10min', order=1, is_free=True,
+            )
+
+    def _assert_paid_url_hidden(self):
+        detail = self.client.get(f'/api/v1/courses/{self.course.id}/')
+        listing = self.client.get('/api/v1/courses/')
+        for response in (detail, listing):
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('vimeo.com/secret', response.content.decode())
+        paid, free = detail.json()['modules'][0]['lessons']
+        self.assertEqual((paid['title'], paid['video_url']), ('Paga', None))
+        self.assertEqual(free['video_url'], 'https://vimeo.com/free')
+        self.assertNotIn('description', paid)
+
+    def test_snapshot_hides_paid_video(self):
+        with self.settings(COURSE_SNAPSHOTS_ENABLED=True):
+            self._assert_paid_url_hidden()
+        self.assertNotIn('vimeo.com/secret', str(CourseSnapshot.objects.get(course=self.course).detail_data))
+
+    def test_live_serialization_hides_paid_video(self):
+        with self.settings(COURSE_SNAPSHOTS_ENABLED=False):
+            self._assert_paid_url_hidden()
+
+
+@override_settings(CACHES=NO_CACHE)
+class CourseSearchTests(TestCase):
+    """Busca indexada: sem acentos, todos os termos obrigatórios e ordenação por relevância."""
+
+    def setUp(self):
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        self.courses = {}
+        for title, description in [
+            ('Direito Constitucional', 'Preparação para concursos'),
+            ('Português', 'Gramática e redação para concursos de direito'),
+            ('Matemática', 'Raciocínio lógico'),
+        ]:
+            self.courses[title] = Course.objects.create(
+                title=title, description=description, price=100, duration='10h',
+                professor=professor, status='active',
+            )
+
+    def _search(self, term, **params):
+        response = self.client.get('/api/v1/courses/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.json()['results']]
+
+    def test_accent_insensitive_prefix_match(self):
+        self.assertEqual(self._search('portugues'), ['Português'])
+        self.assertEqual(self._search('RACIOCINIO'), ['Matemática'])
+        self.assertEqual(self._search('preparaç'), ['Direito Constitucional'])
+
+    def test_all_terms_required_and_ranked_by_relevance(self):
+        # Título pesa mais que a descrição
+        self.assertEqual(self._search('direito'), ['Direito Constitucional', 'Português'])
+        self.assertEqual(self._search('direito gramatica'), ['Português'])
+        self.assertEqual(self._search('direito inexistente'), [])
+
+    def test_explicit_ordering_overrides_relevance(self):
+        self.assertEqual(
+            self._search('direito', ordering='created_at'),
+            ['Direito Constitucional', 'Português'],
+        )
+        self.assertEqual(
+            self._search('direito', ordering='-created_at'),
+            ['Português', 'Direito Constitucional'],
+        )
+
+    def test_index_follows_updates(self):
+        self.assertEqual(self._search('logica'), [])
+        course = self.courses['Matemática']
+        course.description = 'Lógica e estatística'
+        course.save()
+        self.assertEqual(self._search('logica'), ['Matemática'])
+
+
+@override_settings(CACHES=NO_CACHE, COURSE_SNAPSHOTS_ENABLED=True)
+class CourseProjectionTests(TestCase):
+    """Projeções ?view=card|full e ?fields= das views públicas de cursos."""
+
+    def setUp(self):
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio longa', specialties='Direito', experience='10 anos'
+        )
+        self.course = Course.objects.create(
+            title='Curso', description='Descrição', detailed_description='Texto longo',
+            benefits='Apostilas, Simulados', price=100, duration='10h',
+            professor=professor, status='active',
+        )
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        return response.json(), sql
+
+    def test_card_view_skips_long_text_columns(self):
+        data, sql = self._get('/api/v1/courses/?view=card')
+        item = data['results'][0]
+        self.assertEqual(item['professor'], {'id': self.course.professor_id, 'name': 'Professor', 'image': None})
+        self.assertNotIn('detailed_description', item)
+        self.assertNotIn('professors', item)
+        for column in ('detailed_description', 'benefits', 'requirements', '"content"', '"bio"'):
+            self.assertNotIn(column, sql)
+
+    def test_fields_restricts_payload_and_columns(self):
+        data, sql = self._get(f'/api/v1/courses/{self.course.id}/?fields=id,title,benefits_list')
+        self.assertEqual(data, {'id': self.course.id, 'title': 'Curso', 'benefits_list': ['Apostilas', 'Simulados']})
+        self.assertNotIn('detailed_description', sql)
+        self.assertNotIn('professors_professor', sql)
+
+    def test_full_view_is_default(self):
+        data, _ = self._get(f'/api/v1/courses/{self.course.id}/')
+        self.assertEqual(data['detailed_description'], 'Texto longo')
+        self.assertEqual(self.client.get('/api/v1/courses/?view=invalida').status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'category-counts'}})
+class CategoryCourseCountTests(TestCase):
+    """Contagens de cursos por categoria: FK legado + M2M, em uma query e em cache."""
+
+    def setUp(self):
+        cache.clear()
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        self.categories = [
+            Category.objects.create(name=f'Categoria {index}', slug=f'categoria-{index}')
+            for index in range(5)
+        ]
+        first, second = self.categories[:2]
+        for index, status in enumerate(['active', 'active', 'draft']):
+            course = Course.objects.create(
+                title=f'Curso {index}', description='Descrição', price=100, duration='10h',
+                professor=professor, category=first, status=status,
+            )
+            # Vínculo repetido (FK + M2M) não conta duas vezes
+            course.categories.add(first, second)
+
+    def test_public_counts_active_courses_with_constant_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/categories/')
+        counts = {item['slug']: item['courses_count'] for item in response.json()['results']}
+        self.assertEqual(counts['categoria-0'], 2)
+        self.assertEqual(counts['categoria-1'], 2)
+        self.assertEqual(counts['categoria-2'], 0)
+        # Nenhuma query por categoria
+        self.assertLess(len(ctx.captured_queries), len(self.categories))
+
+    def test_admin_counts_all_statuses_and_follow_catalog_version(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', password='x'))
+
+        counts = {item['slug']: item['courses_count'] for item in client.get('/api/v1/categories/admin/').json()['results']}
+        self.assertEqual(counts['categoria-0'], 3)
+        self.assertEqual(counts['categoria-1'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.filter(status='draft').get().categories.add(self.categories[2])
+        counts = {item['slug']: item['courses_count'] for item in client.get('/api/v1/categories/admin/').json()['results']}
+        self.assertEqual(counts['categoria-2'], 1)
+
+
+@override_settings(CACHES=NO_CACHE, COURSE_SNAPSHOTS_ENABLED=True)
+class CourseContentBulkTests(TestCase):
+    """PUT da árvore de módulos/aulas: criação, reordenação e exclusão em lote."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='x'))
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = Course.objects.create(
+                title='Curso', description='Descrição', price=100, duration='10h',
+                professor=professor, status='active',
+            )
+        self.url = f'/api/v1/courses/admin/{self.course.id}/content/'
+
+    def _lesson(self, index, **extra):
+        return {
+            'title': f'Aula {index}', 'description': 'Descrição',
+            'video_url': f'https://example.com/{index}', 'duration': '10min', **extra,
+        }
+
+    def _put(self, modules):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.put(self.url, {'modules': modules}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['modules'], len(ctx.captured_queries)
+
+    def test_tree_is_created_with_constant_queries(self):
+        modules, queries = self._put([
+            {'title': f'Módulo {m}', 'description': 'Descrição', 'duration': '1h',
+             'lessons': [self._lesson(f'{m}-{l}') for l in range(20)]}
+            for m in range(2)
+        ])
+        self.assertEqual([module['lessons_count'] for module in modules], [20, 20])
+        self.assertEqual(Lesson.objects.filter(module__course=self.course).count(), 40)
+        self.assertLess(queries, 15)
+
+        # O snapshot público reflete a árvore nova
+        detail = self.client.get(f'/api/v1/courses/{self.course.id}/').json()
+        self.assertEqual(len(detail['modules'][1]['lessons']), 20)
+
+    def test_reorder_move_and_delete_by_diff(self):
+        modules, _ = self._put([
+            {'title': 'A', 'description': 'd', 'duration': '1h', 'lessons': [self._lesson(1), self._lesson(2)]},
+            {'title': 'B', 'description': 'd', 'duration': '1h', 'lessons': [self._lesson(3)]},
+        ])
+        first, second = modules
+        moved = first['lessons'][1]['id']
+
+        # Inverte os módulos, move a aula 2 para B e exclui o módulo A (com a aula 1)
+        modules, _ = self._put([
+            {'id': second['id'], 'title': 'B', 'description': 'd', 'duration': '1h',
+             'lessons': [{'id': moved, **self._lesson(2)}, {'id': second['lessons'][0]['id'], **self._lesson(3)}]},
+            {'title': 'C', 'description': 'd', 'duration': '1h'},
+        ])
+        self.assertEqual([module['title'] for module in modules], ['B', 'C'])
+        self.assertEqual([lesson['id'] for lesson in modules[0]['lessons']][0], moved)
+        self.assertEqual([lesson['order'] for lesson in modules[0]['lessons']], [0, 1])
+        self.assertFalse(Module.objects.filter(pk=first['id']).exists())
+        self.assertEqual(Lesson.objects.filter(module__course=self.course).count(), 2)
+
+    def test_foreign_ids_are_rejected(self):
+        other = Module.objects.create(
+            course=Course.objects.create(
+                title='Outro', description='d', price=1, duration='1h', professor=self.course.professor,
+            ),
+            title='X', description='d', duration='1h',
+        )
+        response = self.client.put(
+            self.url, {'modules': [{'id': other.id, 'title': 'X', 'description': 'd', 'duration': '1h'}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(other.title, Module.objects.get(pk=other.id).title)
+
+
+@override_settings(CACHES=NO_CACHE, COURSE_SNAPSHOTS_ENABLED=False)
+class CourseDetailTreeTests(TestCase):
+    """Detalhe sem snapshot: árvore módulo -> aulas com número de queries fixo."""
+
+    def setUp(self):
+        professor = Professor.objects.create(
+            name='Professor', bio='Bio', specialties='Direito', experience='10 anos'
+        )
+        self.course = Course.objects.create(
+            title='Curso', description='Descrição', price=100, duration='10h',
+            professor=professor, status='active', benefits='Apostilas, Simulados',
+        )
+
+    def _add_modules(self, count, lessons):
+        for index in range(count):
+            module = Module.objects.create(
+                course=self.course, title=f'Módulo {index}', description='d',
+                duration='1h', order=index, topics='Tópico A, Tópico B',
+            )
+            Lesson.objects.bulk_create(
+                Lesson(module=module, title=f'Aula {l}', description='d',
+                       video_url='https://example.com/v', duration='10min', order=l)
+                for l in range(lessons)
+            )
+
+    def _count_detail_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/v1/courses/{self.course.id}/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_query_count_is_bounded(self):
+        self._add_modules(1, 1)
+        baseline, _ = self._count_detail_queries()
+        self._add_modules(9, 10)
+        grown, data = self._count_detail_queries()
+
+        self.assertEqual(baseline, grown)
+        self.assertEqual(len(data['modules']), 10)
+        self.assertEqual(data['modules'][0]['topics_list'], ['Tópico A', 'Tópico B'])
+        self.assertEqual(data['benefits_list'], ['Apostilas', 'Simulados'])
+
+    def test_tree_reads_only_public_columns(self):
+        self._add_modules(2, 2)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f'/api/v1/courses/{self.course.id}/')
+        tree_queries = [
+            query['sql'] for query in ctx.captured_queries
+            if 'FROM "courses_module"' in query['sql'] or 'FROM "courses_lesson"' in query['sql']
+        ]
+        self.assertEqual(len(tree_queries), 2)
+        for sql in tree_queries:
+            self.assertNotIn('"description"', sql)
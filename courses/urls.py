@@ -18,5 +18,6 @@ urlpatterns = [
     path('admin/<int:id>/', views.AdminCourseDetailView.as_view(), name='admin-course-detail'),
     # URLs de Administração módulos
     path('admin/<int:course_id>/modules/', AdminModuleListCreateView.as_view(), name='admin-module-list'),
+    path('admin/<int:course_id>/content/', views.AdminCourseContentView.as_view(), name='admin-course-content'),
     path('admin/modules/<int:id>/', AdminModuleDetailView.as_view(), name='admin-module-detail'),
 ] 
\ No newline at end of file
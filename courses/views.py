@@ -1,42 +1,140 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from .cache import CatalogCacheMixin, ConditionalGetMixin, category_course_counts
+from .search import FullTextSearchFilter
 from .models import Course, Module, Lesson, Category
 from .serializers import (
     CourseSerializer, CourseListSerializer, CourseDetailSerializer,
     CourseCreateUpdateSerializer, CoursePublicListSerializer, ModuleSerializer,
     ModulePublicSerializer, CoursePublicDetailSerializer, LessonSerializer,
-    ModuleCreateUpdateSerializer, CategorySerializer, CategoryPublicSerializer
+    ModuleCreateUpdateSerializer, CategorySerializer, CategoryPublicSerializer,
+    CourseCardSerializer, CourseContentTreeSerializer, with_public_relations, with_course_tree
 )
+from .services import CourseContentService
+from .snapshots import snapshots_enabled, snapshot_payload
 
 
 # Views Públicas (API)
-class CourseListView(generics.ListAPIView):
+class CourseProjectionMixin:
+    """
+    Projeções das views públicas de cursos:
+    - ?view=card|full escolhe o serializer (padrão: full, o payload completo)
+    - ?fields=a,b restringe os campos da projeção escolhida
+    Pedidos esparsos não usam o snapshot: leem só as colunas e relações que a
+    projeção usa (ver with_public_relations), sem colunas TEXT desnecessárias.
+    """
+    projections = {'card': CourseCardSerializer}
+    default_projection = 'full'
+
+    def get_projection(self):
+        projection = self.request.query_params.get('view', self.default_projection)
+        if projection != self.default_projection and projection not in self.projections:
+            raise ValidationError({'view': f"Projeção inválida: {projection}"})
+        return projection
+
+    def get_requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return [field.strip() for field in fields.split(',') if field.strip()]
+
+    def is_sparse(self):
+        return self.get_projection() != self.default_projection or self.get_requested_fields() is not None
+
+    def use_snapshots(self):
+        return snapshots_enabled() and not self.is_sparse()
+
+    def get_serializer_class(self):
+        return self.projections.get(self.get_projection(), self.serializer_class)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_projection_queryset(self, queryset):
+        serializer = self.get_serializer()
+        queryset = with_public_relations(queryset, serializer)
+        if 'modules' in serializer.fields:
+            queryset = with_course_tree(queryset)
+        return queryset
+
+
+class CourseListView(CourseProjectionMixin, ConditionalGetMixin, CatalogCacheMixin, generics.ListAPIView):
     """
     Lista todos os cursos ativos
+    OTIMIZADO: servida dos snapshots materializados numa única query (ver courses/snapshots.py);
+    sem snapshots, número de queries constante (ver with_public_relations).
+    Projeções ?view=card|full e ?fields= leem só as colunas pedidas (ver CourseProjectionMixin).
+    Busca (?search=) indexada e ordenada por relevância (ver courses/search.py).
+    Resposta em cache até o catálogo mudar e suporte a 304 (ver courses/cache.py)
     """
-    queryset = Course.objects.filter(status='active')
+    conditional_uses_catalog = True
+    queryset = with_public_relations(Course.objects.filter(status='active'))
     serializer_class = CoursePublicListSerializer
     permission_classes = [AllowAny]  # Acesso público
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['professor', 'status']
     search_fields = ['title', 'description']
+    search_weights = {'title': 3}
     ordering_fields = ['price', 'rating', 'students_count', 'created_at']
     ordering = ['-created_at']
 
+    def get_queryset(self):
+        if self.use_snapshots():
+            # Apenas o id do curso e o JSON da listagem (Course JOIN CourseSnapshot)
+            return Course.objects.filter(status='active').select_related('snapshot').only(
+                'id', 'snapshot__list_data'
+            )
+        if self.is_sparse():
+            return self.get_projection_queryset(Course.objects.filter(status='active'))
+        return super().get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_snapshots():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(snapshot_payload(page, 'list_data', request))
+        return Response(snapshot_payload(list(queryset), 'list_data', request))
 
-class CourseDetailView(generics.RetrieveAPIView):
+
+class CourseDetailView(CourseProjectionMixin, ConditionalGetMixin, CatalogCacheMixin, generics.RetrieveAPIView):
     """
     Detalhes de um curso específico
+    OTIMIZADO: servido do snapshot materializado numa única query (ver courses/snapshots.py);
+    sem snapshots, árvore módulo -> aulas em duas queries (ver with_course_tree).
+    Projeções ?view=card|full e ?fields= leem só as colunas pedidas (ver CourseProjectionMixin).
+    Resposta em cache até o catálogo mudar e suporte a 304 (ver courses/cache.py)
     """
-    queryset = Course.objects.filter(status='active')
+    conditional_uses_catalog = True
+    queryset = with_course_tree(with_public_relations(Course.objects.filter(status='active')))
     serializer_class = CoursePublicDetailSerializer
     permission_classes = [AllowAny]  # Acesso público
     lookup_field = 'id'
 
+    def get_queryset(self):
+        if self.use_snapshots():
+            return Course.objects.filter(status='active').select_related('snapshot').only(
+                'id', 'snapshot__detail_data'
+            )
+        if self.is_sparse():
+            return self.get_projection_queryset(Course.objects.filter(status='active'))
+        return super().get_queryset()
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_snapshots():
+            return super().retrieve(request, *args, **kwargs)
+        course = self.get_object()
+        return Response(snapshot_payload([course], 'detail_data', request)[0])
+
 
 # Views de Administração (API para /admin do frontend)
 class AdminCourseViewSet(generics.ListCreateAPIView):
@@ -140,6 +238,30 @@ class AdminModuleListCreateView(generics.ListCreateAPIView):
         course_id = self.kwargs.get('course_id')
         serializer.save(course_id=course_id)
 
+class AdminCourseContentView(generics.GenericAPIView):
+    """
+    Árvore completa de módulos e aulas de um curso no painel admin
+    GET retorna a árvore; PUT aplica a árvore inteira (cria, atualiza, reordena
+    e exclui o que não veio) numa transação, com operações em lote.
+    """
+    serializer_class = CourseContentTreeSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_course(self):
+        return get_object_or_404(Course.objects.only('id'), id=self.kwargs.get('course_id'))
+
+    def get(self, request, *args, **kwargs):
+        modules = Module.objects.filter(course=self.get_course()).prefetch_related('lessons')
+        return Response(self.get_serializer({'modules': modules}).data)
+
+    def put(self, request, *args, **kwargs):
+        course = self.get_course()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        modules = CourseContentService(course).apply_tree(serializer.validated_data['modules'])
+        return Response(self.get_serializer({'modules': modules}).data)
+
+
 class AdminModuleDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Detalhes de um módulo (GET, PUT, DELETE) no painel admin"""
     queryset = Module.objects.all()
@@ -149,24 +271,40 @@ class AdminModuleDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Views para Categorias
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ConditionalGetMixin, CatalogCacheMixin, generics.ListAPIView):
     """
     Lista todas as categorias ativas
+    OTIMIZADO: contagens de cursos ativos (FK + M2M) de uma única query em cache
+    Resposta em cache até o catálogo mudar e suporte a 304 (ver courses/cache.py)
     """
+    conditional_uses_catalog = True
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategoryPublicSerializer
     permission_classes = [AllowAny]  # Acesso público
     ordering = ['name']
+
+    def get_serializer_context(self):
+        # Contagens (FK + M2M, apenas cursos ativos) de uma query em cache
+        context = super().get_serializer_context()
+        context['category_courses_counts'] = category_course_counts(active_only=True)
+        return context
  
  
 class AdminCategoryViewSet(generics.ListCreateAPIView):
     """
     CRUD completo de categorias para o painel admin
+    OTIMIZADO: contagens de cursos (FK + M2M, todos os status) de uma query em cache
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     ordering = ['name']
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['category_courses_counts'] = category_course_counts()
+        return context
  
  
 class AdminCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
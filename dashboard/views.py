@@ -85,55 +85,30 @@ class DashboardOverviewView(generics.GenericAPIView):
             total_attempts = Sale.objects.count()
             conversion_rate = (total_sales / total_attempts * 100) if total_attempts > 0 else 0
             
-            # Vendas recentes agrupadas por pagamento (últimas 5 checkouts)
-            # Otimizado: select_related para evitar N+1 queries
-            sales_qs = Sale.objects.select_related('course').filter(
-                status='paid'
-            ).order_by('-created_at')[:50]
-            
-            groups = {}
-            for s in sales_qs:
-                key = s.asaas_payment_id or f"sale_{s.id}"
-                if key not in groups:
-                    title = s.course.title if getattr(s, 'course', None) else (s.course_title_snapshot or 'Curso removido')
-                    groups[key] = {
-                        'sales': [s],
-                        'latest': s.created_at,
-                        'max_price': float(s.price),  # valor total em carrinho será o maior
-                        'course_titles': [title],
-                        'main_sale': s,
-                    }
-                else:
-                    g = groups[key]
-                    g['sales'].append(s)
-                    if s.created_at > g['latest']:
-                        g['latest'] = s.created_at
-                    title = s.course.title if getattr(s, 'course', None) else (s.course_title_snapshot or 'Curso removido')
-                    g['course_titles'].append(title)
-                    if float(s.price) > g['max_price']:
-                        g['max_price'] = float(s.price)
-                        g['main_sale'] = s
-            
-            # Ordena grupos pelo checkout mais recente e limita a 5
-            sorted_groups = sorted(groups.values(), key=lambda g: g['latest'], reverse=True)[:5]
-            
+            # Vendas recentes agrupadas por checkout (últimos 5) - OTIMIZADO: agrupamento
+            # no banco pelos itens do checkout (sales.services), sem varrer vendas em Python
+            from sales.services import group_sales_by_checkout
+
+            recent_groups = group_sales_by_checkout(
+                Sale.objects.select_related('course').filter(status='paid')
+            )[:5]
+
             recent_sales_data = []
-            for g in sorted_groups:
-                sale = g['main_sale']
+            for sale in recent_groups:
                 # Se houver mais de um curso, rotula como carrinho
-                if len(g['course_titles']) > 1:
-                    course_title = f"Carrinho: {g['course_titles'][0]} + {len(g['course_titles']) - 1} outros"
+                if sale.group_size > 1:
+                    course_title = f"Carrinho: {sale.group_first_title} + {sale.group_size - 1} outros"
                 else:
-                    course_title = sale.course.title if getattr(sale, 'course', None) else (sale.course_title_snapshot or 'Curso removido')
-                
+                    course_title = sale.main_course_title
+
                 recent_sales_data.append({
                     'id': sale.id,
                     'student_name': sale.student_name,
                     'course_title': course_title,
-                    'price': float(g['max_price']),  # usa o total (main sale)
+                    'price': float(sale.price),  # venda principal: o total em carrinho
                     'payment_method': sale.payment_method,
                     'status': sale.status,
-                    'created_at': g['latest'],
+                    'created_at': sale.group_latest,
                     'payment_method_display': sale.get_payment_method_display()
                 })
             
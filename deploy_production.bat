@@ -101,9 +101,11 @@ echo [%date% %time%]    • Data/Hora: %date% %time% >> "%LOG_FILE%"
 echo.
 echo 📋 PRÓXIMOS PASSOS:
 echo 1. Reinicie o servidor web na PythonAnywhere
-echo 2. Teste a API: curl https://seu-dominio.com/api/v1/themembers/products/
-echo 3. Verifique os logs em: %LOG_FILE%
-echo 4. Monitore a aplicação por alguns minutos
+echo 2. Reinicie a always-on task do worker: python manage.py process_asaas_webhooks
+echo 3. Confira os cron jobs: asaas_tasks.sh hourly e asaas_tasks.sh daily (SETUP_THEMEMBERS_SYNC.txt, 4.4 e 4.5)
+echo 4. Teste a API: curl https://seu-dominio.com/api/v1/themembers/products/
+echo 5. Verifique os logs em: %LOG_FILE%
+echo 6. Monitore a aplicação por alguns minutos
 echo.
 
 echo ✅ Deploy finalizado! 🚀
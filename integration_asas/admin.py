@@ -1,5 +1,9 @@
-from django.contrib import admin
-from .models import AsaasPayment, AsaasWebhookLog
+from django.contrib import admin, messages
+from .models import AsaasPayment, AsaasWebhookLog, AsaasCustomer
+from .webhooks import requeue_webhook_logs
+
+# Até quantos logs a ação do admin sugere o comando de replay com os ids (--id) da seleção
+ADMIN_REPLAY_COMMAND_IDS = 20
 
 
 @admin.register(AsaasPayment)
@@ -48,7 +52,7 @@ class AsaasPaymentAdmin(admin.ModelAdmin):
 class AsaasWebhookLogAdmin(admin.ModelAdmin):
     list_display = [
         'event_type', 'payment_id', 'webhook_id', 'processed', 
-        'received_at', 'processed_at'
+        'attempts', 'received_at', 'processed_at'
     ]
     list_filter = [
         'event_type', 'processed', 'received_at'
@@ -60,6 +64,7 @@ class AsaasWebhookLogAdmin(admin.ModelAdmin):
         'webhook_id', 'event_type', 'payment_id', 'raw_data', 'received_at'
     ]
     date_hierarchy = 'received_at'
+    actions = ['replay_webhooks']
     
     fieldsets = (
         ('Identificação', {
@@ -70,7 +75,7 @@ class AsaasWebhookLogAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Status', {
-            'fields': ('processed', 'processed_at', 'error_message')
+            'fields': ('processed', 'processed_at', 'attempts', 'next_attempt_at', 'error_message')
         }),
         ('Timestamps', {
             'fields': ('received_at',),
@@ -89,3 +94,31 @@ class AsaasWebhookLogAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         """Não permite deletar logs de webhook"""
         return False
+
+    @admin.action(description='Devolver webhooks selecionados à fila de processamento')
+    def replay_webhooks(self, request, queryset):
+        """
+        Devolve os logs à fila do worker process_asaas_webhooks (não processa na requisição
+        do admin). O reprocessamento em paralelo com vazão e resultado por webhook é o
+        comando replay_asaas_webhooks.
+        """
+        log_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        requeued = requeue_webhook_logs(queryset)
+        self.message_user(request, f"{requeued} webhooks devolvidos à fila de processamento")
+        if len(log_ids) <= ADMIN_REPLAY_COMMAND_IDS:
+            ids = ' '.join(f'--id {log_id}' for log_id in log_ids)
+            command = f"python manage.py replay_asaas_webhooks {ids}"
+        else:
+            command = "python manage.py replay_asaas_webhooks --unprocessed"
+        self.message_user(
+            request,
+            f"Para reprocessar agora, em paralelo e com o resultado de cada webhook: {command}",
+            messages.INFO,
+        )
+
+
+@admin.register(AsaasCustomer)
+class AsaasCustomerAdmin(admin.ModelAdmin):
+    list_display = ['name', 'email', 'cpf_cnpj', 'asaas_customer_id', 'updated_at']
+    search_fields = ['name', 'email', 'cpf_cnpj', 'asaas_customer_id']
+    readonly_fields = ['created_at', 'updated_at']
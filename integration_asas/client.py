@@ -0,0 +1,132 @@
+"""
+Cliente HTTP compartilhado do AsaasService.
+
+Uma requests.Session por processo (criada sob demanda): as conexões HTTPS com o Asaas
+ficam abertas (keep-alive) e são reaproveitadas entre chamadas e requisições, sem
+um novo handshake TCP+TLS a cada chamada. Toda chamada tem timeout de conexão e de
+leitura (uma chamada travada não prende mais o worker do gunicorn) e as idempotentes
+(GET/PUT/DELETE) são repetidas com backoff exponencial em falhas transitórias.
+POST só é repetido quando a conexão nem chegou a ser aberta.
+
+A latência de cada endpoint (com os ids normalizados) é acumulada por processo em
+request_metrics() e exposta em /api/v1/asaas/metrics/.
+"""
+import logging
+import re
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_session():
+    retries = _setting('ASAAS_MAX_RETRIES', 3)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=_setting('ASAAS_RETRY_BACKOFF', 0.5),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'PUT', 'DELETE'}),
+        respect_retry_after_header=True,
+        # Depois das tentativas, devolve a última resposta de erro (tratada por raise_for_status)
+        raise_on_status=False,
+    )
+    pool_size = _setting('ASAAS_POOL_SIZE', 10)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Session compartilhada do processo (thread-safe)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def reset_session():
+    """Descarta a Session do processo (ex.: depois de mudar as configurações)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def timeout():
+    return (_setting('ASAAS_CONNECT_TIMEOUT', 3.05), _setting('ASAAS_READ_TIMEOUT', 20))
+
+
+# ids do Asaas (pay_..., cus_..., ins_...) e numéricos viram {id} na chave da métrica
+_ID_SEGMENT = re.compile(r'^(?:[a-z]{2,4}_[A-Za-z0-9]+|\d+)$')
+
+
+def endpoint_key(method, endpoint):
+    path = '/'.join('{id}' if _ID_SEGMENT.match(part) else part for part in endpoint.split('/'))
+    return f'{method} {path}'
+
+
+def record(method, endpoint, elapsed, ok):
+    key = endpoint_key(method, endpoint)
+    elapsed_ms = elapsed * 1000
+    with _metrics_lock:
+        stats = _metrics.setdefault(key, {'count': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['count'] += 1
+        stats['errors'] += 0 if ok else 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+    logger.debug("ASAAS: %s %s em %.0fms", key, 'ok' if ok else 'erro', elapsed_ms)
+
+
+def request_metrics():
+    """Latência por endpoint neste processo: chamadas, erros, média e máximo (ms)."""
+    with _metrics_lock:
+        return {
+            key: {
+                'count': stats['count'],
+                'errors': stats['errors'],
+                'avg_ms': round(stats['total_ms'] / stats['count'], 1),
+                'max_ms': round(stats['max_ms'], 1),
+            }
+            for key, stats in sorted(_metrics.items())
+        }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def timed_request(method, url, endpoint, **kwargs):
+    """session.request com timeout, registrando a latência (incluindo as retentativas)."""
+    started = time.monotonic()
+    ok = False
+    try:
+        response = get_session().request(method, url, timeout=timeout(), **kwargs)
+        ok = response.ok
+        return response
+    finally:
+        record(method, endpoint, time.monotonic() - started, ok)
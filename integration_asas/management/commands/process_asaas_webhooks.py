@@ -0,0 +1,45 @@
+"""
+Comando Django (worker) que processa a fila de webhooks do Asaas
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from integration_asas.webhooks import process_pending_webhooks, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Processa os webhooks do Asaas gravados pela view (fila no banco, SELECT FOR UPDATE '
+        'SKIP LOCKED), com retentativas e backoff. Sem --once, fica em execução'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Webhooks reivindicados por vez (padrão: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Esvazia a fila uma vez e termina (ex.: cron)',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=1.0,
+            help='Segundos de espera quando a fila está vazia (padrão: 1)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('🚀 Processando webhooks do Asaas...'))
+        while True:
+            processed, failed = process_pending_webhooks(batch_size=options['batch_size'])
+            if processed or failed:
+                self.stdout.write(f"   {processed} processados, {failed} com falha (reagendados)")
+            if options['once']:
+                break
+            if not (processed or failed):
+                time.sleep(options['idle_sleep'])
+        self.stdout.write(self.style.SUCCESS('✅ Fila processada'))
@@ -0,0 +1,54 @@
+"""
+Comando Django para reconciliar os pagamentos locais com a listagem do Asaas
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from integration_asas.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara os pagamentos do Asaas criados numa janela de datas com os pagamentos locais, '
+        'corrige os status divergentes e libera o acesso das vendas que passaram a pagas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Janela a partir de hoje, em dias (padrão: 7). Ignorado com --start',
+        )
+        parser.add_argument('--start', help='Data inicial (AAAA-MM-DD)')
+        parser.add_argument('--end', help='Data final (AAAA-MM-DD, padrão: hoje)')
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=100,
+            help='Pagamentos por chamada à API (máximo do Asaas: 100)',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        end_date = parse_date(options['end']) if options['end'] else today
+        start_date = parse_date(options['start']) if options['start'] else today - timedelta(days=options['days'])
+        if not start_date or not end_date or start_date > end_date:
+            raise CommandError('Janela de datas inválida')
+
+        start_time = timezone.now()
+        self.stdout.write(self.style.SUCCESS(f'🚀 Reconciliando pagamentos de {start_date} a {end_date}...'))
+        try:
+            summary = reconcile_payments(start_date, end_date, page_size=min(options['page_size'], 100))
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        duration = timezone.now() - start_time
+        self.stdout.write(f"   {summary['fetched']} pagamentos lidos do Asaas")
+        self.stdout.write(f"   {summary['updated']} pagamentos atualizados")
+        self.stdout.write(f"   {summary['paid']} vendas passaram a pagas")
+        if summary['missing']:
+            self.stdout.write(self.style.WARNING(f"   {summary['missing']} pagamentos sem registro local"))
+        self.stdout.write(self.style.SUCCESS(f"✅ Concluído em {duration.total_seconds():.2f} segundos"))
@@ -0,0 +1,70 @@
+"""
+Comando Django para reprocessar em lote logs de webhook do Asaas
+"""
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime, parse_date
+from integration_asas.models import AsaasWebhookLog
+from integration_asas.replay import replay_webhook_logs, DEFAULT_WORKERS
+
+
+class Command(BaseCommand):
+    help = (
+        'Reprocessa logs de webhook do Asaas (padrão: os que terminaram com erro) via '
+        'AsaasService.process_webhook, em paralelo por pagamento'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--unprocessed',
+            action='store_true',
+            help='Reprocessa os ainda não processados em vez dos com erro',
+        )
+        parser.add_argument('--event', help='Apenas deste tipo de evento (ex.: PAYMENT_RECEIVED)')
+        parser.add_argument('--payment-id', help='Apenas deste pagamento Asaas')
+        parser.add_argument('--since', help='Apenas recebidos a partir de (AAAA-MM-DD ou data/hora ISO)')
+        parser.add_argument(
+            '--id',
+            type=int,
+            action='append',
+            dest='log_ids',
+            help='ID do log a reprocessar (pode ser repetido; ignora os demais filtros de status)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help=f'Threads em paralelo (padrão: {DEFAULT_WORKERS})',
+        )
+
+    def handle(self, *args, **options):
+        logs = AsaasWebhookLog.objects.all()
+        if options['log_ids']:
+            logs = logs.filter(pk__in=options['log_ids'])
+        elif options['unprocessed']:
+            logs = logs.filter(processed=False)
+        else:
+            logs = logs.exclude(error_message='')
+        if options['event']:
+            logs = logs.filter(event_type=options['event'])
+        if options['payment_id']:
+            logs = logs.filter(payment_id=options['payment_id'])
+        if options['since']:
+            since = parse_datetime(options['since']) or parse_date(options['since'])
+            logs = logs.filter(received_at__gte=since)
+
+        self.stdout.write(self.style.SUCCESS(f'🚀 Reprocessando {logs.count()} webhooks...'))
+        result = replay_webhook_logs(logs, workers=options['workers'])
+
+        for outcome in result['outcomes']:
+            line = f"   [{'OK' if outcome['ok'] else 'ERRO'}] log {outcome['log_id']} {outcome['webhook_id']} " \
+                   f"({outcome['payment_id']}) em {outcome['seconds'] * 1000:.0f}ms"
+            if outcome['error']:
+                line += f" - {outcome['error']}"
+            self.stdout.write(line if outcome['ok'] else self.style.WARNING(line))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {result['succeeded']} reprocessados, {result['failed']} com erro em "
+                f"{result['seconds']:.2f} segundos ({result['throughput']:.1f} webhooks/s)"
+            )
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integration_asas', '0005_asaaspayment_installment_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asaaspayment',
+            index=models.Index(fields=['-created_at', '-id'], name='asaas_payment_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asaaswebhooklog',
+            index=models.Index(fields=['-received_at', '-id'], name='asaas_webhook_received_id_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integration_asas', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsaasCustomer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asaas_customer_id', models.CharField(max_length=100, unique=True, verbose_name='ID Cliente Asaas')),
+                ('cpf_cnpj', models.CharField(blank=True, db_index=True, max_length=20, verbose_name='CPF/CNPJ')),
+                ('email', models.EmailField(db_index=True, max_length=254, verbose_name='Email')),
+                ('name', models.CharField(blank=True, max_length=200, verbose_name='Nome')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Cliente Asaas',
+                'verbose_name_plural': 'Clientes Asaas',
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
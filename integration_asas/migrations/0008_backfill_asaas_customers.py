@@ -0,0 +1,37 @@
+# Generated manually: cadastro local de clientes a partir do histórico de pagamentos
+
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def backfill_asaas_customers(apps, schema_editor):
+    AsaasPayment = apps.get_model('integration_asas', 'AsaasPayment')
+    AsaasCustomer = apps.get_model('integration_asas', 'AsaasCustomer')
+
+    # O pagamento mais recente de cada cliente traz os dados mais atuais
+    customers = {}
+    payments = AsaasPayment.objects.exclude(asaas_customer_id='').order_by('created_at', 'id').values_list(
+        'asaas_customer_id', 'customer_email', 'customer_cpf_cnpj', 'customer_name'
+    )
+    for customer_id, email, cpf_cnpj, name in payments.iterator(chunk_size=BATCH_SIZE):
+        customers[customer_id] = AsaasCustomer(
+            asaas_customer_id=customer_id,
+            email=(email or '').strip().lower(),
+            cpf_cnpj=re.sub(r'\D', '', cpf_cnpj or ''),
+            name=name or '',
+        )
+    AsaasCustomer.objects.bulk_create(customers.values(), batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integration_asas', '0007_asaascustomer'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_asaas_customers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:41
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integration_asas', '0008_backfill_asaas_customers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asaaswebhooklog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas'),
+        ),
+        migrations.AddField(
+            model_name='asaaswebhooklog',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa em'),
+        ),
+        migrations.AddIndex(
+            model_name='asaaswebhooklog',
+            index=models.Index(fields=['processed', 'next_attempt_at'], name='asaas_webhook_queue_idx'),
+        ),
+    ]
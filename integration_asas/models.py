@@ -1,4 +1,7 @@
+import re
+
 from django.db import models
+from django.utils import timezone
 from sales.models import Sale
 
 
@@ -46,6 +49,10 @@ class AsaasPayment(models.Model):
         verbose_name = 'Pagamento Asaas'
         verbose_name_plural = 'Pagamentos Asaas'
         ordering = ['-created_at']
+        indexes = [
+            # Paginação por cursor (-created_at, -id) (app/pagination.py)
+            models.Index(fields=['-created_at', '-id'], name='asaas_payment_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer_name} - {self.asaas_id} - {self.get_status_display()}"
@@ -71,12 +78,52 @@ class AsaasWebhookLog(models.Model):
     processed = models.BooleanField(default=False, verbose_name='Processado')
     processed_at = models.DateTimeField(null=True, blank=True, verbose_name='Processado em')
     error_message = models.TextField(blank=True, verbose_name='Mensagem de Erro')
+    # Fila de processamento (ver integration_asas/webhooks.py)
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Próxima tentativa em')
     received_at = models.DateTimeField(auto_now_add=True, verbose_name='Recebido em')
     
     class Meta:
         verbose_name = 'Log de Webhook Asaas'
         verbose_name_plural = 'Logs de Webhook Asaas'
         ordering = ['-received_at']
+        indexes = [
+            # Paginação por cursor (-received_at, -id) (app/pagination.py)
+            models.Index(fields=['-received_at', '-id'], name='asaas_webhook_received_id_idx'),
+            # Fila do worker: pendentes cuja próxima tentativa já venceu
+            models.Index(fields=['processed', 'next_attempt_at'], name='asaas_webhook_queue_idx'),
+        ]
     
     def __str__(self):
         return f"{self.event_type} - {self.payment_id} - {self.received_at}"
+
+
+class AsaasCustomer(models.Model):
+    """
+    Cadastro local dos clientes já criados no Asaas: checkouts de quem já comprou
+    usam o asaas_customer_id daqui sem consultar/criar o cliente na API.
+    """
+    asaas_customer_id = models.CharField(max_length=100, unique=True, verbose_name='ID Cliente Asaas')
+    # Apenas dígitos (ver normalize_cpf_cnpj)
+    cpf_cnpj = models.CharField(max_length=20, blank=True, db_index=True, verbose_name='CPF/CNPJ')
+    # Minúsculo e sem espaços (ver normalize_email)
+    email = models.EmailField(db_index=True, verbose_name='Email')
+    name = models.CharField(max_length=200, blank=True, verbose_name='Nome')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Cliente Asaas'
+        verbose_name_plural = 'Clientes Asaas'
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"{self.name or self.email} - {self.asaas_customer_id}"
+
+    @staticmethod
+    def normalize_cpf_cnpj(value):
+        return re.sub(r'\D', '', value or '')
+
+    @staticmethod
+    def normalize_email(value):
+        return (value or '').strip().lower()
@@ -0,0 +1,85 @@
+"""
+Reconciliação em lote dos pagamentos locais (AsaasPayment) com o Asaas.
+
+Sem webhook, o status de um pagamento só convergia quando o navegador do comprador
+consultava get_payment_status (uma chamada ao Asaas por venda). Aqui a listagem de
+pagamentos do Asaas de uma janela de datas é percorrida página a página (até 100 por
+chamada) e comparada com os pagamentos locais da página numa única query; as
+diferenças são gravadas com bulk_update e só as vendas que passaram a pagas são
+marcadas (com os carrinhos) e recebem o acesso TheMembers.
+"""
+from datetime import datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from sales.events import publish_payment_confirmed
+from sales.services import mark_checkouts_paid
+from .models import AsaasPayment
+from .services import AsaasService
+
+# Status do Asaas em que o pagamento está pago
+PAID_STATUSES = ('RECEIVED', 'CONFIRMED', 'RECEIVED_IN_CASH')
+
+
+def _remote_payment_date(data):
+    """Data do pagamento informada pelo Asaas (meia-noite local), ou agora se não houver."""
+    for field in ('paymentDate', 'clientPaymentDate', 'confirmedDate'):
+        value = parse_date(data.get(field) or '')
+        if value:
+            return timezone.make_aware(datetime.combine(value, time.min))
+    return timezone.now()
+
+
+def reconcile_payments(start_date, end_date, service=None, page_size=100):
+    """
+    Reconcilia os pagamentos criados entre start_date e end_date.
+    Retorna um resumo: pagamentos lidos do Asaas, atualizados localmente, vendas que
+    passaram a pagas e pagamentos do Asaas sem registro local.
+    """
+    service = service or AsaasService()
+    summary = {'fetched': 0, 'updated': 0, 'paid': 0, 'missing': 0}
+
+    for page in service.iter_payments(start_date, end_date, page_size=page_size):
+        remote = {data['id']: data for data in page if data.get('id')}
+        summary['fetched'] += len(remote)
+        local = list(AsaasPayment.objects.filter(asaas_id__in=list(remote)).select_related('sale'))
+        summary['missing'] += len(remote) - len(local)
+
+        now = timezone.now()
+        changed = []
+        newly_paid = []
+        for payment in local:
+            data = remote[payment.asaas_id]
+            status = data.get('status')
+            if not status or status == payment.status:
+                continue
+            payment.status = status
+            if data.get('value') is not None:
+                payment.value = data['value']
+            if status in PAID_STATUSES and not payment.payment_date:
+                payment.payment_date = _remote_payment_date(data)
+            payment.updated_at = now
+            changed.append(payment)
+            if status in PAID_STATUSES and payment.sale.status != 'paid':
+                newly_paid.append(payment.sale)
+
+        if not changed:
+            continue
+        with transaction.atomic():
+            AsaasPayment.objects.bulk_update(changed, ['status', 'value', 'payment_date', 'updated_at'])
+            if newly_paid:
+                mark_checkouts_paid([sale.pk for sale in newly_paid])
+                publish_payment_confirmed([sale.asaas_payment_id for sale in newly_paid])
+        summary['updated'] += len(changed)
+        summary['paid'] += len(newly_paid)
+
+        # Acesso TheMembers só para as vendas que acabaram de ser pagas
+        for sale in newly_paid:
+            # Já gravado em lote: o save() do acesso não deve invalidar as estatísticas de novo
+            sale.status = 'paid'
+            sale.remember_statistics_values()
+            service._grant_themembers_access_if_needed(sale)
+
+    return summary
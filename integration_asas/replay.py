@@ -0,0 +1,109 @@
+"""
+Reprocessamento em lote de logs de webhook do Asaas (com erro ou não processados).
+
+Os logs são reabertos num único UPDATE e reprocessados por AsaasService.process_webhook
+num pool limitado de threads. Os logs do mesmo pagamento formam um grupo processado
+em sequência (na ordem de chegada) por uma única thread, para que eventos do mesmo
+pagamento não concorram entre si; grupos de pagamentos diferentes rodam em paralelo.
+
+Enquanto reabertos, os logs ficam reservados (next_attempt_at adiado, como no lease
+da fila em integration_asas/webhooks.py) para o worker process_asaas_webhooks não
+pegá-los ao mesmo tempo.
+"""
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import AsaasWebhookLog
+from .services import AsaasService
+
+DEFAULT_WORKERS = 4
+
+
+def group_by_payment(logs):
+    """Agrupa os logs por payment_id, cada grupo na ordem de chegada."""
+    groups = OrderedDict()
+    for log in sorted(logs, key=lambda log: (log.received_at, log.id)):
+        groups.setdefault(log.payment_id, []).append(log)
+    return list(groups.values())
+
+
+def _replay_group(logs):
+    """Reprocessa em sequência os logs de um pagamento."""
+    service = AsaasService()
+    outcomes = []
+    for log in logs:
+        started = time.monotonic()
+        try:
+            ok = bool(service.process_webhook(log.raw_data))
+            error = ''
+        except Exception as e:
+            ok, error = False, str(e)
+        outcomes.append({
+            'log_id': log.id,
+            'webhook_id': log.webhook_id,
+            'payment_id': log.payment_id,
+            'ok': ok,
+            'seconds': time.monotonic() - started,
+            'error': error,
+        })
+    return outcomes
+
+
+def _replay_group_in_thread(logs):
+    try:
+        return _replay_group(logs)
+    finally:
+        # Cada thread do pool abre as próprias conexões com o banco
+        connections.close_all()
+
+
+def replay_webhook_logs(queryset, workers=DEFAULT_WORKERS):
+    """
+    Reprocessa os logs do queryset com `workers` threads (1 = na thread atual).
+    Retorna o resultado de cada webhook (outcomes) e o resumo: total, sucessos,
+    falhas, duração e vazão (webhooks por segundo).
+    """
+    logs = list(queryset.order_by())
+    started = time.monotonic()
+    if not logs:
+        return {'outcomes': [], 'total': 0, 'succeeded': 0, 'failed': 0, 'seconds': 0.0, 'throughput': 0.0}
+
+    lease = timezone.now() + timedelta(seconds=getattr(settings, 'WEBHOOK_LEASE_SECONDS', 300))
+    AsaasWebhookLog.objects.filter(pk__in=[log.pk for log in logs]).update(
+        processed=False, processed_at=None, error_message='', attempts=0, next_attempt_at=lease,
+    )
+
+    outcomes = []
+    groups = group_by_payment(logs)
+    if workers <= 1:
+        for group in groups:
+            outcomes.extend(_replay_group(group))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(_replay_group_in_thread, group) for group in groups]):
+                outcomes.extend(future.result())
+
+    # process_webhook grava o motivo da falha no log: lido numa query só
+    failed_ids = [outcome['log_id'] for outcome in outcomes if not outcome['ok'] and not outcome['error']]
+    if failed_ids:
+        errors = dict(AsaasWebhookLog.objects.filter(pk__in=failed_ids).values_list('id', 'error_message'))
+        for outcome in outcomes:
+            if outcome['log_id'] in errors:
+                outcome['error'] = errors[outcome['log_id']]
+
+    seconds = time.monotonic() - started
+    succeeded = sum(1 for outcome in outcomes if outcome['ok'])
+    return {
+        'outcomes': outcomes,
+        'total': len(outcomes),
+        'succeeded': succeeded,
+        'failed': len(outcomes) - succeeded,
+        'seconds': seconds,
+        'throughput': len(outcomes) / seconds if seconds else float(len(outcomes)),
+    }
@@ -5,9 +5,13 @@ from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
 from django.utils import timezone
 from django.db import IntegrityError, transaction
-from .models import AsaasPayment, AsaasWebhookLog
+from . import client
+from .models import AsaasPayment, AsaasWebhookLog, AsaasCustomer
 from themembers.services import SubscriptionService
-from sales.models import Sale
+from sales.models import Sale, ArchivedSale
+from sales.cache import bump_sales_version
+from sales.events import publish_payment_confirmed
+from sales.services import checkout_items, mark_checkout_paid
 
 
 class AsaasService:
@@ -29,8 +33,8 @@ class AsaasService:
             'Content-Type': 'application/json'
         }
     
-    def _make_request(self, method, endpoint, data=None, params=None):
-        """Faz requisição para a API do Asaas"""
+    def _make_request(self, method, endpoint, data=None, params=None, not_found=None):
+        """Faz requisição para a API do Asaas (not_found: resposta usada se o recurso não existe, 404)"""
         url = f"{self.base_url}/{endpoint}"
         
         # Debug: mostra os headers sendo enviados
@@ -41,20 +45,22 @@ class AsaasService:
             print(f"DEBUG: Data: {data}")
         
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=self.headers, params=params)
-            elif method == 'POST':
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method == 'PUT':
-                response = requests.put(url, headers=self.headers, json=data)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=self.headers)
-            else:
+            if method not in ('GET', 'POST', 'PUT', 'DELETE'):
                 raise ValueError(f"Método HTTP não suportado: {method}")
+            # OTIMIZADO: Session compartilhada (keep-alive), com timeout e retentativas
+            # nas chamadas idempotentes (ver integration_asas/client.py)
+            response = client.timed_request(
+                method, url, endpoint,
+                headers=self.headers,
+                params=params if method == 'GET' else None,
+                json=data if method in ('POST', 'PUT') else None,
+            )
             
             print(f"DEBUG: Response Status: {response.status_code}")
             print(f"DEBUG: Response Headers: {dict(response.headers)}")
             
+            if response.status_code == 404 and not_found is not None:
+                return not_found
             response.raise_for_status()
             return response.json()
             
@@ -87,6 +93,51 @@ class AsaasService:
             # Cria novo cliente
             return self._make_request('POST', 'customers', customer_data)
     
+    def get_customer_id(self, sale):
+        """
+        Retorna (customer_id, do_cadastro_local). Compradores já conhecidos saem do
+        cadastro local (AsaasCustomer) sem chamada à API; os demais são criados/atualizados
+        no Asaas e registrados para os próximos checkouts.
+        """
+        customer = self._find_local_customer(sale)
+        if customer:
+            return customer.asaas_customer_id, True
+
+        customer_response = self.create_customer(sale)
+        if not customer_response:
+            return None, False
+        self._remember_customer(customer_response['id'], sale)
+        return customer_response['id'], False
+
+    def _find_local_customer(self, sale):
+        """
+        Só reaproveita o cliente com mesmo email, CPF/CNPJ e nome. Sem documento ou
+        com nome diferente, segue o fluxo remoto (create_customer), que atualiza os
+        dados no Asaas: a cobrança nunca sai no nome/documento de outra pessoa.
+        """
+        email = AsaasCustomer.normalize_email(sale.email)
+        cpf_cnpj = AsaasCustomer.normalize_cpf_cnpj(getattr(sale, 'cpf_cnpj', ''))
+        if not email or not cpf_cnpj:
+            return None
+        customer = AsaasCustomer.objects.filter(email=email, cpf_cnpj=cpf_cnpj).first()
+        if customer and customer.name.strip() != (sale.student_name or '').strip():
+            return None
+        return customer
+
+    def _remember_customer(self, customer_id, sale):
+        try:
+            AsaasCustomer.objects.update_or_create(
+                asaas_customer_id=customer_id,
+                defaults={
+                    'email': AsaasCustomer.normalize_email(sale.email),
+                    'cpf_cnpj': AsaasCustomer.normalize_cpf_cnpj(getattr(sale, 'cpf_cnpj', '')),
+                    'name': sale.student_name or '',
+                }
+            )
+        except IntegrityError:
+            # Registrado em paralelo por outro checkout
+            pass
+
     def create_payment(self, sale, payment_method, installment_count: int | None = None):
         """Cria pagamento no Asaas. Suporta boleto parcelado via installmentCount/installmentValue.
 
@@ -95,13 +146,11 @@ class AsaasService:
             payment_method: 'pix' | 'credit_card' | 'bank_slip' | 'bank_slip_installments'
             installment_count: opcional, quando boleto parcelado
         """
-        # Primeiro cria/atualiza o cliente
-        customer_response = self.create_customer(sale)
-        if not customer_response:
+        # Primeiro obtém o cliente (cadastro local ou cria/atualiza no Asaas)
+        customer_id, from_registry = self.get_customer_id(sale)
+        if not customer_id:
             return None
         
-        customer_id = customer_response['id']
-        
         # Calcula data de vencimento (7 dias a partir de hoje)
         due_date = (timezone.now() + timedelta(days=7)).strftime('%Y-%m-%d')
         
@@ -149,6 +198,15 @@ class AsaasService:
         
         # Cria o pagamento
         payment_response = self._make_request('POST', 'payments', payment_data)
+        if not payment_response and from_registry:
+            # O cliente do cadastro local pode ter sido removido no Asaas: refaz pela API
+            AsaasCustomer.objects.filter(asaas_customer_id=customer_id).delete()
+            customer_response = self.create_customer(sale)
+            if customer_response:
+                customer_id = customer_response['id']
+                self._remember_customer(customer_id, sale)
+                payment_data['customer'] = customer_id
+                payment_response = self._make_request('POST', 'payments', payment_data)
         
         if payment_response:
             # Para pagamentos PIX, busca o QR Code
@@ -204,10 +262,43 @@ class AsaasService:
         """Consulta status de um pagamento"""
         return self._make_request('GET', f'payments/{payment_id}')
     
+    def iter_payments(self, start_date, end_date, page_size=100):
+        """
+        Percorre a listagem de pagamentos do Asaas criados entre start_date e end_date
+        (inclusive), uma página (até 100, o limite da API) por chamada.
+        Gera a lista de pagamentos de cada página; levanta RuntimeError se uma página falhar.
+        """
+        offset = 0
+        while True:
+            page = self._make_request('GET', 'payments', params={
+                'dateCreated[ge]': start_date.strftime('%Y-%m-%d'),
+                'dateCreated[le]': end_date.strftime('%Y-%m-%d'),
+                'offset': offset,
+                'limit': page_size,
+            })
+            if page is None:
+                raise RuntimeError(f'Falha ao listar pagamentos do Asaas (offset {offset})')
+            payments = page.get('data') or []
+            if payments:
+                yield payments
+            if not page.get('hasMore') or not payments:
+                return
+            offset += len(payments)
+
     def cancel_payment(self, payment_id):
         """Cancela um pagamento"""
         return self._make_request('POST', f'payments/{payment_id}/cancel')
     
+    def delete_payment(self, payment_id):
+        """Remove a cobrança no Asaas: o boleto/PIX deixa de poder ser pago (já removida conta como removida)"""
+        return self._make_request('DELETE', f'payments/{payment_id}', not_found={'deleted': True, 'id': payment_id})
+
+    def delete_installment(self, installment_id):
+        """Remove todas as cobranças de um parcelamento (carnê) no Asaas (já removido conta como removido)"""
+        return self._make_request(
+            'DELETE', f'installments/{installment_id}', not_found={'deleted': True, 'id': installment_id}
+        )
+    
     def refund_payment(self, payment_id, value=None, description=None):
         """Reembolsa um pagamento"""
         refund_data = {}
@@ -219,13 +310,11 @@ class AsaasService:
         return self._make_request('POST', f'payments/{payment_id}/refund', refund_data)
     
     def process_webhook(self, webhook_data):
-        """Processa webhook recebido do Asaas"""
+        """Registra e processa na hora um webhook recebido do Asaas"""
         try:
-            # Extrai informações do webhook
             webhook_id = webhook_data.get('id')
             event_type = webhook_data.get('event')
-            payment_data = webhook_data.get('payment', {})
-            payment_id = payment_data.get('id')
+            payment_id = webhook_data.get('payment', {}).get('id')
             
             # Cria log do webhook de forma idempotente
             with transaction.atomic():
@@ -241,9 +330,8 @@ class AsaasService:
                 # Webhook já processado anteriormente
                 return True
             
-            # Busca pagamento local
             try:
-                asaas_payment = AsaasPayment.objects.get(asaas_id=payment_id)
+                self.apply_webhook_log(webhook_log)
             except AsaasPayment.DoesNotExist:
                 webhook_log.error_message = f"Pagamento {payment_id} não encontrado localmente"
                 webhook_log.processed = True
@@ -251,62 +339,6 @@ class AsaasService:
                 webhook_log.save()
                 return False
             
-            # Atualiza status do pagamento baseado no evento
-            if event_type == 'PAYMENT_RECEIVED':
-                asaas_payment.status = 'RECEIVED'
-                asaas_payment.payment_date = timezone.now()
-                asaas_payment.webhook_received = True
-                asaas_payment.last_webhook_update = timezone.now()
-                
-                # Atualiza status da venda
-                sale = asaas_payment.sale
-                sale.status = 'paid'
-                sale.asaas_payment_id = payment_id
-                sale.save()
-
-                # Concede acesso na TheMembers (se ainda não concedido)
-                self._grant_themembers_access_if_needed(sale)
-                
-            elif event_type == 'PAYMENT_CONFIRMED':
-                asaas_payment.status = 'CONFIRMED'
-                asaas_payment.payment_date = timezone.now()
-                asaas_payment.webhook_received = True
-                asaas_payment.last_webhook_update = timezone.now()
-                
-                # Garante que a venda esteja como paga e concede acesso
-                sale = asaas_payment.sale
-                if sale.status != 'paid':
-                    sale.status = 'paid'
-                sale.asaas_payment_id = payment_id
-                sale.save()
-
-                self._grant_themembers_access_if_needed(sale)
-                
-            elif event_type == 'PAYMENT_OVERDUE':
-                asaas_payment.status = 'OVERDUE'
-                asaas_payment.webhook_received = True
-                asaas_payment.last_webhook_update = timezone.now()
-                
-            elif event_type == 'PAYMENT_DELETED':
-                asaas_payment.status = 'REFUNDED'
-                asaas_payment.webhook_received = True
-                asaas_payment.last_webhook_update = timezone.now()
-                
-            elif event_type == 'PAYMENT_UPDATED':
-                # Atualiza dados do pagamento
-                asaas_payment.status = payment_data.get('status', asaas_payment.status)
-                asaas_payment.value = payment_data.get('value', asaas_payment.value)
-                asaas_payment.webhook_received = True
-                asaas_payment.last_webhook_update = timezone.now()
-            
-            # Salva alterações
-            asaas_payment.save()
-            
-            # Marca webhook como processado
-            webhook_log.processed = True
-            webhook_log.processed_at = timezone.now()
-            webhook_log.save()
-            
             return True
             
         except IntegrityError:
@@ -322,35 +354,141 @@ class AsaasService:
             print(f"Erro ao processar webhook: {e}")
             return False
 
+    def apply_webhook_log(self, webhook_log):
+        """
+        Aplica o evento de um webhook registrado (pagamento, venda, carrinho e acesso
+        TheMembers) e marca o log como processado.
+        Levanta AsaasPayment.DoesNotExist se o pagamento ainda não existe localmente.
+        """
+        webhook_data = webhook_log.raw_data
+        event_type = webhook_data.get('event')
+        payment_data = webhook_data.get('payment', {})
+        payment_id = payment_data.get('id')
+        
+        # Busca pagamento local
+        try:
+            asaas_payment = AsaasPayment.objects.get(asaas_id=payment_id)
+        except AsaasPayment.DoesNotExist:
+            if self._flag_archived_sale_payment(webhook_log):
+                return
+            raise
+        was_paid = asaas_payment.is_paid
+        
+        # Atualiza status do pagamento baseado no evento
+        if event_type == 'PAYMENT_RECEIVED':
+            asaas_payment.status = 'RECEIVED'
+            asaas_payment.payment_date = timezone.now()
+            asaas_payment.webhook_received = True
+            asaas_payment.last_webhook_update = timezone.now()
+            
+            # Atualiza status da venda
+            sale = asaas_payment.sale
+            sale.status = 'paid'
+            sale.asaas_payment_id = payment_id
+            sale.save()
+            mark_checkout_paid(sale)
+
+            # Concede acesso na TheMembers (se ainda não concedido)
+            self._grant_themembers_access_if_needed(sale)
+            
+        elif event_type == 'PAYMENT_CONFIRMED':
+            asaas_payment.status = 'CONFIRMED'
+            asaas_payment.payment_date = timezone.now()
+            asaas_payment.webhook_received = True
+            asaas_payment.last_webhook_update = timezone.now()
+            
+            # Garante que a venda esteja como paga e concede acesso
+            sale = asaas_payment.sale
+            if sale.status != 'paid':
+                sale.status = 'paid'
+            sale.asaas_payment_id = payment_id
+            sale.save()
+            mark_checkout_paid(sale)
+
+            self._grant_themembers_access_if_needed(sale)
+            
+        elif event_type == 'PAYMENT_OVERDUE':
+            asaas_payment.status = 'OVERDUE'
+            asaas_payment.webhook_received = True
+            asaas_payment.last_webhook_update = timezone.now()
+            
+        elif event_type == 'PAYMENT_DELETED':
+            asaas_payment.status = 'REFUNDED'
+            asaas_payment.webhook_received = True
+            asaas_payment.last_webhook_update = timezone.now()
+            
+        elif event_type == 'PAYMENT_UPDATED':
+            # Atualiza dados do pagamento
+            asaas_payment.status = payment_data.get('status', asaas_payment.status)
+            asaas_payment.value = payment_data.get('value', asaas_payment.value)
+            asaas_payment.webhook_received = True
+            asaas_payment.last_webhook_update = timezone.now()
+        
+        # Salva alterações
+        asaas_payment.save()
+        if asaas_payment.is_paid and not was_paid:
+            # Acorda o long-poll da página de sucesso (ver sales/events.py)
+            publish_payment_confirmed([asaas_payment.asaas_id])
+        
+        # Marca webhook como processado
+        webhook_log.processed = True
+        webhook_log.processed_at = timezone.now()
+        webhook_log.error_message = ''
+        webhook_log.save()
+
+    def _flag_archived_sale_payment(self, webhook_log):
+        """
+        Webhook de um pagamento cuja venda já foi arquivada (cancelada e removida, ver
+        sales/archive.py). Atualiza o status Asaas no arquivo e, se o pagamento foi
+        recebido, marca a venda arquivada para reembolso ou liberação manual.
+        Retorna False se o pagamento não é de uma venda arquivada.
+        """
+        webhook_data = webhook_log.raw_data
+        payment_data = webhook_data.get('payment', {})
+        archived = ArchivedSale.objects.filter(asaas_payment_id=payment_data.get('id'))
+        if not archived.exists():
+            return False
+
+        updates = {}
+        if payment_data.get('status'):
+            updates['asaas_status'] = payment_data['status']
+        error = ''
+        if webhook_data.get('event') in ('PAYMENT_RECEIVED', 'PAYMENT_CONFIRMED'):
+            updates['late_payment_at'] = timezone.now()
+            error = f"Pagamento {payment_data.get('id')} recebido para venda arquivada: reembolsar ou liberar manualmente"
+            print(error)
+        if updates:
+            archived.update(**updates)
+
+        webhook_log.processed = True
+        webhook_log.processed_at = timezone.now()
+        webhook_log.error_message = error
+        webhook_log.save()
+        return True
+
     def _grant_themembers_access_if_needed(self, sale):
         """Concede acesso na TheMembers para 1 curso com múltiplos produtos ou combos (carrinho)."""
         try:
             # Se já concedido para a venda principal, ainda assim pode haver cursos relacionados
             # Vamos sempre calcular o conjunto de produtos a liberar e sincronizar status dos relacionados
 
-            # Coleta product_ids do curso desta venda
+            # Itens do checkout (carrinho ou compra individual) num único JOIN,
+            # com os produtos TheMembers de cada curso pré-carregados
             course = sale.course
-            try:
-                product_ids = course.get_themembers_product_ids()
-            except Exception:
-                # Compatibilidade com legado
-                pid = getattr(course, 'themembers_product_id', None)
-                product_ids = [pid] if pid else []
+            items = checkout_items(sale)
+            courses = [item.course for item in items if item.course]
+            if not items and course:
+                # Venda sem checkout (criada pelo admin)
+                courses = [course]
 
-            # Se pagamento do carrinho, agrega produtos de todos os cursos relacionados
-            if sale.asaas_payment_id:
+            product_ids = []
+            for item_course in courses:
                 try:
-                    from sales.models import Sale as SaleModel
-                    related_sales = SaleModel.objects.filter(asaas_payment_id=sale.asaas_payment_id)
-                    for rs in related_sales:
-                        try:
-                            pids = rs.course.get_themembers_product_ids()
-                        except Exception:
-                            rp = getattr(rs.course, 'themembers_product_id', None)
-                            pids = [rp] if rp else []
-                        product_ids.extend(pids)
+                    product_ids.extend(item_course.get_themembers_product_ids())
                 except Exception:
-                    pass
+                    # Compatibilidade com legado
+                    pid = getattr(item_course, 'themembers_product_id', None)
+                    product_ids.extend([pid] if pid else [])
 
             # Normaliza e remove duplicados
             product_ids = [p for p in product_ids if p]
@@ -389,25 +527,19 @@ class AsaasService:
                     sale.themembers_temp_password = final_password
                 sale.save()
 
-                # Marca vendas relacionadas (se houver)
-                if sale.asaas_payment_id:
-                    try:
-                        from sales.models import Sale as SaleModel
-                        related_sales = SaleModel.objects.filter(asaas_payment_id=sale.asaas_payment_id)
-                        for rs in related_sales:
-                            if not rs.themembers_access_granted:
-                                rs.themembers_access_granted = True
-                                rs.status = 'paid'
-                                if final_password:
-                                    rs.themembers_temp_password = final_password
-                                rs.save()
-                    except Exception:
-                        pass
+                # Marca vendas relacionadas do checkout (se houver) num único UPDATE
+                related_ids = [item.sale_id for item in items if item.sale_id != sale.pk]
+                if related_ids:
+                    related_updates = {'themembers_access_granted': True, 'status': 'paid', 'updated_at': timezone.now()}
+                    if final_password:
+                        related_updates['themembers_temp_password'] = final_password
+                    if Sale.objects.filter(pk__in=related_ids, themembers_access_granted=False).update(**related_updates):
+                        bump_sales_version()
 
                 # Envia e-mail de acesso (uma vez, com contexto do curso principal)
                 try:
                     # ✅ NOVO: Verifica se é usuário novo ou existente
-                    is_new_user = themembers_result.get('new_user', True)
+                    is_new_user = result.get('new_user', True)
                     
                     if is_new_user:
                         # Usuário novo - envia email com senha
@@ -1,3 +1,430 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from courses.models import Category, Course
+from professors.models import Professor
+from sales.models import Sale
+from sales.services import register_checkout
+from . import client
+from .models import AsaasCustomer, AsaasPayment, AsaasWebhookLog
+from .reconciliation import reconcile_payments
+from .replay import group_by_payment, replay_webhook_logs
+from .services import AsaasService
+from .webhooks import claim_webhook_logs, process_pending_webhooks, requeue_webhook_logs
+
+
+class FakeAsaasApi:
+    """Substitui AsaasService._make_request registrando as chamadas feitas à API."""
+
+    def __init__(self, fail_payments=0):
+        self.calls = []
+        self.fail_payments = fail_payments
+        self.customers = 0
+        self.payments = 0
+
+    def __call__(self, method, endpoint, data=None, params=None):
+        self.calls.append((method, endpoint))
+        if endpoint == 'customers' and method == 'GET':
+            return {'data': []}
+        if endpoint == 'customers':
+            self.customers += 1
+            return {'id': f'cus_{self.customers}'}
+        if endpoint == 'payments':
+            if self.fail_payments:
+                self.fail_payments -= 1
+                return None
+            self.payments += 1
+            return {'id': f'pay_{self.payments}', 'billingType': 'BOLETO', 'status': 'PENDING'}
+        return None
+
+    def customer_calls(self):
+        return [call for call in self.calls if call[1].startswith('customers')]
+
+
+class AsaasCustomerRegistryTests(TestCase):
+    """Checkouts de compradores conhecidos usam o cadastro local, sem chamar a API de clientes."""
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            title='Curso', description='Descrição', price=50, duration='10h',
+            professor=Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos'),
+            category=Category.objects.create(name='Categoria', slug='categoria'),
+        )
+
+    def _sale(self, email='Aluno@Example.com ', cpf_cnpj='123.456.789-09'):
+        return Sale.objects.create(
+            student_name='Aluno', email=email, phone='1', cpf_cnpj=cpf_cnpj, price=50,
+            payment_method='bank_slip', course=self.course,
+        )
+
+    def _create_payment(self, api, sale):
+        service = AsaasService()
+        with mock.patch.object(service, '_make_request', api):
+            return service.create_payment(sale, 'bank_slip')
+
+    def test_known_customer_skips_customer_api(self):
+        api = FakeAsaasApi()
+        first = self._create_payment(api, self._sale())
+        self.assertEqual(len(api.customer_calls()), 2)
+        customer = AsaasCustomer.objects.get()
+        self.assertEqual((customer.email, customer.cpf_cnpj), ('aluno@example.com', '12345678909'))
+
+        api.calls.clear()
+        second = self._create_payment(api, self._sale(email='aluno@example.com', cpf_cnpj='12345678909'))
+        self.assertEqual(api.customer_calls(), [])
+        self.assertEqual(second.asaas_customer_id, first.asaas_customer_id)
+
+    def test_different_document_goes_to_api(self):
+        api = FakeAsaasApi()
+        self._create_payment(api, self._sale())
+        api.calls.clear()
+        self._create_payment(api, self._sale(cpf_cnpj='98765432100'))
+        self.assertEqual(len(api.customer_calls()), 2)
+        self.assertEqual(AsaasCustomer.objects.count(), 2)
+
+    def test_sale_without_document_goes_to_api(self):
+        api = FakeAsaasApi()
+        self._create_payment(api, self._sale())
+        api.calls.clear()
+        # Mesmo email sem CPF/CNPJ: não herda o cliente (nome e documento) de outra compra
+        self._create_payment(api, self._sale(cpf_cnpj=''))
+        self.assertEqual(len(api.customer_calls()), 2)
+
+    def test_changed_name_goes_to_api_and_updates_registry(self):
+        api = FakeAsaasApi()
+        self._create_payment(api, self._sale())
+        api.calls.clear()
+        sale = self._sale()
+        sale.student_name = 'Aluno Renomeado'
+        self._create_payment(api, sale)
+        self.assertEqual(len(api.customer_calls()), 2)
+        self.assertIn('Aluno Renomeado', AsaasCustomer.objects.values_list('name', flat=True))
+
+    def test_stale_local_customer_is_replaced(self):
+        AsaasCustomer.objects.create(
+            asaas_customer_id='cus_removido', email='aluno@example.com', cpf_cnpj='12345678909', name='Aluno'
+        )
+        api = FakeAsaasApi(fail_payments=1)
+        payment = self._create_payment(api, self._sale())
+        self.assertIsNotNone(payment)
+        self.assertEqual(payment.asaas_customer_id, 'cus_1')
+        self.assertEqual(list(AsaasCustomer.objects.values_list('asaas_customer_id', flat=True)), ['cus_1'])
+
+
+class PaymentReconciliationTests(TestCase):
+    """A reconciliação corrige os status em lote a partir das páginas da listagem do Asaas."""
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            title='Curso', description='Descrição', price=50, duration='10h',
+            professor=Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos'),
+            category=Category.objects.create(name='Categoria', slug='categoria'),
+        )
+        self.cart = self._checkout('pay_1', items=2)
+        self.pending = self._checkout('pay_2')
+        self.paid = self._checkout('pay_3', status='paid', asaas_status='RECEIVED')
+
+    def _checkout(self, payment_id, items=1, status='pending', asaas_status='PENDING'):
+        sales = [
+            Sale.objects.create(
+                student_name='Aluno', email='aluno@example.com', phone='1', course=self.course, price=50,
+                payment_method='pix', status=status, asaas_payment_id=payment_id,
+            )
+            for _ in range(items)
+        ]
+        register_checkout(sales)
+        AsaasPayment.objects.create(
+            sale=sales[0], asaas_id=payment_id, asaas_customer_id='cus_1', payment_type='PIX', status=asaas_status,
+            value=50 * items, due_date=timezone.localdate(), customer_name='Aluno', customer_email='aluno@example.com',
+        )
+        return sales
+
+    def _reconcile(self, remote, page_size=2):
+        calls = []
+
+        def list_payments(method, endpoint, data=None, params=None):
+            calls.append(params)
+            offset = params['offset']
+            return {'data': remote[offset:offset + page_size], 'hasMore': offset + page_size < len(remote)}
+
+        service = AsaasService()
+        with mock.patch.object(service, '_make_request', list_payments), \
+                mock.patch.object(service, '_grant_themembers_access_if_needed') as grant:
+            today = timezone.localdate()
+            summary = reconcile_payments(today, today, service=service, page_size=page_size)
+        return summary, calls, grant
+
+    def test_applies_drift_and_grants_only_newly_paid(self):
+        remote = [
+            {'id': 'pay_1', 'status': 'RECEIVED', 'value': 100, 'paymentDate': '2026-01-10'},
+            {'id': 'pay_2', 'status': 'OVERDUE', 'value': 50},
+            {'id': 'pay_3', 'status': 'RECEIVED', 'value': 50},
+            {'id': 'pay_externo', 'status': 'PENDING', 'value': 10},
+        ]
+        summary, calls, grant = self._reconcile(remote)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(summary, {'fetched': 4, 'updated': 2, 'paid': 1, 'missing': 1})
+        payments = dict(AsaasPayment.objects.values_list('asaas_id', 'status'))
+        self.assertEqual(payments, {'pay_1': 'RECEIVED', 'pay_2': 'OVERDUE', 'pay_3': 'RECEIVED'})
+        self.assertEqual(AsaasPayment.objects.get(asaas_id='pay_1').payment_date.date(), date(2026, 1, 10))
+        # Carrinho inteiro pago; acesso concedido uma vez, pela venda principal
+        self.assertEqual(set(Sale.objects.filter(asaas_payment_id='pay_1').values_list('status', flat=True)), {'paid'})
+        self.assertEqual(Sale.objects.get(pk=self.pending[0].pk).status, 'pending')
+        self.assertEqual([call.args[0].pk for call in grant.call_args_list], [self.cart[0].pk])
+
+    def test_nothing_changed_issues_no_writes(self):
+        summary, _, grant = self._reconcile([{'id': 'pay_2', 'status': 'PENDING', 'value': 50}])
+        self.assertEqual(summary['updated'], 0)
+        grant.assert_not_called()
+
+
+class FlakyAsaasHandler(BaseHTTPRequestHandler):
+    """Servidor local que responde 503 nas primeiras `failures` chamadas e depois 200."""
+    failures = 0
+    calls = []
+
+    def _respond(self):
+        type(self).calls.append((self.command, self.path))
+        if type(self).failures:
+            type(self).failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({'id': 'pay_1', 'status': 'PENDING'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(ASAAS_RETRY_BACKOFF=0, ASAAS_MAX_RETRIES=2)
+class AsaasHttpClientTests(SimpleTestCase):
+    """Session compartilhada com timeout, retentativas das chamadas idempotentes e métricas."""
+
+    def setUp(self):
+        client.reset_session()
+        client.reset_metrics()
+        FlakyAsaasHandler.calls = []
+        self.server = HTTPServer(('127.0.0.1', 0), FlakyAsaasHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.service = AsaasService()
+        self.service.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client.reset_session()
+        client.reset_metrics()
+
+    def test_session_is_shared_and_requests_have_timeouts(self):
+        self.assertIs(client.get_session(), client.get_session())
+        with mock.patch.object(client.get_session(), 'request', wraps=client.get_session().request) as request:
+            self.service.get_payment_status('pay_1')
+        self.assertEqual(request.call_args.kwargs['timeout'], (3.05, 20))
+
+    def test_idempotent_calls_are_retried(self):
+        FlakyAsaasHandler.failures = 2
+        self.assertEqual(self.service.get_payment_status('pay_1')['id'], 'pay_1')
+        self.assertEqual(len(FlakyAsaasHandler.calls), 3)
+
+    def test_post_is_not_retried(self):
+        FlakyAsaasHandler.failures = 1
+        self.assertIsNone(self.service.cancel_payment('pay_1'))
+        self.assertEqual(len(FlakyAsaasHandler.calls), 1)
+
+    def test_latency_metrics_per_endpoint(self):
+        self.service.get_payment_status('pay_1')
+        self.service.get_payment_status('pay_2')
+        FlakyAsaasHandler.failures = 1
+        self.service.cancel_payment('pay_1')
+        metrics = client.request_metrics()
+        self.assertEqual(metrics['GET payments/{id}']['count'], 2)
+        self.assertEqual(metrics['POST payments/{id}/cancel']['errors'], 1)
+
+
+@override_settings(WEBHOOK_MAX_ATTEMPTS=2, WEBHOOK_RETRY_BASE_SECONDS=30)
+class WebhookQueueTests(TestCase):
+    """A view só grava o webhook; o worker processa com retentativas."""
+
+    def setUp(self):
+        self.sale = Sale.objects.create(
+            student_name='Aluno', email='aluno@example.com', phone='1', price=50,
+            payment_method='pix', asaas_payment_id='pay_1',
+        )
+        register_checkout([self.sale])
+
+    def _post(self, webhook_id='evt_1', payment_id='pay_1'):
+        return self.client.post(
+            '/api/v1/asaas/webhook/',
+            data=json.dumps({'id': webhook_id, 'event': 'PAYMENT_RECEIVED', 'payment': {'id': payment_id}}),
+            content_type='application/json',
+            HTTP_USER_AGENT='Asaas_Hmlg/3.0',
+        )
+
+    def _create_payment(self):
+        AsaasPayment.objects.create(
+            sale=self.sale, asaas_id='pay_1', asaas_customer_id='cus_1', payment_type='PIX', value=50,
+            due_date=timezone.localdate(), customer_name='Aluno', customer_email='aluno@example.com',
+        )
+
+    def test_view_acknowledges_without_processing(self):
+        with mock.patch.object(AsaasService, 'apply_webhook_log') as apply:
+            self.assertEqual(self._post().status_code, 200)
+            self.assertEqual(self._post().status_code, 200)
+        apply.assert_not_called()
+        log = AsaasWebhookLog.objects.get()
+        self.assertFalse(log.processed)
+        self.assertEqual(log.payment_id, 'pay_1')
+
+    def test_worker_processes_queue(self):
+        self._create_payment()
+        self._post()
+        with mock.patch.object(AsaasService, '_grant_themembers_access_if_needed') as grant:
+            self.assertEqual(process_pending_webhooks(), (1, 0))
+        grant.assert_called_once()
+        self.assertEqual(Sale.objects.get().status, 'paid')
+        self.assertTrue(AsaasWebhookLog.objects.get().processed)
+        self.assertEqual(process_pending_webhooks(), (0, 0))
+
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        # Webhook chega antes do pagamento local existir
+        self._post()
+        self.assertEqual(process_pending_webhooks(), (0, 1))
+        log = AsaasWebhookLog.objects.get()
+        self.assertEqual(log.attempts, 1)
+        self.assertFalse(log.processed)
+        self.assertGreater(log.next_attempt_at, timezone.now() + timedelta(seconds=20))
+        # Ainda não venceu: não é reivindicado de novo
+        self.assertEqual(claim_webhook_logs(), [])
+
+        AsaasWebhookLog.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_pending_webhooks(), (0, 1))
+        log.refresh_from_db()
+        self.assertTrue(log.processed)
+        self.assertIn('não encontrado', log.error_message)
+
+    def test_claimed_logs_are_leased(self):
+        self._post('evt_1')
+        self._post('evt_2')
+        self.assertEqual([log.webhook_id for log in claim_webhook_logs()], ['evt_1', 'evt_2'])
+        self.assertEqual(claim_webhook_logs(), [])
+
+    def test_admin_replay_only_requeues(self):
+        self._create_payment()
+        self._post()
+        AsaasWebhookLog.objects.update(
+            processed=True, processed_at=timezone.now(), error_message='falhou', attempts=5,
+        )
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'senha')
+        self.client.force_login(admin_user)
+
+        with mock.patch.object(AsaasService, 'apply_webhook_log') as apply:
+            response = self.client.post('/admin/integration_asas/asaaswebhooklog/', {
+                'action': 'replay_webhooks',
+                '_selected_action': [AsaasWebhookLog.objects.get().pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        apply.assert_not_called()
+        log_id = AsaasWebhookLog.objects.get().pk
+        messages = [str(message) for message in self.client.get(response.url).context['messages']]
+        self.assertIn('1 webhooks devolvidos à fila de processamento', messages)
+        self.assertIn(f'python manage.py replay_asaas_webhooks --id {log_id}', messages[1])
+        log = AsaasWebhookLog.objects.get()
+        self.assertEqual((log.processed, log.error_message, log.attempts), (False, '', 0))
+
+        # O worker da fila o processa na próxima rodada
+        with mock.patch.object(AsaasService, '_grant_themembers_access_if_needed'):
+            self.assertEqual(process_pending_webhooks(), (1, 0))
+        self.assertEqual(Sale.objects.get().status, 'paid')
+        self.assertEqual(requeue_webhook_logs(AsaasWebhookLog.objects.none()), 0)
+
+
+class WebhookReplayTests(TestCase):
+    """Reprocessamento em lote: paralelo entre pagamentos, em sequência no mesmo pagamento."""
+
+    def _log(self, webhook_id, payment_id, error='falhou'):
+        return AsaasWebhookLog.objects.create(
+            webhook_id=webhook_id, event_type='PAYMENT_RECEIVED', payment_id=payment_id,
+            raw_data={'id': webhook_id, 'event': 'PAYMENT_RECEIVED', 'payment': {'id': payment_id}},
+            processed=True, processed_at=timezone.now(), error_message=error, attempts=5,
+        )
+
+    def test_groups_keep_arrival_order_per_payment(self):
+        logs = [self._log('evt_1', 'pay_1'), self._log('evt_2', 'pay_2'), self._log('evt_3', 'pay_1')]
+        groups = group_by_payment(reversed(logs))
+        self.assertEqual([[log.webhook_id for log in group] for group in groups], [['evt_1', 'evt_3'], ['evt_2']])
+
+    def test_replays_failed_log_after_payment_exists(self):
+        sale = Sale.objects.create(
+            student_name='Aluno', email='aluno@example.com', phone='1', price=50,
+            payment_method='pix', asaas_payment_id='pay_1',
+        )
+        register_checkout([sale])
+        AsaasPayment.objects.create(
+            sale=sale, asaas_id='pay_1', asaas_customer_id='cus_1', payment_type='PIX', value=50,
+            due_date=timezone.localdate(), customer_name='Aluno', customer_email='aluno@example.com',
+        )
+        self._log('evt_1', 'pay_1', error='Pagamento pay_1 não encontrado localmente')
+        self._log('evt_2', 'pay_missing')
+
+        with mock.patch.object(AsaasService, '_grant_themembers_access_if_needed') as grant:
+            result = replay_webhook_logs(AsaasWebhookLog.objects.exclude(error_message=''), workers=1)
+
+        grant.assert_called_once()
+        self.assertEqual((result['total'], result['succeeded'], result['failed']), (2, 1, 1))
+        self.assertEqual(Sale.objects.get().status, 'paid')
+        replayed = AsaasWebhookLog.objects.get(webhook_id='evt_1')
+        self.assertTrue(replayed.processed)
+        self.assertEqual(replayed.error_message, '')
+        failed = next(outcome for outcome in result['outcomes'] if not outcome['ok'])
+        self.assertEqual(failed['webhook_id'], 'evt_2')
+        self.assertTrue(failed['error'])
+
+    def test_same_payment_is_never_replayed_concurrently(self):
+        for i in range(12):
+            self._log(f'evt_{i}', f'pay_{i % 3}')
+        lock = threading.Lock()
+        active = set()
+        overlaps = []
+        calls = []
+
+        def process_webhook(webhook_data):
+            payment_id = webhook_data['payment']['id']
+            with lock:
+                if payment_id in active:
+                    overlaps.append(payment_id)
+                active.add(payment_id)
+                calls.append(webhook_data['id'])
+            time.sleep(0.01)
+            with lock:
+                active.discard(payment_id)
+            return True
+
+        with mock.patch.object(AsaasService, 'process_webhook', side_effect=process_webhook):
+            result = replay_webhook_logs(AsaasWebhookLog.objects.all(), workers=4)
+
+        self.assertEqual(overlaps, [])
+        self.assertEqual(result['succeeded'], 12)
+        self.assertGreater(result['throughput'], 0)
+        # Dentro de cada pagamento, na ordem de chegada
+        for payment in range(3):
+            ids = [int(webhook_id.split('_')[1]) for webhook_id in calls if int(webhook_id.split('_')[1]) % 3 == payment]
+            self.assertEqual(ids, sorted(ids))
+        # Reabertos e reservados: o worker da fila não os pega enquanto o replay roda
+        self.assertEqual(claim_webhook_logs(), [])
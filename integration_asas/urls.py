@@ -12,6 +12,7 @@ urlpatterns = [
     # Listagens
     path('payments/', views.list_payments, name='list_payments'),
     path('webhook-logs/', views.list_webhook_logs, name='list_webhook_logs'),
+    path('metrics/', views.request_metrics, name='request_metrics'),
     
     # Webhook (sem autenticação)
     path('webhook/', views.AsaasWebhookView.as_view(), name='webhook'),
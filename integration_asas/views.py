@@ -1,6 +1,6 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -8,14 +8,16 @@ from django.views import View
 from django.http import HttpResponse
 import json
 
+from . import client
 from .services import AsaasService
-from themembers.services import SubscriptionService
+from .webhooks import enqueue_webhook
 from .serializers import (
     AsaasPaymentSerializer, AsaasWebhookLogSerializer,
     CreatePaymentRequestSerializer, PaymentStatusResponseSerializer,
     WebhookDataSerializer
 )
 from .models import AsaasPayment, AsaasWebhookLog
+from app.pagination import KeysetPagination, keyset_requested
 
 
 @api_view(['POST'])
@@ -162,16 +164,40 @@ def cancel_payment(request, payment_id):
 
 @api_view(['GET'])
 def list_payments(request):
-    """Lista todos os pagamentos Asaas"""
+    """
+    Lista todos os pagamentos Asaas
+    Com ?pagination=cursor, pagina por cursor (-created_at, -id) (ver app/pagination.py)
+    """
     payments = AsaasPayment.objects.all().order_by('-created_at')
+    if keyset_requested(request):
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(payments, request)
+        serializer = AsaasPaymentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     serializer = AsaasPaymentSerializer(payments, many=True)
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """Latência das chamadas à API do Asaas por endpoint, neste processo (ver client.py)"""
+    return Response(client.request_metrics())
+
+
 @api_view(['GET'])
 def list_webhook_logs(request):
-    """Lista logs de webhooks"""
+    """
+    Lista logs de webhooks
+    Com ?pagination=cursor, pagina por cursor (-received_at, -id) (ver app/pagination.py)
+    """
     logs = AsaasWebhookLog.objects.all().order_by('-received_at')
+    if keyset_requested(request):
+        paginator = KeysetPagination()
+        paginator.keyset_field = 'received_at'
+        page = paginator.paginate_queryset(logs, request)
+        serializer = AsaasWebhookLogSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     serializer = AsaasWebhookLogSerializer(logs, many=True)
     return Response(serializer.data)
 
@@ -195,38 +221,11 @@ class AsaasWebhookView(View):
             if not serializer.is_valid():
                 return HttpResponse('Invalid webhook data', status=400)
             
-            # Processa webhook
-            asaas_service = AsaasService()
-            success = asaas_service.process_webhook(webhook_data)
-
-            # Se pago/confirmado, cria acesso na TheMembers de forma síncrona
-            try:
-                event = webhook_data.get('event')
-                payment = webhook_data.get('payment', {})
-                if event in ['PAYMENT_RECEIVED', 'PAYMENT_CONFIRMED']:
-                    ap = AsaasPayment.objects.filter(asaas_id=payment.get('id')).select_related('sale', 'sale__course').first()
-                    if ap and not ap.sale.themembers_access_granted:
-                        course = ap.sale.course
-                        product_id = getattr(course, 'themembers_product_id', None)
-                        if product_id:
-                            sub_service = SubscriptionService()
-                            sub_service.create_user_subscription({
-                                'student_name': ap.sale.student_name,
-                                'email': ap.sale.email,
-                                'phone': ap.sale.phone,
-                                'cpf_cnpj': ap.sale.cpf_cnpj,
-                                'sale_id': ap.sale.id,
-                                'themembers_product_id': product_id,
-                                'themembers_link': getattr(course, 'themembers_link', '') or '',
-                            })
-            except Exception as e:
-                print(f"Webhook grant TheMembers error: {e}")
-            
-            if success:
-                return HttpResponse('OK', status=200)
-            else:
-                # Idempotência: já existe log do mesmo webhook_id ou erro conhecido
-                return HttpResponse('OK', status=200)
+            # OTIMIZADO: só grava na fila e responde; o processamento (pagamento, venda,
+            # acesso TheMembers e e-mails) fica com o worker process_asaas_webhooks
+            # (ver integration_asas/webhooks.py)
+            enqueue_webhook(webhook_data)
+            return HttpResponse('OK', status=200)
                 
         except json.JSONDecodeError:
             return HttpResponse('Invalid JSON', status=400)
@@ -0,0 +1,118 @@
+"""
+Fila dos webhooks do Asaas no próprio banco (sem broker).
+
+A view só valida e grava o AsaasWebhookLog (idempotente pelo webhook_id) e responde
+200 na hora; o processamento (pagamento, venda, carrinho, acesso TheMembers e
+e-mails) fica com o worker (comando process_asaas_webhooks), para que parceiros
+lentos não prendam os workers web nem provoquem retentativas do Asaas.
+
+O worker reivindica lotes de logs pendentes com SELECT ... FOR UPDATE SKIP LOCKED
+(vários workers não pegam os mesmos logs) e, na mesma transação curta, adia o
+next_attempt_at dos reivindicados (lease): o processamento roda fora da transação e,
+se o worker cair, os logs voltam para a fila quando o lease vence. Falhas são
+repetidas com backoff exponencial até WEBHOOK_MAX_ATTEMPTS tentativas.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AsaasPayment, AsaasWebhookLog
+from .services import AsaasService
+
+BATCH_SIZE = 20
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_webhook(webhook_data):
+    """Grava o webhook na fila. Retorna (log, criado); repetições do Asaas não duplicam."""
+    payment_id = (webhook_data.get('payment') or {}).get('id') or ''
+    try:
+        with transaction.atomic():
+            return AsaasWebhookLog.objects.get_or_create(
+                webhook_id=webhook_data.get('id'),
+                defaults={
+                    'event_type': webhook_data.get('event'),
+                    'payment_id': payment_id,
+                    'raw_data': webhook_data,
+                }
+            )
+    except IntegrityError:
+        # Mesmo webhook_id gravado em paralelo
+        return AsaasWebhookLog.objects.get(webhook_id=webhook_data.get('id')), False
+
+
+def requeue_webhook_logs(queryset):
+    """Reabre os logs do queryset num único UPDATE para o worker processá-los de novo. Retorna quantos."""
+    return AsaasWebhookLog.objects.filter(pk__in=queryset.order_by().values('pk')).update(
+        processed=False, processed_at=None, error_message='', attempts=0, next_attempt_at=timezone.now(),
+    )
+
+
+def claim_webhook_logs(batch_size=BATCH_SIZE):
+    """Reivindica até batch_size logs pendentes para este worker e os retorna em ordem de chegada."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            AsaasWebhookLog.objects.select_for_update(skip_locked=True)
+            .filter(processed=False, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        AsaasWebhookLog.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=_setting('WEBHOOK_LEASE_SECONDS', 300)),
+        )
+    return list(AsaasWebhookLog.objects.filter(pk__in=ids).order_by('received_at', 'id'))
+
+
+def retry_delay(attempts):
+    """Backoff exponencial: WEBHOOK_RETRY_BASE_SECONDS * 2^(tentativas - 1), limitado a 1 hora."""
+    return min(_setting('WEBHOOK_RETRY_BASE_SECONDS', 30) * 2 ** max(attempts - 1, 0), 3600)
+
+
+def process_webhook_log(webhook_log, service=None):
+    """Processa um log reivindicado. Retorna True se processado; senão agenda a próxima tentativa."""
+    service = service or AsaasService()
+    try:
+        service.apply_webhook_log(webhook_log)
+        return True
+    except AsaasPayment.DoesNotExist:
+        # O webhook pode chegar antes do commit do pagamento criado no checkout
+        error = f"Pagamento {webhook_log.payment_id} não encontrado localmente"
+    except Exception as e:
+        error = str(e)
+
+    print(f"Erro ao processar webhook {webhook_log.webhook_id} (tentativa {webhook_log.attempts}): {error}")
+    updates = {'error_message': error}
+    if webhook_log.attempts >= _setting('WEBHOOK_MAX_ATTEMPTS', 5):
+        # Desiste: fica registrado com o erro para reprocessamento manual
+        updates.update(processed=True, processed_at=timezone.now())
+    else:
+        updates['next_attempt_at'] = timezone.now() + timedelta(seconds=retry_delay(webhook_log.attempts))
+    AsaasWebhookLog.objects.filter(pk=webhook_log.pk).update(**updates)
+    return False
+
+
+def process_pending_webhooks(batch_size=BATCH_SIZE, max_batches=None):
+    """Processa lotes até esvaziar a fila (ou max_batches). Retorna (processados, falhas)."""
+    service = AsaasService()
+    processed = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        logs = claim_webhook_logs(batch_size)
+        if not logs:
+            break
+        batches += 1
+        for webhook_log in logs:
+            if process_webhook_log(webhook_log, service):
+                processed += 1
+            else:
+                failed += 1
+    return processed, failed
@@ -2,28 +2,34 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from courses.cache import ConditionalGetMixin
+from courses.search import FullTextSearchFilter
 from .models import News
 from .serializers import NewsSerializer, NewsListSerializer, NewsDetailSerializer
 
 
 # Views Públicas (API)
-class NewsListView(generics.ListAPIView):
+class NewsListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Lista notícias publicadas
+    Busca (?search=) indexada e ordenada por relevância (ver courses/search.py)
+    Suporta GET condicional (ETag/Last-Modified -> 304)
     """
     queryset = News.objects.filter(status='published')
     serializer_class = NewsListSerializer
     permission_classes = [AllowAny]  # Acesso público
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['category', 'urgent']
     search_fields = ['title', 'excerpt', 'content']
+    search_weights = {'title': 3, 'excerpt': 2}
     ordering_fields = ['date', 'created_at', 'urgent']
     ordering = ['-date', '-created_at']
 
 
-class NewsDetailView(generics.RetrieveAPIView):
+class NewsDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Detalhes de uma notícia específica
+    Suporta GET condicional (ETag/Last-Modified -> 304)
     """
     queryset = News.objects.filter(status='published')
     serializer_class = NewsDetailSerializer
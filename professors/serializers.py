@@ -2,18 +2,27 @@ from rest_framework import serializers
 from .models import Professor
 
 
-class ProfessorSerializer(serializers.ModelSerializer):
+class CoursesCountMixin:
+    """
+    courses_count dos serializers de professor/categoria: usa a contagem anotada
+    na query quando disponível (evita N+1) e, senão, conta os cursos do objeto.
+    """
+
+    def get_courses_count(self, obj):
+        if hasattr(obj, 'courses_count'):
+            return obj.courses_count
+        return obj.course_set.count()
+
+
+class ProfessorSerializer(CoursesCountMixin, serializers.ModelSerializer):
     courses_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Professor
         fields = '__all__'
-    
-    def get_courses_count(self, obj):
-        return obj.course_set.count()
 
 
-class ProfessorListSerializer(serializers.ModelSerializer):
+class ProfessorListSerializer(CoursesCountMixin, serializers.ModelSerializer):
     courses_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -22,17 +31,11 @@ class ProfessorListSerializer(serializers.ModelSerializer):
             'id', 'name', 'specialties', 'approvals_count', 
             'rating', 'image', 'created_at', 'courses_count'
         ]
-    
-    def get_courses_count(self, obj):
-        return obj.course_set.count()
 
 
-class ProfessorDetailSerializer(serializers.ModelSerializer):
+class ProfessorDetailSerializer(CoursesCountMixin, serializers.ModelSerializer):
     courses_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Professor
         fields = '__all__'
-    
-    def get_courses_count(self, obj):
-        return obj.course_set.count() 
\ No newline at end of file
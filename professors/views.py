@@ -3,6 +3,7 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from courses.cache import ConditionalGetMixin
 from .models import Professor
 from .serializers import ProfessorSerializer, ProfessorListSerializer, ProfessorDetailSerializer
 
@@ -10,10 +11,12 @@ from .serializers import ProfessorSerializer, ProfessorListSerializer, Professor
 # Create your views here.
 
 # Views Públicas (API)
-class ProfessorListView(generics.ListAPIView):
+class ProfessorListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Lista todos os professores
+    Suporta GET condicional (ETag/Last-Modified -> 304)
     """
+    conditional_uses_catalog = True  # courses_count depende dos cursos
     queryset = Professor.objects.all()
     serializer_class = ProfessorDetailSerializer  # Mudança: usar DetailSerializer para retornar todos os campos
     permission_classes = [AllowAny]  # Acesso público
@@ -23,10 +26,12 @@ class ProfessorListView(generics.ListAPIView):
     ordering = ['name']
 
 
-class ProfessorDetailView(generics.RetrieveAPIView):
+class ProfessorDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Detalhes de um professor específico
+    Suporta GET condicional (ETag/Last-Modified -> 304)
     """
+    conditional_uses_catalog = True  # courses_count depende dos cursos
     queryset = Professor.objects.all()
     serializer_class = ProfessorDetailSerializer
     permission_classes = [AllowAny]  # Acesso público
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Sale
+from .models import Sale, Checkout, CheckoutItem, IdempotencyKey, ArchivedSale
 
 
 @admin.register(Sale)
@@ -49,3 +49,49 @@ class SaleAdmin(admin.ModelAdmin):
     def full_address_display(self, obj):
         return obj.full_address
     full_address_display.short_description = 'Endereço Completo'
+
+
+class CheckoutItemInline(admin.TabularInline):
+    model = CheckoutItem
+    extra = 0
+    raw_id_fields = ['sale', 'course']
+    readonly_fields = ['course_title_snapshot']
+
+
+@admin.register(Checkout)
+class CheckoutAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'student_name', 'email', 'total', 'payment_method',
+        'status', 'asaas_payment_id', 'created_at'
+    ]
+    list_filter = ['status', 'payment_method', 'created_at']
+    search_fields = ['student_name', 'email', 'asaas_payment_id']
+    readonly_fields = ['created_at', 'updated_at']
+    date_hierarchy = 'created_at'
+    inlines = [CheckoutItemInline]
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'endpoint', 'status', 'response_status', 'created_at']
+    list_filter = ['status', 'endpoint']
+    search_fields = ['key']
+    readonly_fields = ['fingerprint', 'response_body', 'created_at', 'updated_at']
+
+
+@admin.register(ArchivedSale)
+class ArchivedSaleAdmin(admin.ModelAdmin):
+    """Vendas arquivadas: somente leitura"""
+    list_display = [
+        'id', 'student_name', 'email', 'course_title_snapshot', 'price',
+        'payment_method', 'status', 'asaas_payment_id', 'late_payment_at', 'created_at', 'archived_at'
+    ]
+    list_filter = ['payment_method', ('late_payment_at', admin.EmptyFieldListFilter), 'created_at']
+    search_fields = ['student_name', 'email', 'asaas_payment_id']
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
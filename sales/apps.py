@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sales'
+
+    def ready(self):
+        # Invalida o cache das estatísticas de vendas quando vendas mudam
+        from .signals import connect_sales_signals
+        connect_sales_signals()
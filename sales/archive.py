@@ -0,0 +1,156 @@
+"""
+Expiração das vendas pendentes abandonadas e arquivamento das canceladas antigas.
+
+Todo checkout não pago deixava uma venda 'pending' (e o AsaasPayment) para sempre,
+inflando os índices e as contagens por status do painel. O job (comando
+expire_stale_sales) roda em lotes curtos, cada um na sua transação:
+
+1. cancela as vendas pendentes cujo pagamento Asaas venceu há mais de
+   SALE_EXPIRY_GRACE_DAYS dias (o carrinho inteiro, pelo asaas_payment_id). A cobrança
+   é removida no Asaas antes (o boleto/PIX deixa de poder ser pago); uma cobrança que
+   já não existe no Asaas (removida pelo painel, 404) conta como removida. Se a remoção
+   falhar, a venda continua pendente e é tentada de novo na próxima execução;
+2. move as vendas canceladas há mais de SALE_ARCHIVE_AFTER_DAYS dias para
+   ArchivedSale (com os dados do pagamento) e as remove da tabela de vendas. O
+   asaas_payment_id fica no arquivo: um pagamento que ainda chegue por webhook é
+   marcado na venda arquivada para reembolso (ver AsaasService.apply_webhook_log).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
+
+from integration_asas.models import AsaasPayment
+from integration_asas.services import AsaasService
+from .cache import bump_sales_version
+from .models import Sale, Checkout, ArchivedSale
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Status do Asaas de cobranças ainda em aberto (não pagas nem estornadas)
+OPEN_ASAAS_STATUSES = ('PENDING', 'OVERDUE')
+
+
+def _cancel_remote_charge(service, asaas_id, installment_id):
+    """Remove a cobrança (ou o carnê inteiro) no Asaas. Retorna True se removida."""
+    if installment_id:
+        response = service.delete_installment(installment_id)
+    else:
+        response = service.delete_payment(asaas_id)
+    if not response or not response.get('deleted'):
+        logger.warning("Cobrança %s não pôde ser removida no Asaas; venda mantida pendente", asaas_id)
+        return False
+    return True
+
+
+def expire_stale_pending_sales(grace_days=None, batch_size=BATCH_SIZE, service=None):
+    """Cancela as vendas pendentes com pagamento vencido. Retorna quantas foram canceladas."""
+    if grace_days is None:
+        grace_days = getattr(settings, 'SALE_EXPIRY_GRACE_DAYS', 3)
+    service = service or AsaasService()
+    cutoff = timezone.localdate() - timedelta(days=grace_days)
+    payments = (
+        AsaasPayment.objects.filter(due_date__lt=cutoff, status__in=OPEN_ASAAS_STATUSES, sale__status='pending')
+        .order_by('id')
+        .values_list('id', 'asaas_id', 'installment_id')
+    )
+
+    expired = 0
+    last_id = 0
+    while True:
+        batch = list(payments.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        # Chamadas ao Asaas fora da transação; só as cobranças removidas são canceladas aqui
+        payment_ids = [
+            asaas_id for _, asaas_id, installment_id in batch
+            if _cancel_remote_charge(service, asaas_id, installment_id)
+        ]
+        count = 0
+        if payment_ids:
+            now = timezone.now()
+            with transaction.atomic():
+                # Venda principal e vendas relacionadas do carrinho compartilham o asaas_payment_id
+                count = Sale.objects.filter(status='pending', asaas_payment_id__in=payment_ids).update(
+                    status='cancelled', updated_at=now
+                )
+                Checkout.objects.filter(status='pending', asaas_payment_id__in=payment_ids).update(
+                    status='cancelled', updated_at=now
+                )
+                if count:
+                    # update() não dispara sinais: invalida as estatísticas aqui
+                    bump_sales_version()
+        expired += count
+        if len(batch) < batch_size:
+            break
+    return expired
+
+
+def _archived_sale(sale):
+    try:
+        payment = sale.asaas_payment
+    except ObjectDoesNotExist:
+        payment = None
+    try:
+        checkout_id = sale.checkout_item.checkout_id
+    except ObjectDoesNotExist:
+        checkout_id = None
+    return ArchivedSale(
+        id=sale.id,
+        student_name=sale.student_name,
+        email=sale.email,
+        phone=sale.phone,
+        cpf_cnpj=sale.cpf_cnpj,
+        course_id=sale.course_id,
+        course_title_snapshot=sale.course_title_snapshot,
+        price=sale.price,
+        payment_method=sale.payment_method,
+        status=sale.status,
+        bank_slip_installment_count=sale.bank_slip_installment_count,
+        checkout_id=checkout_id,
+        asaas_payment_id=sale.asaas_payment_id,
+        asaas_customer_id=payment.asaas_customer_id if payment else None,
+        asaas_status=payment.status if payment else None,
+        asaas_due_date=payment.due_date if payment else None,
+        created_at=sale.created_at,
+        updated_at=sale.updated_at,
+    )
+
+
+def archive_cancelled_sales(older_than_days=None, batch_size=BATCH_SIZE):
+    """Move as vendas canceladas antigas para ArchivedSale. Retorna quantas foram arquivadas."""
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'SALE_ARCHIVE_AFTER_DAYS', 90)
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    candidates = Sale.objects.filter(status='cancelled', updated_at__lt=cutoff).order_by('id')
+
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Trava o lote: um webhook não muda o status de uma venda enquanto ela é arquivada
+            sale_ids = list(
+                candidates.filter(id__gt=last_id).select_for_update().values_list('id', flat=True)[:batch_size]
+            )
+            if not sale_ids:
+                break
+            last_id = sale_ids[-1]
+            sales = list(
+                Sale.objects.filter(pk__in=sale_ids).select_related('asaas_payment', 'checkout_item')
+            )
+            rows = [_archived_sale(sale) for sale in sales]
+            ArchivedSale.objects.bulk_create(rows, ignore_conflicts=True)
+            checkout_ids = {row.checkout_id for row in rows if row.checkout_id}
+            # Remove as vendas (e, em cascata, os pagamentos e itens de checkout) e os checkouts que ficaram vazios
+            Sale.objects.filter(pk__in=sale_ids).delete()
+            Checkout.objects.filter(pk__in=checkout_ids, items__isnull=True).delete()
+        archived += len(sale_ids)
+        if len(sale_ids) < batch_size:
+            break
+    return archived
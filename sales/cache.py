@@ -0,0 +1,46 @@
+"""
+Cache das estatísticas de vendas do painel admin (sales_statistics).
+
+Os resultados ficam em cache por janela de dias sob uma "versão das vendas"
+global. Criar, excluir ou mudar o status (ou o valor) de uma venda troca a versão
+(ver sales/signals.py), invalidando todas as janelas de uma vez. O timeout limita
+o quanto a janela deslizante (últimos N dias) pode ficar defasada.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+SALES_VERSION_KEY = 'sales:version'
+
+
+def get_sales_version():
+    """Retorna a versão atual das vendas, criando se não existir."""
+    version = cache.get(SALES_VERSION_KEY)
+    if version is None:
+        # add() evita sobrescrever uma versão criada em paralelo por outro worker
+        cache.add(SALES_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(SALES_VERSION_KEY) or uuid.uuid4().hex
+    return version
+
+
+def bump_sales_version():
+    """Gera uma nova versão das vendas após o commit da transação atual."""
+    transaction.on_commit(
+        lambda: cache.set(SALES_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+    )
+
+
+def sales_statistics_cache_key(days):
+    return f'sales:{get_sales_version()}:statistics:{days}'
+
+
+def get_cached_sales_statistics(days, build):
+    """Estatísticas da janela de `days` dias em cache; build() calcula quando não há."""
+    key = sales_statistics_cache_key(days)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, 'SALES_STATISTICS_CACHE_TIMEOUT', 300))
+    return data
@@ -0,0 +1,60 @@
+"""
+Long-poll da confirmação de pagamento para a página de sucesso.
+
+Em vez de repetir o polling do payment-status a cada poucos segundos, a página chama
+GET payment-status/?wait=<s>: a requisição fica aguardando até o pagamento ser
+confirmado ou até o tempo pedido (limitado a PAYMENT_STATUS_MAX_WAIT) e responde o
+status como de costume.
+
+A confirmação é publicada, depois do commit, quando o pagamento passa a pago
+(AsaasService.apply_webhook_log e reconciliação):
+
+- grava uma chave por pagamento no cache (DatabaseCache em produção): requisições
+  aguardando em qualquer processo (o webhook é aplicado pelo worker
+  process_asaas_webhooks) a encontram lendo a chave a cada PAYMENT_STATUS_WAIT_INTERVAL;
+- acorda na hora as requisições do próprio processo (threading.Condition).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Por quanto tempo a confirmação fica visível para as requisições que aguardam
+CONFIRMED_KEY_TIMEOUT = 3600
+
+_broker = threading.Condition()
+
+
+def _confirmed_key(payment_id):
+    return f'sales:payment-confirmed:{payment_id}'
+
+
+def publish_payment_confirmed(payment_ids):
+    """Publica (após o commit) a confirmação dos pagamentos Asaas informados."""
+    payment_ids = [payment_id for payment_id in payment_ids if payment_id]
+    if not payment_ids:
+        return
+
+    def publish():
+        cache.set_many({_confirmed_key(payment_id): True for payment_id in payment_ids}, CONFIRMED_KEY_TIMEOUT)
+        with _broker:
+            _broker.notify_all()
+
+    transaction.on_commit(publish)
+
+
+def wait_for_payment(payment_id, timeout):
+    """Aguarda até `timeout` segundos a confirmação do pagamento. Retorna True se confirmado."""
+    deadline = time.monotonic() + timeout
+    interval = getattr(settings, 'PAYMENT_STATUS_WAIT_INTERVAL', 1)
+    key = _confirmed_key(payment_id)
+    while True:
+        if cache.get(key):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _broker:
+            _broker.wait(min(interval, remaining))
@@ -0,0 +1,187 @@
+"""
+Exportação das vendas (com pagamento Asaas, checkout e título do curso) em CSV ou XLSX.
+
+As linhas são lidas em lotes por keyset (id < último id do lote anterior) com
+values_list, sem instanciar modelos: cada lote é uma query curta pelo índice da PK
+e a memória fica constante mesmo com centenas de milhares de vendas (o mysqlclient
+carregaria o resultado inteiro de uma única query mesmo com .iterator()).
+CSV e XLSX são gerados enquanto são enviados: o zip do XLSX é escrito num buffer sem
+seek (zipfile grava os tamanhos nos descritores de dados após cada arquivo) que é
+esvaziado para a resposta a cada XLSX_CHUNK_SIZE bytes.
+"""
+import csv
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Sale
+
+EXPORT_BATCH_SIZE = 2000
+XLSX_CHUNK_SIZE = 64 * 1024
+
+PAYMENT_METHOD_LABELS = dict(Sale.PAYMENT_METHOD_CHOICES)
+STATUS_LABELS = dict(Sale.STATUS_CHOICES)
+
+EXPORT_FIELDS = (
+    'id', 'created_at', 'student_name', 'email', 'phone', 'cpf_cnpj',
+    'course__title', 'course_title_snapshot', 'price', 'payment_method', 'status',
+    'checkout_item__checkout_id', 'asaas_payment_id', 'asaas_payment__status',
+    'asaas_payment__payment_type', 'asaas_payment__value', 'asaas_payment__payment_date',
+    'themembers_access_granted',
+)
+
+EXPORT_HEADERS = (
+    'ID Venda', 'Data', 'Aluno', 'Email', 'Telefone', 'CPF/CNPJ', 'Curso', 'Valor',
+    'Método de Pagamento', 'Status', 'Checkout', 'ID Pagamento Asaas', 'Status Asaas',
+    'Tipo Asaas', 'Valor Asaas', 'Data do Pagamento', 'Acesso TheMembers',
+)
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def export_rows(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Linhas da exportação (na ordem de EXPORT_HEADERS), das vendas mais novas para as mais antigas."""
+    rows = queryset.order_by('-id').values_list(*EXPORT_FIELDS)
+    last_id = None
+    while True:
+        batch = list((rows.filter(id__lt=last_id) if last_id is not None else rows)[:batch_size])
+        for (sale_id, created_at, student_name, email, phone, cpf_cnpj, course_title, title_snapshot,
+             price, payment_method, status, checkout_id, asaas_payment_id, asaas_status,
+             asaas_type, asaas_value, payment_date, access_granted) in batch:
+            yield (
+                sale_id, _format_datetime(created_at), student_name, email, phone, cpf_cnpj or '',
+                course_title or title_snapshot or 'Curso removido', price,
+                PAYMENT_METHOD_LABELS.get(payment_method, payment_method),
+                STATUS_LABELS.get(status, status), checkout_id or '', asaas_payment_id or '',
+                asaas_status or '', asaas_type or '', asaas_value if asaas_value is not None else '',
+                _format_datetime(payment_date), 'Sim' if access_granted else 'Não',
+            )
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1][0]
+
+
+class _Echo:
+    """Pseudo-buffer: csv.writer devolve cada linha já formatada em vez de acumular."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, filename):
+    writer = csv.writer(_Echo())
+
+    def content():
+        # BOM para o Excel reconhecer UTF-8 (acentos)
+        yield '\ufeff' + writer.writerow(EXPORT_HEADERS)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Vendas" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+# Caracteres de controle não são aceitos em XML
+_XML_ILLEGAL = dict.fromkeys(i for i in range(32) if i not in (9, 10, 13))
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(str(value).translate(_XML_ILLEGAL))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _ZipStream:
+    """Arquivo só de escrita e sem seek: acumula o que o zipfile escreve até ser drenado."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def iter_xlsx(rows, chunk_size=XLSX_CHUNK_SIZE):
+    """Gera uma planilha XLSX mínima (uma aba, strings inline) em blocos, linha a linha."""
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        workbook.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        workbook.writestr('xl/workbook.xml', XLSX_WORKBOOK)
+        workbook.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for row in _with_headers(rows):
+                sheet.write(('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode('utf-8'))
+                if stream.size >= chunk_size:
+                    yield stream.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.drain()
+
+
+def _with_headers(rows):
+    yield EXPORT_HEADERS
+    yield from rows
+
+
+def xlsx_response(rows, filename):
+    response = StreamingHttpResponse(
+        iter_xlsx(rows),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+    return response
@@ -0,0 +1,150 @@
+"""
+Suporte ao header Idempotency-Key nos endpoints de checkout.
+
+A primeira requisição com uma chave a registra como "em processamento" (INSERT na
+chave única) e, ao terminar, grava o status e o corpo da resposta. Repetições com a
+mesma chave e o mesmo corpo recebem a resposta gravada sem criar outra venda nem
+chamar o Asaas; duplicatas simultâneas aguardam a primeira terminar. A mesma chave
+com outro corpo (ou em outro endpoint) é rejeitada.
+
+Respostas de erro do servidor (5xx) não são gravadas: a chave é liberada para que a
+retentativa refaça o checkout.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+POLL_INTERVAL = 0.2
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def request_fingerprint(request):
+    """Hash do método, caminho e corpo (JSON canônico) da requisição."""
+    try:
+        body = json.dumps(request.data, sort_keys=True, default=str)
+    except Exception:
+        body = request.body.decode('utf-8', 'replace')
+    raw = f'{request.method} {request.path}\n{body}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _claim(key, endpoint, fingerprint):
+    """
+    Tenta registrar a chave como em processamento. Retorna (registro, criado).
+    Chaves expiradas, ou presas em processamento além do limite (worker que caiu),
+    são reaproveitadas.
+    """
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(key=key, endpoint=endpoint, fingerprint=fingerprint), True
+    except IntegrityError:
+        pass
+
+    record = IdempotencyKey.objects.filter(key=key).first()
+    if record is None:
+        # Liberada entre o INSERT e a leitura: tenta de novo na próxima volta
+        return None, False
+
+    now = timezone.now()
+    expired = record.created_at < now - timedelta(seconds=_setting('IDEMPOTENCY_KEY_TTL', 86400))
+    stale = (
+        record.status == 'processing'
+        and record.updated_at < now - timedelta(seconds=_setting('IDEMPOTENCY_PROCESSING_TIMEOUT', 120))
+    )
+    if expired or stale:
+        # UPDATE condicional: só um dos concorrentes assume a chave
+        taken = IdempotencyKey.objects.filter(pk=record.pk, updated_at=record.updated_at).update(
+            endpoint=endpoint, fingerprint=fingerprint, status='processing',
+            response_status=None, response_body=None, created_at=now, updated_at=now,
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+        return None, False
+    return record, False
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Decorador para views de função do DRF (abaixo de @api_view): aplica o
+    Idempotency-Key quando o header é enviado; sem ele, a view roda normalmente.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} muito longo'}, status=status.HTTP_400_BAD_REQUEST)
+
+        endpoint = request.path
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + _setting('IDEMPOTENCY_WAIT_TIMEOUT', 30)
+        while True:
+            record, created = _claim(key, endpoint, fingerprint)
+            if created:
+                break
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    return Response({
+                        'error': f'{IDEMPOTENCY_HEADER} já utilizado com outra requisição'
+                    }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if record.status == 'completed':
+                    logger.debug("Idempotency-Key repetido em %s, reenviando resposta gravada", endpoint)
+                    return _replay(record)
+            # A primeira requisição ainda está processando: aguarda sem chamar o Asaas
+            if time.monotonic() >= deadline:
+                return Response({
+                    'error': 'Requisição com este Idempotency-Key ainda em processamento'
+                }, status=status.HTTP_409_CONFLICT)
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            # Falha do servidor (ou resposta sem dados serializáveis): libera a chave
+            record.delete()
+            return response
+
+        record.status = 'completed'
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.save(update_fields=['status', 'response_status', 'response_body', 'updated_at'])
+        return response
+
+    return wrapper
+
+
+def purge_expired_idempotency_keys():
+    """Remove as chaves mais antigas que IDEMPOTENCY_KEY_TTL. Retorna quantas foram removidas."""
+    cutoff = timezone.now() - timedelta(seconds=_setting('IDEMPOTENCY_KEY_TTL', 86400))
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,54 @@
+"""
+Comando Django para cancelar as vendas pendentes vencidas e arquivar as canceladas antigas
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sales.archive import expire_stale_pending_sales, archive_cancelled_sales, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Cancela (no Asaas e localmente) as vendas pendentes com pagamento vencido e move as canceladas '
+        'antigas para a tabela de vendas arquivadas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=None,
+            help='Dias após o vencimento antes de cancelar (padrão: SALE_EXPIRY_GRACE_DAYS)',
+        )
+        parser.add_argument(
+            '--archive-after-days',
+            type=int,
+            default=None,
+            help='Dias desde o cancelamento antes de arquivar (padrão: SALE_ARCHIVE_AFTER_DAYS)',
+        )
+        parser.add_argument(
+            '--skip-archive',
+            action='store_true',
+            help='Apenas cancela as pendentes vencidas, sem arquivar',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Registros por transação (padrão: {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+        self.stdout.write(self.style.SUCCESS('🚀 Expirando vendas pendentes vencidas...'))
+
+        expired = expire_stale_pending_sales(grace_days=options['grace_days'], batch_size=options['batch_size'])
+        self.stdout.write(f"   {expired} vendas canceladas")
+
+        if not options['skip_archive']:
+            archived = archive_cancelled_sales(
+                older_than_days=options['archive_after_days'], batch_size=options['batch_size']
+            )
+            self.stdout.write(f"   {archived} vendas arquivadas")
+
+        duration = timezone.now() - start_time
+        self.stdout.write(self.style.SUCCESS(f"✅ Concluído em {duration.total_seconds():.2f} segundos"))
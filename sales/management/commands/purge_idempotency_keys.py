@@ -0,0 +1,13 @@
+"""
+Comando Django para remover as chaves de idempotência expiradas dos checkouts
+"""
+from django.core.management.base import BaseCommand
+from sales.idempotency import purge_expired_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Remove as chaves de idempotência (Idempotency-Key) mais antigas que IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f"✅ {deleted} chaves de idempotência removidas"))
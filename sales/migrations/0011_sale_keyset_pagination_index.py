@@ -0,0 +1,17 @@
+# Generated manually for keyset pagination (app/pagination.py)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0010_add_performance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-created_at', '-id'], name='sales_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated manually: pedido (Checkout) com itens, substituindo o agrupamento por asaas_payment_id
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_course_fulltext_index'),
+        ('sales', '0011_sale_keyset_pagination_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_name', models.CharField(max_length=200, verbose_name='Nome do Aluno')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('phone', models.CharField(max_length=20, verbose_name='Telefone')),
+                ('cpf_cnpj', models.CharField(blank=True, max_length=20, null=True, verbose_name='CPF/CNPJ')),
+                ('payment_method', models.CharField(choices=[('pix', 'PIX'), ('credit_card', 'Cartão de Crédito'), ('bank_slip', 'Boleto'), ('bank_slip_installments', 'Boleto Parcelado')], max_length=30, verbose_name='Método de Pagamento')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('paid', 'Pago'), ('cancelled', 'Cancelado'), ('refunded', 'Reembolsado')], default='pending', max_length=20, verbose_name='Status')),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Total')),
+                ('asaas_payment_id', models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='ID Pagamento ASAAS')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Checkout',
+                'verbose_name_plural': 'Checkouts',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-created_at'], name='checkout_status_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CheckoutItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_title_snapshot', models.CharField(blank=True, max_length=200, null=True, verbose_name='Título do Curso (snapshot)')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='Posição')),
+                ('checkout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='sales.checkout', verbose_name='Checkout')),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='courses.course', verbose_name='Curso')),
+                ('sale', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_item', to='sales.sale', verbose_name='Venda')),
+            ],
+            options={
+                'verbose_name': 'Item do Checkout',
+                'verbose_name_plural': 'Itens do Checkout',
+                'ordering': ['checkout', 'position'],
+            },
+        ),
+    ]
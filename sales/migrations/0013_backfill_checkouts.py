@@ -0,0 +1,79 @@
+# Generated manually: cria os checkouts das vendas existentes
+
+from decimal import Decimal
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+
+
+def _group_legacy_sales(Sale):
+    """Agrupa como o código legado: vendas com o mesmo asaas_payment_id formam um carrinho."""
+    groups = {}
+    sales = Sale.objects.filter(checkout_item__isnull=True).order_by('id').values(
+        'id', 'student_name', 'email', 'phone', 'cpf_cnpj', 'course_id', 'course_title_snapshot',
+        'price', 'payment_method', 'status', 'asaas_payment_id', 'created_at',
+    )
+    for sale in sales.iterator(chunk_size=BATCH_SIZE):
+        key = sale['asaas_payment_id'] or f"sale_{sale['id']}"
+        groups.setdefault(key, []).append(sale)
+    return list(groups.values())
+
+
+def backfill_checkouts(apps, schema_editor):
+    Sale = apps.get_model('sales', 'Sale')
+    Checkout = apps.get_model('sales', 'Checkout')
+    CheckoutItem = apps.get_model('sales', 'CheckoutItem')
+
+    groups = _group_legacy_sales(Sale)
+    for start in range(0, len(groups), BATCH_SIZE):
+        with transaction.atomic():
+            checkouts, items = [], []
+            for group in groups[start:start + BATCH_SIZE]:
+                # A venda principal do carrinho guarda o total (maior preço); vem primeiro
+                main = max(group, key=lambda sale: sale['price'])
+                others = [sale for sale in group if sale is not main]
+                remainder = main['price'] - sum((sale['price'] for sale in others), Decimal('0'))
+
+                checkout = Checkout.objects.create(
+                    student_name=main['student_name'],
+                    email=main['email'],
+                    phone=main['phone'],
+                    cpf_cnpj=main['cpf_cnpj'],
+                    payment_method=main['payment_method'],
+                    status=main['status'],
+                    total=main['price'],
+                    asaas_payment_id=main['asaas_payment_id'] or None,
+                )
+                checkout.created_at = min(sale['created_at'] for sale in group)
+                checkouts.append(checkout)
+
+                for position, sale in enumerate([main] + others):
+                    price = sale['price']
+                    if sale is main and others and remainder > 0:
+                        price = remainder
+                    items.append(CheckoutItem(
+                        checkout=checkout,
+                        sale_id=sale['id'],
+                        course_id=sale['course_id'],
+                        course_title_snapshot=sale['course_title_snapshot'],
+                        price=price,
+                        position=position,
+                    ))
+
+            # auto_now_add ignora o valor no create: restaura a data original da compra
+            Checkout.objects.bulk_update(checkouts, ['created_at'], batch_size=BATCH_SIZE)
+            CheckoutItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('sales', '0012_checkout_checkoutitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_checkouts, migrations.RunPython.noop),
+    ]
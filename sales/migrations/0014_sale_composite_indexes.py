@@ -0,0 +1,44 @@
+# Generated manually: índices compostos dos caminhos de acesso do dashboard/estatísticas
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0013_backfill_checkouts'),
+    ]
+
+    operations = [
+        # Cria os compostos antes de remover os simples que eles tornam redundantes
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['asaas_payment_id'], name='sales_asaas_payment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['email', 'status'], name='sales_email_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['course', 'status'], name='sales_course_status_idx'),
+        ),
+        # Prefixos de (status, -created_at), (email, status) e (-created_at, -id); course_id
+        # continua coberto pelo índice da FK e por (course, status)
+        migrations.RemoveIndex(
+            model_name='sale',
+            name='sales_created_at_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sale',
+            name='sales_status_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sale',
+            name='sales_email_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sale',
+            name='sales_course_id_idx',
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:33
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0014_sale_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Chave')),
+                ('endpoint', models.CharField(max_length=200, verbose_name='Endpoint')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Impressão digital da requisição')),
+                ('status', models.CharField(choices=[('processing', 'Em processamento'), ('completed', 'Concluída')], default='processing', max_length=20, verbose_name='Status')),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status HTTP da resposta')),
+                ('response_body', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Corpo da resposta')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Chave de Idempotência',
+                'verbose_name_plural': 'Chaves de Idempotência',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='idempotency_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_course_fulltext_index'),
+        ('sales', '0015_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSale',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID da Venda')),
+                ('student_name', models.CharField(max_length=200, verbose_name='Nome do Aluno')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('phone', models.CharField(max_length=20, verbose_name='Telefone')),
+                ('cpf_cnpj', models.CharField(blank=True, max_length=20, null=True, verbose_name='CPF/CNPJ')),
+                ('course_title_snapshot', models.CharField(blank=True, max_length=200, null=True, verbose_name='Título do Curso (snapshot)')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Preço')),
+                ('payment_method', models.CharField(choices=[('pix', 'PIX'), ('credit_card', 'Cartão de Crédito'), ('bank_slip', 'Boleto'), ('bank_slip_installments', 'Boleto Parcelado')], max_length=30, verbose_name='Método de Pagamento')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('paid', 'Pago'), ('cancelled', 'Cancelado'), ('refunded', 'Reembolsado')], max_length=20, verbose_name='Status')),
+                ('bank_slip_installment_count', models.IntegerField(blank=True, null=True, verbose_name='Nº de parcelas no boleto')),
+                ('checkout_id', models.BigIntegerField(blank=True, null=True, verbose_name='Checkout')),
+                ('asaas_payment_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='ID Pagamento ASAAS')),
+                ('asaas_customer_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='ID Cliente Asaas')),
+                ('asaas_status', models.CharField(blank=True, max_length=50, null=True, verbose_name='Status Asaas')),
+                ('asaas_due_date', models.DateField(blank=True, null=True, verbose_name='Vencimento Asaas')),
+                ('created_at', models.DateTimeField(verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(verbose_name='Atualizado em')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.course', verbose_name='Curso')),
+            ],
+            options={
+                'verbose_name': 'Venda Arquivada',
+                'verbose_name_plural': 'Vendas Arquivadas',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='archived_created_id_idx'), models.Index(fields=['email'], name='archived_email_idx'), models.Index(fields=['asaas_payment_id'], name='archived_asaas_payment_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-16 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0016_archivedsale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedsale',
+            name='late_payment_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Pago após arquivamento em'),
+        ),
+    ]
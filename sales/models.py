@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from courses.models import Course
 
@@ -57,6 +58,20 @@ class Sale(models.Model):
         verbose_name = 'Venda'
         verbose_name_plural = 'Vendas'
         ordering = ['-created_at']
+        indexes = [
+            # Paginação por cursor (-created_at, -id) do painel admin (app/pagination.py);
+            # também atende filtros só por período (created_at >= ...)
+            models.Index(fields=['-created_at', '-id'], name='sales_created_id_idx'),
+            # Dashboard e estatísticas: status + período
+            models.Index(fields=['status', '-created_at'], name='sales_status_created_idx'),
+            # Agrupamento/consulta por pagamento Asaas (webhooks e status)
+            models.Index(fields=['asaas_payment_id'], name='sales_asaas_payment_idx'),
+            # Alunos únicos (email distinto entre as pagas) e compras de um aluno
+            models.Index(fields=['email', 'status'], name='sales_email_status_idx'),
+            # Vendas e conversão por curso
+            models.Index(fields=['course', 'status'], name='sales_course_status_idx'),
+            models.Index(fields=['payment_method'], name='sales_payment_method_idx'),
+        ]
     
     def __str__(self):
         course_title = None
@@ -92,3 +107,158 @@ class Sale(models.Model):
         if self.course and not self.course_title_snapshot:
             self.course_title_snapshot = self.course.title
         super().save(*args, **kwargs)
+
+    # Campos que alteram as estatísticas de vendas (ver sales/signals.py)
+    STATISTICS_FIELDS = ('status', 'price', 'payment_method', 'course_id', 'email', 'created_at')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_statistics_values()
+        return instance
+
+    def remember_statistics_values(self):
+        self._statistics_values = {
+            field: self.__dict__.get(field) for field in self.STATISTICS_FIELDS
+        }
+
+    def statistics_changed(self):
+        """True se algum campo das estatísticas mudou desde o carregamento (ou é desconhecido)."""
+        loaded = getattr(self, '_statistics_values', None)
+        if loaded is None:
+            return True
+        return any(self.__dict__.get(field) != value for field, value in loaded.items())
+
+
+class Checkout(models.Model):
+    """
+    Pedido de um checkout (compra individual ou carrinho). Agrupa as vendas da mesma
+    compra pelos itens (CheckoutItem), em vez de depender do asaas_payment_id compartilhado.
+    """
+    student_name = models.CharField(max_length=200, verbose_name='Nome do Aluno')
+    email = models.EmailField(verbose_name='Email')
+    phone = models.CharField(max_length=20, verbose_name='Telefone')
+    cpf_cnpj = models.CharField(max_length=20, blank=True, null=True, verbose_name='CPF/CNPJ')
+    payment_method = models.CharField(max_length=30, choices=Sale.PAYMENT_METHOD_CHOICES, verbose_name='Método de Pagamento')
+    status = models.CharField(max_length=20, choices=Sale.STATUS_CHOICES, default='pending', verbose_name='Status')
+    total = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Total')
+    asaas_payment_id = models.CharField(max_length=100, blank=True, null=True, db_index=True, verbose_name='ID Pagamento ASAAS')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Checkout'
+        verbose_name_plural = 'Checkouts'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='checkout_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Checkout #{self.pk} - {self.student_name}"
+
+
+class CheckoutItem(models.Model):
+    """
+    Item (curso) de um checkout. Cada item aponta para a venda que o rastreia;
+    o item de position 0 é a venda principal (a que recebe o pagamento Asaas).
+    """
+    checkout = models.ForeignKey(Checkout, on_delete=models.CASCADE, related_name='items', verbose_name='Checkout')
+    sale = models.OneToOneField(Sale, on_delete=models.CASCADE, related_name='checkout_item', verbose_name='Venda')
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Curso')
+    course_title_snapshot = models.CharField(max_length=200, blank=True, null=True, verbose_name='Título do Curso (snapshot)')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Preço')
+    position = models.PositiveSmallIntegerField(default=0, verbose_name='Posição')
+
+    class Meta:
+        verbose_name = 'Item do Checkout'
+        verbose_name_plural = 'Itens do Checkout'
+        ordering = ['checkout', 'position']
+
+    def __str__(self):
+        return f"{self.checkout_id} - {self.course_title_snapshot or 'Curso removido'}"
+
+    def save(self, *args, **kwargs):
+        if self.course and not self.course_title_snapshot:
+            self.course_title_snapshot = self.course.title
+        super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Resposta de um checkout identificada pelo header Idempotency-Key (ver sales/idempotency.py).
+    Retentativas do frontend com a mesma chave recebem a resposta gravada em vez de
+    criar outra venda e outra cobrança no Asaas.
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Em processamento'),
+        ('completed', 'Concluída'),
+    ]
+
+    key = models.CharField(max_length=255, unique=True, verbose_name='Chave')
+    endpoint = models.CharField(max_length=200, verbose_name='Endpoint')
+    fingerprint = models.CharField(max_length=64, verbose_name='Impressão digital da requisição')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing', verbose_name='Status')
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status HTTP da resposta')
+    response_body = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder, verbose_name='Corpo da resposta')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Chave de Idempotência'
+        verbose_name_plural = 'Chaves de Idempotência'
+        ordering = ['-created_at']
+        indexes = [
+            # Limpeza das chaves expiradas
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.get_status_display()})"
+
+
+class ArchivedSale(models.Model):
+    """
+    Venda cancelada arquivada (ver sales/archive.py). Sai da tabela de vendas para
+    manter os índices e contagens do painel proporcionais às vendas reais, mas continua
+    consultável no admin. Mantém o id original e os dados do pagamento Asaas.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID da Venda')
+    student_name = models.CharField(max_length=200, verbose_name='Nome do Aluno')
+    email = models.EmailField(verbose_name='Email')
+    phone = models.CharField(max_length=20, verbose_name='Telefone')
+    cpf_cnpj = models.CharField(max_length=20, blank=True, null=True, verbose_name='CPF/CNPJ')
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='Curso')
+    course_title_snapshot = models.CharField(max_length=200, blank=True, null=True, verbose_name='Título do Curso (snapshot)')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Preço')
+    payment_method = models.CharField(max_length=30, choices=Sale.PAYMENT_METHOD_CHOICES, verbose_name='Método de Pagamento')
+    status = models.CharField(max_length=20, choices=Sale.STATUS_CHOICES, verbose_name='Status')
+    bank_slip_installment_count = models.IntegerField(blank=True, null=True, verbose_name='Nº de parcelas no boleto')
+    checkout_id = models.BigIntegerField(blank=True, null=True, verbose_name='Checkout')
+
+    # Pagamento Asaas (o AsaasPayment é removido junto com a venda; o id fica aqui)
+    asaas_payment_id = models.CharField(max_length=100, blank=True, null=True, verbose_name='ID Pagamento ASAAS')
+    asaas_customer_id = models.CharField(max_length=100, blank=True, null=True, verbose_name='ID Cliente Asaas')
+    asaas_status = models.CharField(max_length=50, blank=True, null=True, verbose_name='Status Asaas')
+    asaas_due_date = models.DateField(blank=True, null=True, verbose_name='Vencimento Asaas')
+    # Pagamento confirmado pelo Asaas depois do arquivamento: reembolsar ou liberar o acesso manualmente
+    late_payment_at = models.DateTimeField(blank=True, null=True, verbose_name='Pago após arquivamento em')
+
+    created_at = models.DateTimeField(verbose_name='Criado em')
+    updated_at = models.DateTimeField(verbose_name='Atualizado em')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')
+
+    class Meta:
+        verbose_name = 'Venda Arquivada'
+        verbose_name_plural = 'Vendas Arquivadas'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='archived_created_id_idx'),
+            models.Index(fields=['email'], name='archived_email_idx'),
+            models.Index(fields=['asaas_payment_id'], name='archived_asaas_payment_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_name} - {self.course_title_snapshot or 'Curso removido'} (arquivada)"
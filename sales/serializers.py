@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Sale
+from .models import Sale, ArchivedSale
 from courses.serializers import CourseListSerializer
 
 
@@ -33,4 +33,43 @@ class SaleListSerializer(serializers.ModelSerializer):
         """Retorna título do curso do snapshot se curso foi excluído"""
         if obj.course:
             return obj.course.title
-        return obj.course_title_snapshot or 'Curso removido' 
\ No newline at end of file
+        return obj.course_title_snapshot or 'Curso removido' 
+
+class SaleCheckoutGroupSerializer(serializers.ModelSerializer):
+    """
+    Checkout agrupado da listagem admin (group_by_payment=true): a venda principal
+    anotada por group_sales_by_checkout, com o título do carrinho e a data mais recente
+    """
+    course_title = serializers.SerializerMethodField()
+    price = serializers.FloatField()
+    created_at = serializers.DateTimeField(source='group_latest')
+
+    class Meta:
+        model = Sale
+        fields = [
+            'id', 'student_name', 'email', 'phone', 'course_title',
+            'price', 'payment_method', 'status', 'created_at'
+        ]
+
+    def get_course_title(self, obj):
+        if obj.group_size > 1:
+            return f"Carrinho: {obj.group_first_title} + {obj.group_size - 1} outros"
+        return obj.main_course_title
+
+
+class ArchivedSaleSerializer(serializers.ModelSerializer):
+    """Venda arquivada (cancelada antiga) consultada sob demanda no painel admin"""
+    course_title = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedSale
+        fields = [
+            'id', 'student_name', 'email', 'phone', 'cpf_cnpj', 'course_title', 'price',
+            'payment_method', 'status', 'checkout_id', 'asaas_payment_id', 'asaas_status',
+            'asaas_due_date', 'late_payment_at', 'created_at', 'archived_at'
+        ]
+
+    def get_course_title(self, obj):
+        if obj.course:
+            return obj.course.title
+        return obj.course_title_snapshot or 'Curso removido'
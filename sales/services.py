@@ -0,0 +1,175 @@
+"""
+Serviços de checkout (pedidos) das vendas.
+
+Cada compra, individual ou de carrinho, gera um Checkout com um CheckoutItem por
+venda. Os carrinhos deixam de ser redescobertos por varredura do asaas_payment_id:
+as vendas, os cursos e o total de uma compra saem de um JOIN pelos índices de
+CheckoutItem (sale_id único e checkout_id).
+"""
+import uuid
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import CharField, Count, F, Max, Q, Value, Window
+from django.db.models.functions import Coalesce, FirstValue, NullIf, RowNumber
+from django.utils import timezone
+
+from .cache import bump_sales_version
+from .models import Sale, Checkout, CheckoutItem
+
+
+def register_checkout(sales, prices=None, total=None):
+    """
+    Cria o checkout das vendas de uma compra, um item por venda na ordem recebida
+    (a primeira é a venda principal).
+    prices: preço de cada item (padrão: o preço de cada venda).
+    total: total do pedido (padrão: a soma dos itens).
+    """
+    main_sale = sales[0]
+    prices = [Decimal(str(price)) for price in prices] if prices is not None else [sale.price for sale in sales]
+    with transaction.atomic():
+        checkout = Checkout.objects.create(
+            student_name=main_sale.student_name,
+            email=main_sale.email,
+            phone=main_sale.phone,
+            cpf_cnpj=main_sale.cpf_cnpj,
+            payment_method=main_sale.payment_method,
+            status=main_sale.status,
+            total=total if total is not None else sum(prices, Decimal('0')),
+            asaas_payment_id=main_sale.asaas_payment_id,
+        )
+        CheckoutItem.objects.bulk_create([
+            CheckoutItem(
+                checkout=checkout,
+                sale=sale,
+                course=sale.course,
+                course_title_snapshot=sale.course_title_snapshot,
+                price=price,
+                position=position,
+            )
+            for position, (sale, price) in enumerate(zip(sales, prices))
+        ])
+    return checkout
+
+
+def create_cart_checkout(courses, prices, total, payment_method, buyer, installment_count=None):
+    """
+    Cria numa única transação as vendas de um carrinho (um INSERT em lote) e o checkout.
+    A primeira venda é a principal, com o total do pedido; as demais levam o preço do
+    próprio curso. buyer: student_name, email, phone e cpf_cnpj.
+    Retorna (vendas, checkout).
+    """
+    # Marca provisória no asaas_payment_id até o pagamento ser criado: no MySQL o
+    # bulk_create não devolve as PKs, então as vendas do lote são relidas por ela
+    batch_token = f'cart:{uuid.uuid4().hex}'
+    sales = [
+        Sale(
+            course=course,
+            course_title_snapshot=course.title,  # save() não roda no bulk_create
+            price=course.price,
+            payment_method=payment_method,
+            status='pending',
+            asaas_payment_id=batch_token,
+            **buyer,
+        )
+        for course in courses
+    ]
+    main_sale = sales[0]
+    main_sale.price = total
+    if installment_count:
+        main_sale.bank_slip_installment_count = installment_count
+        main_sale.bank_slip_installment_value = (Decimal(str(total)) / installment_count).quantize(Decimal('0.01'))
+
+    with transaction.atomic():
+        Sale.objects.bulk_create(sales)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # Um único INSERT de várias linhas recebe ids crescentes na ordem das linhas
+            ids = Sale.objects.filter(asaas_payment_id=batch_token).order_by('id').values_list('id', flat=True)
+            for sale, sale_id in zip(sales, ids):
+                sale.pk = sale_id
+        checkout = register_checkout(sales, prices=prices, total=total)
+    # bulk_create não dispara sinais: invalida as estatísticas aqui
+    bump_sales_version()
+    return sales, checkout
+
+
+def attach_checkout_payment(sales, checkout, payment_id):
+    """Grava o id do pagamento Asaas em todas as vendas do checkout (um UPDATE) e no checkout."""
+    Sale.objects.filter(pk__in=[sale.pk for sale in sales]).update(
+        asaas_payment_id=payment_id, updated_at=timezone.now()
+    )
+    for sale in sales:
+        sale.asaas_payment_id = payment_id
+    checkout.asaas_payment_id = payment_id
+    checkout.save(update_fields=['asaas_payment_id', 'updated_at'])
+
+
+def discard_checkout(sales, checkout):
+    """Remove o checkout e as vendas de uma compra cujo pagamento não pôde ser criado."""
+    with transaction.atomic():
+        checkout.delete()
+        Sale.objects.filter(pk__in=[sale.pk for sale in sales]).delete()
+
+
+def checkout_items(sale):
+    """
+    Itens do checkout da venda, com venda e curso (e os produtos TheMembers do curso)
+    pré-carregados. Vendas sem checkout (criadas direto no admin) retornam [].
+    """
+    return list(
+        CheckoutItem.objects.filter(checkout__items__sale_id=sale.pk)
+        .select_related('sale', 'course')
+        .prefetch_related('course__themembersintegration_set__product')
+        .order_by('position')
+    )
+
+
+def mark_checkout_paid(sale):
+    """Marca como pagos o checkout da venda e todas as vendas dele (dois UPDATEs)."""
+    mark_checkouts_paid([sale.pk])
+
+
+def mark_checkouts_paid(sale_ids):
+    """
+    Marca como pagas as vendas informadas, os checkouts delas e todas as vendas desses
+    checkouts (dois UPDATEs, para qualquer número de vendas).
+    """
+    checkout_ids = CheckoutItem.objects.filter(sale_id__in=sale_ids).values('checkout_id')
+    Checkout.objects.filter(pk__in=checkout_ids).exclude(status='paid').update(status='paid')
+    updated = (
+        Sale.objects.filter(Q(pk__in=sale_ids) | Q(checkout_item__checkout_id__in=checkout_ids))
+        .exclude(status='paid')
+        .update(status='paid', updated_at=timezone.now())
+    )
+    if updated:
+        # update() não dispara sinais: invalida as estatísticas aqui
+        bump_sales_version()
+
+
+def group_sales_by_checkout(queryset):
+    """
+    Agrupa as vendas por checkout (ou a própria venda, se não tiver checkout) no banco,
+    com funções de janela: cada grupo vira a sua venda principal (maior preço, a mais
+    recente no empate) anotada com a data mais recente, o número de itens e o título
+    do curso mais recente do grupo. Ordenado pelo checkout mais recente.
+    Requer suporte a window functions (MySQL 8+).
+    """
+    # Ids de checkout são positivos; vendas avulsas usam o próprio id negativo
+    group_key = Coalesce('checkout_item__checkout_id', -F('id'))
+    course_title = Coalesce(
+        'course__title', NullIf('course_title_snapshot', Value('')), Value('Curso removido'),
+        output_field=CharField(),
+    )
+    return queryset.annotate(
+        group_rank=Window(
+            RowNumber(), partition_by=[group_key],
+            order_by=[F('price').desc(), F('created_at').desc(), F('id').desc()],
+        ),
+        group_latest=Window(Max('created_at'), partition_by=[group_key]),
+        group_size=Window(Count('id'), partition_by=[group_key]),
+        group_first_title=Window(
+            FirstValue(course_title), partition_by=[group_key],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ),
+        main_course_title=course_title,
+    ).filter(group_rank=1).order_by('-group_latest', '-id')
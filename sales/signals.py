@@ -0,0 +1,25 @@
+"""
+Sinais que invalidam o cache das estatísticas de vendas (ver sales/cache.py).
+
+Updates em lote (QuerySet.update) não disparam sinais: quem os usa deve chamar
+bump_sales_version() explicitamente (ver sales/services.py).
+"""
+from django.db.models.signals import post_save, post_delete
+
+from .cache import bump_sales_version
+from .models import Sale
+
+
+def invalidate_sales_statistics(sender, instance, created=False, **kwargs):
+    if created or instance.statistics_changed():
+        bump_sales_version()
+    instance.remember_statistics_values()
+
+
+def invalidate_sales_statistics_on_delete(sender, instance, **kwargs):
+    bump_sales_version()
+
+
+def connect_sales_signals():
+    post_save.connect(invalidate_sales_statistics, sender=Sale, dispatch_uid='sales_stats_save')
+    post_delete.connect(invalidate_sales_statistics_on_delete, sender=Sale, dispatch_uid='sales_stats_delete')
@@ -1,3 +1,776 @@
-from django.test import TestCase
+import csv
+import io
+import re
+import zipfile
+from xml.etree import ElementTree
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Q
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from courses.models import Category, Course, Professor
+from integration_asas.models import AsaasPayment, AsaasWebhookLog
+from integration_asas.services import AsaasService
+from .models import Sale, Checkout, CheckoutItem, IdempotencyKey, ArchivedSale
+from .archive import expire_stale_pending_sales, archive_cancelled_sales
+from . import events
+from .exports import EXPORT_HEADERS, export_rows, iter_xlsx
+from .services import register_checkout, checkout_items, mark_checkout_paid
+
+
+class SaleKeysetPaginationTests(TestCase):
+    """Paginação por cursor (?pagination=cursor) da listagem admin de vendas."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='x'))
+        # Metade das vendas com o mesmo created_at: o desempate é pelo id
+        same_time = timezone.now()
+        for index in range(25):
+            sale = Sale.objects.create(
+                student_name=f'Aluno {index}', email=f'aluno{index}@example.com', phone='1',
+                price=10, payment_method='pix',
+            )
+            if index % 2:
+                Sale.objects.filter(pk=sale.pk).update(created_at=same_time)
+        self.expected = list(Sale.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def _walk(self, url, direction='next'):
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            # Sem COUNT(*): apenas a query da página
+            self.assertEqual(len(ctx.captured_queries), 1)
+            ids.extend(item['id'] for item in data['results'])
+            last = data
+            url = data[direction]
+        return ids, last
+
+    def test_walks_every_sale_once_in_order(self):
+        for path in ('/api/v1/sales/admin/', '/api/v1/sales/admin/list/'):
+            ids, last = self._walk(f'{path}?pagination=cursor&page_size=7')
+            self.assertEqual(ids, self.expected)
+
+            # Volta pelas páginas anteriores a partir da última até a primeira
+            back_ids, first = self._walk(last['previous'], direction='previous')
+            self.assertEqual(sorted(back_ids), sorted(self.expected[:-len(last['results'])]))
+            self.assertEqual(first['results'][0]['id'], self.expected[0])
+
+    def test_page_number_pagination_is_default(self):
+        data = self.client.get('/api/v1/sales/admin/list/').json()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/sales/admin/?cursor=invalido')
+        self.assertEqual(response.status_code, 404)
+
+
+class SaleCheckoutGroupingTests(TestCase):
+    """Listagem admin agrupada por checkout (?group_by_payment=true) feita no banco."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='x'))
+        now = timezone.now()
+        professor = Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos')
+        category = Category.objects.create(name='Categoria', slug='categoria')
+        course_defaults = {'description': 'Descrição', 'duration': '10h', 'professor': professor, 'category': category}
+        cheap = Course.objects.create(title='Curso Barato', price=10, **course_defaults)
+        expensive = Course.objects.create(title='Curso Caro', price=90, **course_defaults)
+
+        def sale(minutes_ago, **kwargs):
+            defaults = {'student_name': 'Aluno', 'email': 'aluno@example.com', 'phone': '1',
+                        'price': 10, 'payment_method': 'pix'}
+            defaults.update(kwargs)
+            created = Sale.objects.create(**defaults)
+            Sale.objects.filter(pk=created.pk).update(created_at=now - timedelta(minutes=minutes_ago))
+            return created
+
+        # Carrinho com três cursos: a principal é a de maior preço
+        self.cart_main = sale(30, asaas_payment_id='pay_cart', course=expensive, price=90)
+        register_checkout([
+            self.cart_main,
+            sale(20, asaas_payment_id='pay_cart', course=cheap, price=10),
+            sale(10, asaas_payment_id='pay_cart', course=None, course_title_snapshot='Curso Antigo', price=10),
+        ])
+        # Compra individual e venda criada pelo admin (sem checkout)
+        self.single = sale(5, asaas_payment_id='pay_single', course=cheap, price=10)
+        register_checkout([self.single])
+        self.removed = sale(40, asaas_payment_id='pay_cart', course=None, price=50)
+
+    def test_groups_sales_by_checkout(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/sales/admin/list/?group_by_payment=true')
+        self.assertEqual(response.status_code, 200)
+        # COUNT dos grupos e a página: nada é agrupado em Python
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        results = data['results']
+        self.assertEqual([item['id'] for item in results], [self.single.id, self.cart_main.id, self.removed.id])
+
+        self.assertEqual(results[0]['course_title'], 'Curso Barato')
+        cart = results[1]
+        self.assertEqual(cart['course_title'], 'Carrinho: Curso Antigo + 2 outros')
+        self.assertEqual(cart['price'], 90.0)
+        self.assertEqual(results[2]['course_title'], 'Curso removido')
+
+    def test_grouping_respects_filters_and_page_size(self):
+        data = self.client.get('/api/v1/sales/admin/list/?group_by_payment=1&page_size=1').json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 1)
+
+        data = self.client.get('/api/v1/sales/admin/list/?group_by_payment=1&search=nobody').json()
+        self.assertEqual(data['count'], 0)
+
+
+class CheckoutTests(TestCase):
+    """Pedido (Checkout) com itens: criação no carrinho e consultas por JOIN."""
+
+    def setUp(self):
+        professor = Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos')
+        category = Category.objects.create(name='Categoria', slug='categoria')
+        self.courses = [
+            Course.objects.create(
+                title=f'Curso {index}', description='Descrição', price=20 + index, duration='10h',
+                professor=professor, category=category, whatsapp_group_link=f'https://chat.whatsapp.com/{index}',
+            )
+            for index in range(3)
+        ]
+
+    def _post_cart(self, payment, error=None):
+        with mock.patch('sales.views.AsaasService') as service:
+            service.return_value.create_payment.return_value = payment
+            service.return_value.create_payment.side_effect = error
+            service.return_value.get_pix_qr_code.return_value = ('pix', 'img')
+            return APIClient().post('/api/v1/sales/create-cart-and-redirect/', {
+                'courses': [{'id': course.id, 'price': str(course.price)} for course in self.courses],
+                'student_name': 'Aluno', 'email': 'aluno@example.com', 'phone': '1', 'payment_method': 'pix',
+            }, format='json')
+
+    def _create_cart(self):
+        payment = mock.Mock(
+            asaas_id='pay_123', payment_type='PIX', status='PENDING', value=63, due_date='2030-01-01',
+            pix_qr_code='qr', invoice_url='', payment_link_url='', bank_slip_url='',
+        )
+        response = self._post_cart(payment)
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_cart_checkout_uses_bulk_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self._create_cart()
+        queries = [query['sql'] for query in ctx.captured_queries]
+        # Cursos num único SELECT, vendas num único INSERT e um único UPDATE com o pagamento
+        self.assertEqual(len([sql for sql in queries if sql.startswith('SELECT') and '"courses_course"' in sql.split('WHERE')[0]]), 1)
+        self.assertEqual(len([sql for sql in queries if sql.startswith('INSERT INTO "sales_sale"')]), 1)
+        self.assertEqual(len([sql for sql in queries if sql.startswith('UPDATE "sales_sale"')]), 1)
+
+        sales = Sale.objects.order_by('id')
+        self.assertEqual([sale.id for sale in sales], [data['cart_sale_id']] + data['related_sales'])
+        self.assertEqual([sale.price for sale in sales], [63, 21, 22])
+        self.assertEqual([sale.course_title_snapshot for sale in sales], ['Curso 0', 'Curso 1', 'Curso 2'])
+
+    def test_cart_checkout_without_returning_ids(self):
+        # Como no MySQL: bulk_create não devolve as PKs e as vendas são relidas pela marca do lote
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock, return_value=False,
+        ):
+            data = self._create_cart()
+        items = Checkout.objects.get().items.order_by('position')
+        self.assertEqual([item.sale_id for item in items], [data['cart_sale_id']] + data['related_sales'])
+        self.assertEqual(list(Sale.objects.values_list('course_id', flat=True).order_by('id')), [course.id for course in self.courses])
+
+    def test_failed_payment_discards_cart(self):
+        response = self._post_cart(None)
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(Checkout.objects.exists())
+
+    def test_payment_exception_discards_cart(self):
+        response = self._post_cart(None, error=ConnectionError('Asaas fora do ar'))
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Sale.objects.filter(asaas_payment_id__startswith='cart:').exists())
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(Checkout.objects.exists())
+
+    def test_unknown_course_rejects_cart(self):
+        self.courses.append(Course(id=999, title='Inexistente', price=10))
+        response = self._post_cart(None)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_cart_checkout_creates_order_with_items(self):
+        data = self._create_cart()
+        checkout = Checkout.objects.get()
+        self.assertEqual(checkout.asaas_payment_id, 'pay_123')
+        self.assertEqual(checkout.total, 63)
+        items = list(checkout.items.order_by('position'))
+        self.assertEqual([item.sale_id for item in items], [data['cart_sale_id']] + data['related_sales'])
+        self.assertEqual([item.course_id for item in items], [course.id for course in self.courses])
+        self.assertEqual([item.price for item in items], [20, 21, 22])
+        self.assertEqual(set(Sale.objects.values_list('asaas_payment_id', flat=True)), {'pay_123'})
+
+    def test_cart_lookup_and_mark_paid(self):
+        data = self._create_cart()
+        main_sale = Sale.objects.get(pk=data['cart_sale_id'])
+
+        with CaptureQueriesContext(connection) as ctx:
+            items = checkout_items(main_sale)
+        # Itens com venda/curso num JOIN + prefetch dos produtos TheMembers
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+        self.assertEqual([item.course.title for item in items], ['Curso 0', 'Curso 1', 'Curso 2'])
+
+        mark_checkout_paid(main_sale)
+        self.assertEqual(Checkout.objects.get().status, 'paid')
+        self.assertFalse(Sale.objects.exclude(status='paid').exists())
+
+    def test_payment_status_lists_every_cart_course(self):
+        data = self._create_cart()
+        with mock.patch('sales.views.AsaasService') as service:
+            service.return_value.get_payment_status.return_value = {'status': 'PENDING'}
+            response = APIClient().get(f"/api/v1/sales/{data['cart_sale_id']}/payment-status/")
+        self.assertEqual(response.status_code, 200)
+        links = [group['whatsapp_link'] for group in response.json()['whatsapp_groups']]
+        self.assertEqual(links, [course.whatsapp_group_link for course in self.courses])
+
+
+class IdempotencyTests(TestCase):
+    """Idempotency-Key nos checkouts: retentativas reenviam a resposta sem nova venda/cobrança."""
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            title='Curso', description='Descrição', price=50, duration='10h',
+            professor=Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos'),
+            category=Category.objects.create(name='Categoria', slug='categoria'),
+        )
+        self.payment = mock.Mock(
+            asaas_id='pay_123', payment_type='PIX', status='PENDING', value=50, due_date='2030-01-01',
+            pix_qr_code='qr', invoice_url='', payment_link_url='', bank_slip_url='',
+        )
+
+    def _post(self, key, payment='default', email='aluno@example.com'):
+        with mock.patch('sales.views.AsaasService') as service:
+            service.return_value.create_payment.return_value = self.payment if payment == 'default' else payment
+            service.return_value.get_pix_qr_code.return_value = ('pix', 'img')
+            response = APIClient().post('/api/v1/sales/create-cart-and-redirect/', {
+                'courses': [{'id': self.course.id, 'price': '50'}],
+                'student_name': 'Aluno', 'email': email, 'phone': '1', 'payment_method': 'pix',
+            }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        return response, service.return_value.create_payment.call_count
+
+    def test_repeated_request_replays_response(self):
+        first, first_calls = self._post('chave-1')
+        second, second_calls = self._post('chave-1')
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual((first_calls, second_calls), (1, 0))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_same_key_with_other_body_is_rejected(self):
+        self._post('chave-1')
+        response, calls = self._post('chave-1', email='outro@example.com')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(calls, 0)
+
+    def test_server_error_releases_key(self):
+        failed, _ = self._post('chave-1', payment=None)
+        self.assertEqual(failed.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        retried, calls = self._post('chave-1')
+        self.assertEqual((retried.status_code, calls), (201, 1))
+
+    def test_concurrent_duplicate_waits_for_first(self):
+        first, _ = self._post('chave-1')
+        record = IdempotencyKey.objects.get()
+        stored = (record.response_status, record.response_body)
+        # Simula a primeira requisição ainda processando; ela termina enquanto a duplicata espera
+        IdempotencyKey.objects.filter(pk=record.pk).update(status='processing', response_status=None, response_body=None)
+
+        def finish_first(seconds):
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status='completed', response_status=stored[0], response_body=stored[1]
+            )
+
+        with mock.patch('sales.idempotency.time.sleep', side_effect=finish_first) as sleep:
+            second, calls = self._post('chave-1')
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(calls, 0)
+        self.assertEqual(second.json(), first.json())
+
+    def test_without_header_runs_normally(self):
+        self._post('')
+        self._post('')
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class SaleExpiryArchiveTests(TestCase):
+    """Pendentes vencidas são canceladas e as canceladas antigas vão para ArchivedSale."""
+
+    def setUp(self):
+        self.course = Course.objects.create(
+            title='Curso', description='Descrição', price=50, duration='10h',
+            professor=Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos'),
+            category=Category.objects.create(name='Categoria', slug='categoria'),
+        )
+        today = timezone.localdate()
+        self.stale_cart = self._checkout('pay_vencido', today - timedelta(days=10), items=2)
+        self.open_sale = self._checkout('pay_aberto', today + timedelta(days=3))[0]
+        self.paid_sale = self._checkout('pay_pago', today - timedelta(days=10), asaas_status='RECEIVED', status='paid')[0]
+
+    def _checkout(self, payment_id, due_date, items=1, asaas_status='PENDING', status='pending'):
+        sales = [
+            Sale.objects.create(
+                student_name='Aluno', email='aluno@example.com', phone='1', course=self.course, price=50,
+                payment_method='bank_slip', status=status, asaas_payment_id=payment_id,
+            )
+            for _ in range(items)
+        ]
+        register_checkout(sales)
+        AsaasPayment.objects.create(
+            sale=sales[0], asaas_id=payment_id, asaas_customer_id='cus_1', payment_type='BOLETO',
+            status=asaas_status, value=50 * items, due_date=due_date, customer_name='Aluno', customer_email='aluno@example.com',
+        )
+        return sales
+
+    def _asaas(self, deleted=True):
+        service = mock.Mock()
+        service.delete_payment.side_effect = lambda payment_id: {'deleted': deleted, 'id': payment_id} if deleted else None
+        return service
+
+    def test_expires_only_overdue_pending_checkouts(self):
+        service = self._asaas()
+        self.assertEqual(expire_stale_pending_sales(batch_size=1, service=service), 2)
+        # A cobrança é removida no Asaas antes do cancelamento local
+        service.delete_payment.assert_called_once_with('pay_vencido')
+        statuses = dict(Sale.objects.values_list('asaas_payment_id', 'status').distinct())
+        self.assertEqual(statuses, {'pay_vencido': 'cancelled', 'pay_aberto': 'pending', 'pay_pago': 'paid'})
+        self.assertEqual(Checkout.objects.get(asaas_payment_id='pay_vencido').status, 'cancelled')
+        # Dentro da carência ainda pode ser pago
+        self.assertEqual(expire_stale_pending_sales(grace_days=30, service=service), 0)
+
+    def test_failed_remote_cancel_keeps_sale_pending(self):
+        self.assertEqual(expire_stale_pending_sales(service=self._asaas(deleted=False)), 0)
+        self.assertFalse(Sale.objects.filter(status='cancelled').exists())
+        # Próxima execução tenta de novo
+        self.assertEqual(expire_stale_pending_sales(service=self._asaas()), 2)
+
+    def test_charge_already_deleted_on_asaas_is_expired(self):
+        # Removida pelo painel do Asaas: o DELETE responde 404
+        response = mock.Mock(status_code=404, headers={})
+        with mock.patch('integration_asas.services.client.timed_request', return_value=response) as request:
+            self.assertEqual(expire_stale_pending_sales(service=AsaasService()), 2)
+        self.assertEqual(request.call_count, 1)
+        self.assertFalse(Sale.objects.filter(asaas_payment_id='pay_vencido', status='pending').exists())
+        # Não é tentada de novo
+        self.assertEqual(expire_stale_pending_sales(service=self._asaas()), 0)
+
+    def test_installment_plan_is_cancelled_as_a_whole(self):
+        AsaasPayment.objects.filter(asaas_id='pay_vencido').update(installment_id='ins_1')
+        service = self._asaas()
+        service.delete_installment.return_value = {'deleted': True, 'id': 'ins_1'}
+        self.assertEqual(expire_stale_pending_sales(service=service), 2)
+        service.delete_installment.assert_called_once_with('ins_1')
+        service.delete_payment.assert_not_called()
+
+    def test_late_payment_flags_archived_sale(self):
+        expire_stale_pending_sales(service=self._asaas())
+        Sale.objects.filter(status='cancelled').update(updated_at=timezone.now() - timedelta(days=100))
+        archive_cancelled_sales()
+
+        processed = AsaasService().process_webhook({
+            'id': 'evt_tardio', 'event': 'PAYMENT_RECEIVED', 'payment': {'id': 'pay_vencido', 'status': 'RECEIVED'},
+        })
+        self.assertTrue(processed)
+        archived = ArchivedSale.objects.filter(asaas_payment_id='pay_vencido')
+        self.assertEqual(archived.filter(late_payment_at__isnull=False).count(), 2)
+        self.assertEqual(set(archived.values_list('asaas_status', flat=True)), {'RECEIVED'})
+        log = AsaasWebhookLog.objects.get(webhook_id='evt_tardio')
+        self.assertTrue(log.processed)
+        self.assertIn('reembolsar', log.error_message)
+
+    def test_archives_old_cancelled_sales(self):
+        expire_stale_pending_sales(service=self._asaas())
+        self.assertEqual(archive_cancelled_sales(), 0)
+        Sale.objects.filter(status='cancelled').update(updated_at=timezone.now() - timedelta(days=100))
+
+        self.assertEqual(archive_cancelled_sales(batch_size=1), 2)
+        self.assertEqual(set(Sale.objects.values_list('id', flat=True)), {self.open_sale.id, self.paid_sale.id})
+        self.assertFalse(AsaasPayment.objects.filter(asaas_id='pay_vencido').exists())
+        self.assertFalse(Checkout.objects.filter(asaas_payment_id='pay_vencido').exists())
+
+        archived = list(ArchivedSale.objects.order_by('id'))
+        self.assertEqual([row.id for row in archived], [sale.id for sale in self.stale_cart])
+        self.assertEqual(archived[0].asaas_status, 'PENDING')
+        self.assertEqual(archived[0].asaas_due_date, timezone.localdate() - timedelta(days=10))
+        self.assertEqual(archived[0].course_title_snapshot, 'Curso')
+        self.assertEqual(len({row.checkout_id for row in archived}), 1)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', password='x'))
+        response = client.get('/api/v1/sales/admin/archived/', {'asaas_payment_id': 'pay_vencido'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(response.json()['results'][0]['course_title'], 'Curso')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'payment-status'}},
+    PAYMENT_STATUS_MAX_AGE=15,
+)
+class PaymentStatusTests(TestCase):
+    """A página de sucesso é respondida do estado local; o Asaas só é consultado se ele estiver defasado."""
+
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(
+            title='Curso', description='Descrição', price=50, duration='10h',
+            professor=Professor.objects.create(name='Professor', bio='Bio', specialties='Direito', experience='10 anos'),
+            category=Category.objects.create(name='Categoria', slug='categoria'),
+        )
+        self.sale = Sale.objects.create(
+            student_name='Aluno', email='aluno@example.com', phone='1', course=course, price=50,
+            payment_method='pix', asaas_payment_id='pay_1',
+        )
+        register_checkout([self.sale])
+        self.payment = AsaasPayment.objects.create(
+            sale=self.sale, asaas_id='pay_1', asaas_customer_id='cus_1', payment_type='PIX', value=50,
+            due_date=timezone.localdate(), customer_name='Aluno', customer_email='aluno@example.com',
+        )
+
+    def _make_stale(self):
+        AsaasPayment.objects.filter(pk=self.payment.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+    def _poll(self, remote_status='PENDING'):
+        with mock.patch('sales.views.AsaasService') as service:
+            service.return_value.get_payment_status.return_value = {'status': remote_status}
+            response = APIClient().get(f'/api/v1/sales/{self.sale.id}/payment-status/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), service.return_value
+
+    def test_fresh_local_state_skips_asaas(self):
+        data, service = self._poll()
+        self.assertEqual(data['status'], 'PENDING')
+        service.get_payment_status.assert_not_called()
+
+    def test_stale_local_state_is_refreshed_once(self):
+        self._make_stale()
+        data, service = self._poll('CONFIRMED')
+        self.assertEqual(service.get_payment_status.call_count, 1)
+        self.assertTrue(data['is_paid'])
+        self.assertEqual(AsaasPayment.objects.get().status, 'CONFIRMED')
+        self.assertEqual(Sale.objects.get().status, 'paid')
+
+        data, service = self._poll('CONFIRMED')
+        service.get_payment_status.assert_not_called()
+        self.assertTrue(data['is_paid'])
+
+    def test_webhook_paid_state_grants_once(self):
+        AsaasPayment.objects.filter(pk=self.payment.pk).update(status='RECEIVED')
+        data, service = self._poll()
+        service.get_payment_status.assert_not_called()
+        self.assertTrue(data['is_paid'])
+        self.assertEqual(service._grant_themembers_access_if_needed.call_count, 1)
+
+        Sale.objects.filter(pk=self.sale.pk).update(themembers_access_granted=True)
+        _, service = self._poll()
+        service._grant_themembers_access_if_needed.assert_not_called()
+
+    def test_sale_marked_paid_elsewhere_is_confirmed(self):
+        # Marcada paga pelo admin/reconciliação; o AsaasPayment local ficou PENDING e defasado
+        Sale.objects.filter(pk=self.sale.pk).update(status='paid', themembers_access_granted=True)
+        self._make_stale()
+        data, service = self._poll()
+        service.get_payment_status.assert_not_called()
+        self.assertEqual(data['status'], 'CONFIRMED')
+        self.assertTrue(data['is_paid'])
+
+    def test_concurrent_pollers_share_one_lookup(self):
+        self._make_stale()
+        # Outro poller já obteve a trava e publica o resultado enquanto este aguarda
+        cache.add('asaas:payment-status:pay_1:lock', 1)
+
+        def publish(seconds):
+            cache.set('asaas:payment-status:pay_1', 'RECEIVED')
+
+        with mock.patch('sales.views.time.sleep', side_effect=publish):
+            data, service = self._poll()
+        service.get_payment_status.assert_not_called()
+        self.assertEqual(data['status'], 'RECEIVED')
+
+
+    def test_long_poll_answers_when_webhook_confirms(self):
+        def webhook_arrives(timeout):
+            # O webhook é aplicado (pelo worker) enquanto a requisição aguarda
+            with mock.patch('integration_asas.services.AsaasService._grant_themembers_access_if_needed'), \
+                    self.captureOnCommitCallbacks(execute=True):
+                AsaasService().process_webhook({'id': 'evt_1', 'event': 'PAYMENT_RECEIVED', 'payment': {'id': 'pay_1'}})
+
+        with mock.patch.object(events._broker, 'wait', side_effect=webhook_arrives) as wait, \
+                mock.patch('sales.views.AsaasService') as service:
+            response = APIClient().get(f'/api/v1/sales/{self.sale.id}/payment-status/', {'wait': 10})
+        self.assertEqual(wait.call_count, 1)
+        service.return_value.get_payment_status.assert_not_called()
+        self.assertEqual(response.json()['status'], 'RECEIVED')
+        self.assertTrue(response.json()['is_paid'])
+
+    @override_settings(PAYMENT_STATUS_MAX_WAIT=20)
+    def test_long_poll_wait_is_bounded(self):
+        with mock.patch('sales.views.wait_for_payment', return_value=False) as wait_for_payment:
+            for wait in ('60', 'abc', '0'):
+                with mock.patch('sales.views.AsaasService'):
+                    response = APIClient().get(f'/api/v1/sales/{self.sale.id}/payment-status/', {'wait': wait})
+                self.assertEqual(response.json()['status'], 'PENDING')
+        wait_for_payment.assert_called_once_with('pay_1', 20)
+
+    def test_long_poll_does_not_wait_for_paid_sale(self):
+        Sale.objects.filter(pk=self.sale.pk).update(status='paid', themembers_access_granted=True)
+        with mock.patch('sales.views.wait_for_payment') as wait_for_payment, mock.patch('sales.views.AsaasService'):
+            response = APIClient().get(f'/api/v1/sales/{self.sale.id}/payment-status/', {'wait': 10})
+        wait_for_payment.assert_not_called()
+        self.assertTrue(response.json()['is_paid'])
+
+    def test_confirmation_is_published_once_per_payment(self):
+        with mock.patch('integration_asas.services.publish_payment_confirmed') as publish, \
+                mock.patch('integration_asas.services.AsaasService._grant_themembers_access_if_needed'):
+            for event_id, event in (('evt_1', 'PAYMENT_RECEIVED'), ('evt_2', 'PAYMENT_CONFIRMED')):
+                AsaasService().process_webhook({'id': event_id, 'event': event, 'payment': {'id': 'pay_1'}})
+        publish.assert_called_once_with(['pay_1'])
+        self.assertFalse(events.wait_for_payment('pay_1', 0))
+
+
+def full_scans(queryset):
+    """Tabelas percorridas por inteiro no plano (EXPLAIN) da query."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            # ALL: tabela inteira; index: o índice inteiro
+            return [row['table'] for row in rows if row['type'] in ('ALL', 'index')]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        details = [row[-1] for row in cursor.fetchall()]
+    # SEARCH usa o índice para localizar as linhas; SCAN percorre a tabela (ou o índice) inteira
+    return [match.group(1) for match in (re.match(r'SCAN (\w+)', detail) for detail in details) if match]
+
+
+class SaleQueryPlanTests(TestCase):
+    """As queries quentes do dashboard/estatísticas não podem voltar a varrer a tabela inteira."""
+
+    INDEXES = {
+        'sales_created_id_idx', 'sales_status_created_idx', 'sales_asaas_payment_idx',
+        'sales_email_status_idx', 'sales_course_status_idx',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        statuses = ['paid', 'pending', 'cancelled']
+        Sale.objects.bulk_create([
+            Sale(
+                student_name='Aluno', email=f'aluno{index % 100}@example.com', phone='1', price=10,
+                payment_method='pix', status=statuses[index % 3], asaas_payment_id=f'pay_{index}',
+            )
+            for index in range(300)
+        ])
+        # Estatísticas para o otimizador escolher como em produção
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE TABLE sales_sale' if connection.vendor == 'mysql' else 'ANALYZE')
+
+    def test_declared_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Sale._meta.db_table)
+        self.assertLessEqual(self.INDEXES, set(constraints))
+
+    def test_hot_queries_use_indexes(self):
+        start = timezone.now() - timedelta(days=30)
+        hot_queries = {
+            'vendas pagas no período': Sale.objects.filter(status='paid', created_at__gte=start),
+            'vendas no período': Sale.objects.filter(created_at__gte=start),
+            'alunos únicos': Sale.objects.filter(status='paid').values('email').distinct(),
+            'vendas recentes': Sale.objects.filter(status='paid').order_by('-created_at')[:5],
+            'vendas do pagamento': Sale.objects.filter(asaas_payment_id='pay_1'),
+            'compras do aluno': Sale.objects.filter(email='aluno1@example.com', status='paid'),
+            'vendas do curso': Sale.objects.filter(course_id=1, status='paid'),
+            'conversão por curso': (
+                Sale.objects.filter(course_id__in=[1, 2]).values('course_id')
+                .annotate(paid=Count('id', filter=Q(status='paid')), total=Count('id'))
+            ),
+            'pagamento da venda': AsaasPayment.objects.filter(sale_id=1).order_by('-created_at'),
+            'itens do checkout': CheckoutItem.objects.filter(checkout__items__sale_id=1),
+        }
+        for name, queryset in hot_queries.items():
+            with self.subTest(name):
+                self.assertEqual(full_scans(queryset), [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sales-statistics'}})
+class SalesStatisticsTests(TestCase):
+    """Estatísticas do admin: agregação condicional numa passada e cache por janela de dias."""
+
+    url = '/api/v1/sales/admin/statistics/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='x'))
+        now = timezone.now()
+
+        def sale(days_ago, **kwargs):
+            defaults = {'student_name': 'Aluno', 'email': 'a@example.com', 'phone': '1', 'price': 100,
+                        'payment_method': 'pix', 'status': 'paid', 'course_title_snapshot': 'Curso A'}
+            defaults.update(kwargs)
+            created = Sale.objects.create(**defaults)
+            Sale.objects.filter(pk=created.pk).update(created_at=now - timedelta(days=days_ago))
+            return created
+
+        self.pending = sale(1, status='pending')
+        sale(0)
+        sale(2, email='b@example.com', price=50, payment_method='credit_card', course_title_snapshot='Curso B')
+        sale(20, email='b@example.com', price=30, course_title_snapshot='Curso B')
+        sale(3, status='cancelled')
+        sale(60)  # fora da janela de 30 dias
+
+    def test_statistics_values(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['overview'], {
+            'total_revenue': 180.0, 'total_sales': 3, 'average_ticket': 60.0, 'new_students': 2,
+        })
+        self.assertEqual(data['status_breakdown'], {'paid': 3, 'pending': 1, 'cancelled': 1, 'total': 5})
+        self.assertEqual(
+            [(item['payment_method'], item['count'], item['total']) for item in data['payment_methods']],
+            [('pix', 2, 130.0), ('credit_card', 1, 50.0)],
+        )
+        self.assertEqual(
+            [(item['course_title'], item['count'], item['total']) for item in data['top_courses']],
+            [('Curso A', 1, 100.0), ('Curso B', 2, 80.0)],
+        )
+        self.assertEqual(len(data['daily_trend']), 7)
+        self.assertEqual(sum(day['count'] for day in data['daily_trend']), 2)
+        self.assertEqual(sum(day['total'] for day in data['daily_trend']), 150.0)
+        self.assertEqual(data['status_details'], [{'status': 'paid', 'count': 3, 'total': 180.0}])
+
+    def test_two_queries_then_cached_per_window(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        # Usuário autenticado em memória: só os contadores e a query agrupada
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # Outra janela de dias tem cache próprio
+        data = self.client.get(f'{self.url}?days=90').json()
+        self.assertEqual(data['status_breakdown']['total'], 6)
+
+    def test_status_change_invalidates_cache(self):
+        self.assertEqual(self.client.get(self.url).json()['status_breakdown']['pending'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.status = 'paid'
+            self.pending.save()
+
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['status_breakdown']['pending'], 0)
+        self.assertEqual(data['overview']['total_sales'], 4)
+
+    def test_unrelated_change_keeps_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pending.phone = '2'
+            self.pending.save()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+
+class SaleExportTests(TestCase):
+    """Exportação CSV/XLSX das vendas com os filtros da listagem admin."""
+
+    url = '/api/v1/sales/admin/export/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='x'))
+        for index in range(7):
+            sale = Sale.objects.create(
+                student_name=f'Aluno {index}', email=f'aluno{index}@example.com', phone='1', price=20,
+                payment_method='pix', status='paid' if index % 2 else 'pending',
+                course_title_snapshot='Curso Removido', asaas_payment_id=f'pay_{index}',
+            )
+            register_checkout([sale])
+            AsaasPayment.objects.create(
+                sale=sale, asaas_id=f'pay_{index}', asaas_customer_id='cus', payment_type='PIX',
+                status='RECEIVED' if index % 2 else 'PENDING', value=20, due_date='2030-01-01',
+                customer_name=sale.student_name, customer_email=sale.email,
+            )
+
+    def test_csv_streams_filtered_rows(self):
+        response = self.client.get(f'{self.url}?status=paid')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(tuple(rows[0]), EXPORT_HEADERS)
+        self.assertEqual([row[0] for row in rows[1:]], [str(pk) for pk in Sale.objects.filter(status='paid').order_by('-id').values_list('id', flat=True)])
+        first = dict(zip(EXPORT_HEADERS, rows[1]))
+        self.assertEqual(first['Status'], 'Pago')
+        self.assertEqual(first['Status Asaas'], 'RECEIVED')
+        self.assertEqual(first['Curso'], 'Curso Removido')
+        self.assertTrue(first['Checkout'])
+
+    def test_rows_are_read_in_keyset_batches(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(export_rows(Sale.objects.all(), batch_size=3))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(len(set(row[0] for row in rows)), 7)
+        # 3 + 3 + 1: uma query curta por lote
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    def test_xlsx_export(self):
+        response = self.client.get(f'{self.url}?export_format=xlsx&search=Aluno 3')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+        namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        rows = sheet.findall('.//s:row', namespace)
+        self.assertEqual(len(rows), 2)
+        texts = [node.text for node in rows[1].iter() if node.text]
+        self.assertIn('Aluno 3', texts)
+
+    def test_xlsx_is_sent_while_rows_are_read(self):
+        read = []
+
+        def rows():
+            for index in range(5000):
+                read.append(index)
+                yield (index, f'Aluno {index}', 'x' * 200)
+
+        chunks = iter_xlsx(rows(), chunk_size=16 * 1024)
+        first = next(chunks)
+        # O início do zip sai antes de todas as linhas serem lidas
+        self.assertTrue(first.startswith(b'PK\x03\x04'))
+        self.assertLess(len(read), 5000)
+        workbook = zipfile.ZipFile(io.BytesIO(first + b''.join(chunks)))
+        self.assertIsNone(workbook.testzip())
+        # Cabeçalho + 5000 linhas
+        self.assertEqual(workbook.read('xl/worksheets/sheet1.xml').count(b'<row>'), 5001)
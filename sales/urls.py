@@ -8,6 +8,8 @@ urlpatterns = [
     path('admin/', views.AdminSaleViewSet.as_view(), name='admin-sale-list'),
     path('admin/<int:id>/', views.AdminSaleDetailView.as_view(), name='admin-sale-detail'),
     path('admin/list/', views.AdminSaleListView.as_view(), name='admin-sale-list-simple'),
+    path('admin/export/', views.AdminSaleExportView.as_view(), name='admin-sale-export'),
+    path('admin/archived/', views.AdminArchivedSaleListView.as_view(), name='admin-archived-sale-list'),
     path('admin/statistics/', views.sales_statistics, name='admin-sales-statistics'),
     
     # URLs de Integração Asaas
@@ -8,23 +8,36 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 import json
+import time
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Sum, Count, Avg, Q, F
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.pagination import PageNumberPagination
+from app.pagination import OptInKeysetPagination
 
 from django.shortcuts import render
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Sale
-from .serializers import SaleSerializer, SaleListSerializer
+from .models import Sale, ArchivedSale
+from .serializers import SaleSerializer, SaleListSerializer, SaleCheckoutGroupSerializer, ArchivedSaleSerializer
+from .services import (
+    register_checkout, create_cart_checkout, attach_checkout_payment, discard_checkout,
+    checkout_items, mark_checkout_paid, group_sales_by_checkout,
+)
+from .cache import get_cached_sales_statistics
+from .exports import export_rows, stream_csv, xlsx_response
+from .idempotency import idempotent
+from .events import wait_for_payment
 
 from .models import Sale
 from .serializers import SaleSerializer
 from courses.models import Course
+from integration_asas.models import AsaasPayment
 from integration_asas.services import AsaasService
 from themembers.services import SubscriptionService
 
@@ -38,15 +51,22 @@ class SalesPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class SalesKeysetPagination(OptInKeysetPagination):
+    """SalesPagination ou, com ?pagination=cursor, cursor por (-created_at, -id)"""
+    fallback_class = SalesPagination
+
+
 # Views de Administração (API para /admin do frontend)
 class AdminSaleViewSet(generics.ListCreateAPIView):
     """
     CRUD completo de vendas para o painel admin
     OTIMIZADO: select_related para evitar N+1 queries
+    e paginação por cursor opcional (?pagination=cursor, ver app/pagination.py)
     """
     queryset = Sale.objects.select_related('course').all()
     serializer_class = SaleSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptInKeysetPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['status', 'payment_method', 'course']
     search_fields = ['student_name', 'email']
@@ -69,11 +89,12 @@ class AdminSaleListView(generics.ListAPIView):
     """
     Lista de vendas para o painel admin (versão simplificada) com paginação
     OTIMIZADO: select_related para evitar N+1 queries
+    e paginação por cursor opcional (?pagination=cursor, ver app/pagination.py)
     """
     queryset = Sale.objects.select_related('course').all()
     serializer_class = SaleListSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = SalesPagination
+    pagination_class = SalesKeysetPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['status', 'payment_method', 'course']
     search_fields = ['student_name', 'email']
@@ -89,198 +110,67 @@ class AdminSaleListView(generics.ListAPIView):
             if not group_by_payment:
                 return super().list(request, *args, **kwargs)
 
-            # Constrói grupos por asaas_payment_id (ou id individual)
-            sales = queryset.order_by('-created_at')
-            groups = {}
-            for s in sales:
-                key = s.asaas_payment_id or f"sale_{s.id}"
-                group = groups.get(key)
-                if group is None:
-                    course_title = s.course.title if s.course else (s.course_title_snapshot or 'Curso removido')
-                    groups[key] = {
-                        'sales': [s],
-                        'latest': s.created_at,
-                        'max_price': float(s.price),
-                        'course_titles': [course_title],
-                        'main_sale': s,
-                    }
-                else:
-                    group['sales'].append(s)
-                    if s.created_at > group['latest']:
-                        group['latest'] = s.created_at
-                    course_title = s.course.title if s.course else (s.course_title_snapshot or 'Curso removido')
-                    group['course_titles'].append(course_title)
-                    price_val = float(s.price)
-                    if price_val > group['max_price']:
-                        group['max_price'] = price_val
-                        group['main_sale'] = s
-
-            # Converte grupos em itens agregados
-            items = []
-            for group in groups.values():
-                s = group['main_sale']
-                if len(group['course_titles']) > 1:
-                    course_title = f"Carrinho: {group['course_titles'][0]} + {len(group['course_titles']) - 1} outros"
-                else:
-                    course_title = s.course.title if s.course else (s.course_title_snapshot or 'Curso removido')
-
-                items.append({
-                    'id': s.id,
-                    'student_name': s.student_name,
-                    'email': s.email,
-                    'phone': s.phone,
-                    'course_title': course_title,
-                    'price': group['max_price'],
-                    'payment_method': s.payment_method,
-                    'status': s.status,
-                    'created_at': group['latest'],
-                })
-
-            # Ordena por data do checkout
-            items.sort(key=lambda x: x['created_at'], reverse=True)
-
-            page = self.paginate_queryset(items)
-            if page is not None:
-                return self.get_paginated_response(page)
-            return Response(items)
+            # Agrupa por checkout no banco: só a página de grupos é materializada.
+            # O cursor (-created_at, -id) não se aplica aos grupos: sempre por número de página
+            groups = group_sales_by_checkout(queryset)
+            paginator = SalesPagination()
+            page = paginator.paginate_queryset(groups, request, view=self)
+            serializer = SaleCheckoutGroupSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         except Exception as e:
             return Response({'error': f'Erro ao listar vendas: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class AdminSaleExportView(AdminSaleListView):
+    """
+    Exporta as vendas filtradas (mesmos filtros da listagem admin) com pagamento Asaas,
+    checkout e título do curso, em CSV (padrão) ou XLSX (?export_format=xlsx).
+    OTIMIZADO: lê em lotes por keyset e envia enquanto gera (ver sales/exports.py)
+    """
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = export_rows(queryset)
+        filename = f"vendas-{timezone.localtime().strftime('%Y%m%d-%H%M%S')}"
+        if request.query_params.get('export_format') == 'xlsx':
+            return xlsx_response(rows, filename)
+        return stream_csv(rows, filename)
+
+
+class AdminArchivedSaleListView(generics.ListAPIView):
+    """
+    Vendas arquivadas (canceladas antigas, ver sales/archive.py), consultadas sob demanda
+    fora da tabela de vendas
+    """
+    queryset = ArchivedSale.objects.select_related('course').all()
+    serializer_class = ArchivedSaleSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = SalesPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['payment_method', 'course', 'asaas_payment_id']
+    search_fields = ['student_name', 'email']
+    ordering_fields = ['created_at', 'archived_at', 'price']
+    ordering = ['-created_at']
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sales_statistics(request):
     """
     Retorna estatísticas agregadas de vendas para o dashboard admin
+    OTIMIZADO: uma query de agregação condicional para os contadores e uma query
+    agrupada para as quebras (método, curso e dia), na mesma faixa do índice de
+    created_at; o resultado fica em cache por janela de dias (ver sales/cache.py)
     """
     try:
         # Filtros de data (opcional)
         days_filter = request.query_params.get('days', '30')
         try:
             days = int(days_filter)
-            start_date = timezone.now() - timedelta(days=days)
         except ValueError:
             days = 30
-            start_date = timezone.now() - timedelta(days=days)
-        
-        # Base queryset com filtro de data - APENAS VENDAS PAGAS
-        base_queryset = Sale.objects.filter(
-            created_at__gte=start_date,
-            status='paid'  # ← CORREÇÃO: Só vendas pagas
-        )
-        
-        # Estatísticas gerais
-        total_sales = base_queryset.aggregate(
-            total=Sum('price'),
-            count=Count('id')
-        )
-        
-        # Vendas por status (apenas para referência, mas base_queryset já é só 'paid')
-        status_stats = base_queryset.values('status').annotate(
-            count=Count('id'),
-            total=Sum('price')
-        )
-        
-        # Vendas por método de pagamento
-        payment_stats = base_queryset.values('payment_method').annotate(
-            count=Count('id'),
-            total=Sum('price')
-        )
-        
-        # Vendas por curso (suporta curso excluído via snapshot)
-        course_stats = (
-            base_queryset
-            .annotate(course_title=Coalesce(F('course__title'), F('course_title_snapshot')))
-            .values('course_title')
-            .annotate(
-                count=Count('id'),
-                total=Sum('price')
-            )
-            .order_by('-total')[:5]  # Top 5 cursos
-        )
-        
-        # Vendas por dia (últimos 7 dias) - OTIMIZADO: query única
-        from django.db.models.functions import TruncDate
-        
-        seven_days_ago = timezone.now() - timedelta(days=6)
-        daily_data = (
-            base_queryset.filter(created_at__gte=seven_days_ago)
-            .annotate(day=TruncDate('created_at'))
-            .values('day')
-            .annotate(
-                count=Count('id'),
-                total=Sum('price')
-            )
-            .order_by('day')
-        )
-        
-        # Cria dicionário para lookup
-        daily_dict = {
-            item['day']: {
-                'count': item['count'],
-                'total': float(item['total'] or 0)
-            }
-            for item in daily_data
-        }
-        
-        # Preenche todos os 7 dias
-        daily_stats = []
-        for i in range(7):
-            date = (timezone.now() - timedelta(days=6-i)).date()
-            day_data = daily_dict.get(date, {'count': 0, 'total': 0})
-            
-            daily_stats.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'count': day_data['count'],
-                'total': day_data['total']
-            })
-        
-        # Cálculos derivados
-        total_revenue = float(total_sales['total'] or 0)
-        total_count = total_sales['count'] or 0
-        average_ticket = total_revenue / total_count if total_count > 0 else 0
-        
-        # Status específicos - APENAS PAGAS
-        paid_sales = base_queryset.count()  # base_queryset já é só 'paid'
-        pending_sales = Sale.objects.filter(
-            created_at__gte=start_date,
-            status='pending'
-        ).count()
-        cancelled_sales = Sale.objects.filter(
-            created_at__gte=start_date,
-            status='cancelled'
-        ).count()
-        
-        # Total de vendas no período (para comparação)
-        total_sales_period = Sale.objects.filter(created_at__gte=start_date).count()
-        
-        # Novos alunos (vendas únicas por email) - APENAS PAGOS
-        new_students = base_queryset.values('email').distinct().count()
-        
-        response_data = {
-            'period': {
-                'days': days,
-                'start_date': start_date.isoformat(),
-                'end_date': timezone.now().isoformat()
-            },
-            'overview': {
-                'total_revenue': total_revenue,
-                'total_sales': total_count,
-                'average_ticket': round(average_ticket, 2),
-                'new_students': new_students
-            },
-            'status_breakdown': {
-                'paid': paid_sales,
-                'pending': pending_sales,
-                'cancelled': cancelled_sales,
-                'total': total_sales_period
-            },
-            'payment_methods': list(payment_stats),
-            'top_courses': list(course_stats),
-            'daily_trend': daily_stats,
-            'status_details': list(status_stats)
-        }
-        
+
+        response_data = get_cached_sales_statistics(days, lambda: _build_sales_statistics(days))
         return Response(response_data, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -289,8 +179,108 @@ def sales_statistics(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _build_sales_statistics(days):
+    from django.db.models import Case, DateField, When
+    from django.db.models.functions import TruncDate
+
+    now = timezone.now()
+    start_date = now - timedelta(days=days)
+    seven_days_ago = now - timedelta(days=6)
+    period_sales = Sale.objects.filter(created_at__gte=start_date)
+    paid = Q(status='paid')
+
+    # Contadores do período numa única passada - APENAS PAGAS nas métricas de receita
+    totals = period_sales.aggregate(
+        revenue=Sum('price', filter=paid),
+        paid=Count('id', filter=paid),
+        pending=Count('id', filter=Q(status='pending')),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+        total=Count('id'),
+        new_students=Count('email', filter=paid, distinct=True),
+    )
+
+    # Quebras das vendas pagas: uma linha por (método, curso, dia dos últimos 7 dias)
+    breakdown = (
+        period_sales.filter(paid)
+        .annotate(
+            course_title=Coalesce(F('course__title'), F('course_title_snapshot')),
+            day=Case(
+                When(created_at__gte=seven_days_ago, then=TruncDate('created_at')),
+                output_field=DateField(),
+            ),
+        )
+        .values('payment_method', 'course_title', 'day')
+        .annotate(count=Count('id'), total=Sum('price'))
+        .order_by()
+    )
+
+    payment_totals, course_totals, daily_dict = {}, {}, {}
+    for row in breakdown:
+        for groups, key in ((payment_totals, row['payment_method']), (course_totals, row['course_title'])):
+            group = groups.setdefault(key, {'count': 0, 'total': 0})
+            group['count'] += row['count']
+            group['total'] += row['total']
+        if row['day'] is not None:
+            day = daily_dict.setdefault(row['day'], {'count': 0, 'total': 0})
+            day['count'] += row['count']
+            day['total'] += float(row['total'] or 0)
+
+    payment_stats = [
+        {'payment_method': method, **values}
+        for method, values in sorted(payment_totals.items(), key=lambda item: item[1]['total'], reverse=True)
+    ]
+    # Top 5 cursos (suporta curso excluído via snapshot)
+    course_stats = [
+        {'course_title': title, **values}
+        for title, values in sorted(course_totals.items(), key=lambda item: item[1]['total'], reverse=True)[:5]
+    ]
+
+    # Preenche todos os 7 dias
+    daily_stats = []
+    for i in range(7):
+        date = (now - timedelta(days=6-i)).date()
+        day_data = daily_dict.get(date, {'count': 0, 'total': 0})
+        daily_stats.append({
+            'date': date.strftime('%Y-%m-%d'),
+            'count': day_data['count'],
+            'total': day_data['total']
+        })
+
+    # Cálculos derivados
+    total_revenue = float(totals['revenue'] or 0)
+    total_count = totals['paid']
+    average_ticket = total_revenue / total_count if total_count > 0 else 0
+
+    return {
+        'period': {
+            'days': days,
+            'start_date': start_date.isoformat(),
+            'end_date': now.isoformat()
+        },
+        'overview': {
+            'total_revenue': total_revenue,
+            'total_sales': total_count,
+            'average_ticket': round(average_ticket, 2),
+            'new_students': totals['new_students']
+        },
+        'status_breakdown': {
+            'paid': totals['paid'],
+            'pending': totals['pending'],
+            'cancelled': totals['cancelled'],
+            'total': totals['total']
+        },
+        'payment_methods': payment_stats,
+        'top_courses': course_stats,
+        'daily_trend': daily_stats,
+        'status_details': (
+            [{'status': 'paid', 'count': totals['paid'], 'total': totals['revenue']}] if totals['paid'] else []
+        )
+    }
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def create_sale_and_redirect(request):
     """Cria uma venda e redireciona para checkout Asaas"""
     try:
@@ -366,6 +356,9 @@ def create_sale_and_redirect(request):
                 sale.save()
             except Exception:
                 pass
+
+        # Registra o pedido (checkout) com o item da venda
+        checkout = register_checkout([sale])
         
         # Cria pagamento no Asaas
         asaas_service = AsaasService()
@@ -373,17 +366,20 @@ def create_sale_and_redirect(request):
         asaas_payment = asaas_service.create_payment(sale, payment_method, installment_count=installment_count)
         
         if not asaas_payment:
-            # Se falhar, deleta a venda e retorna erro
+            # Se falhar, deleta o checkout e a venda e retorna erro
             print(f"DEBUG: Falha ao criar pagamento, deletando venda {sale.id}")
+            checkout.delete()
             sale.delete()
             return Response({
                 'error': 'Erro ao criar pagamento no Asaas'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         print(f"DEBUG: Pagamento criado com sucesso: {asaas_payment.asaas_id}")
-        # Vincula o pagamento ASAAS à venda para futuras consultas
+        # Vincula o pagamento ASAAS à venda e ao checkout para futuras consultas
         sale.asaas_payment_id = asaas_payment.asaas_id
         sale.save()
+        checkout.asaas_payment_id = asaas_payment.asaas_id
+        checkout.save(update_fields=['asaas_payment_id', 'updated_at'])
         
         # Retorna dados para redirecionamento
         response_data = {
@@ -445,6 +441,7 @@ def create_sale_and_redirect(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent
 def create_cart_sale_and_redirect(request):
     """Cria uma venda unificada para múltiplos cursos do carrinho e redireciona para checkout Asaas"""
     try:
@@ -468,10 +465,9 @@ def create_cart_sale_and_redirect(request):
                 'error': 'Lista de cursos inválida'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Calcula valor total do carrinho
-        total_amount = 0
-        courses_to_process = []
-        
+        # Valida os itens e busca todos os cursos numa única query
+        course_ids = []
+        course_prices = []
         for course_data in courses_data:
             course_id = course_data.get('id')
             course_price = course_data.get('price')
@@ -480,15 +476,23 @@ def create_cart_sale_and_redirect(request):
                 return Response({
                     'error': 'Dados do curso inválidos'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            
             try:
-                course = Course.objects.get(id=course_id)
-                courses_to_process.append(course)
-                total_amount += float(course_price)
-            except Course.DoesNotExist:
+                course_ids.append(int(course_id))
+                course_prices.append(float(course_price))
+            except (TypeError, ValueError):
                 return Response({
-                    'error': f'Curso com ID {course_id} não encontrado'
-                }, status=status.HTTP_404_NOT_FOUND)
+                    'error': 'Dados do curso inválidos'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        courses_by_id = Course.objects.in_bulk(course_ids)
+        missing = [course_id for course_id in course_ids if course_id not in courses_by_id]
+        if missing:
+            return Response({
+                'error': f'Curso com ID {missing[0]} não encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        courses_to_process = [courses_by_id[course_id] for course_id in course_ids]
+        # Calcula valor total do carrinho
+        total_amount = sum(course_prices)
         
         # Se alguma forma de pagamento não for permitida em algum curso, bloqueia
         for c in courses_to_process:
@@ -501,72 +505,50 @@ def create_cart_sale_and_redirect(request):
             if payment_method not in allowed or not allowed[payment_method]:
                 return Response({'error': f'Forma de pagamento não permitida para o curso {c.title}'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Cria uma venda principal para o carrinho
-        main_sale = Sale.objects.create(
-            course=courses_to_process[0],  # Curso principal para referência
-            student_name=student_name,
-            email=email,
-            phone=phone,
-            cpf_cnpj=cpf_cnpj,
-            price=total_amount,  # Valor total do carrinho
-            payment_method=payment_method,
-            status='pending'
-        )
-
+        installments = None
         if payment_method == 'bank_slip_installments':
             try:
                 # Usa o menor máximo entre os cursos
                 max_allowed = min([getattr(c, 'max_boleto_installments', 12) or 12 for c in courses_to_process])
                 installments = int(installment_count or max_allowed)
-                main_sale.bank_slip_installment_count = installments
-                main_sale.bank_slip_installment_value = float(main_sale.price) / installments
-                main_sale.save()
-            except Exception:
-                pass
-        
-        # Cria vendas relacionadas para cada curso (para rastreamento)
-        related_sales = []
-        # ✅ Evita duplicar o primeiro curso (que já está na venda principal)
-        for course in courses_to_process[1:]:
-            related_sale = Sale.objects.create(
-                course=course,
-                student_name=student_name,
-                email=email,
-                phone=phone,
-                cpf_cnpj=cpf_cnpj,
-                price=course.price,  # Preço individual do curso
-                payment_method=payment_method,
-                status='pending',
-                # ✅ Todas as vendas relacionadas compartilham o mesmo asaas_payment_id
-                asaas_payment_id=f"cart_{main_sale.id}"
-            )
-            related_sales.append(related_sale)
+            except (TypeError, ValueError):
+                installments = None
+
+        # OTIMIZADO: venda principal (curso principal para referência, valor total do carrinho)
+        # e vendas relacionadas de cada curso (rastreamento) num único INSERT em lote,
+        # junto com o checkout, numa transação
+        sales, checkout = create_cart_checkout(
+            courses_to_process,
+            prices=course_prices,
+            total=total_amount,
+            payment_method=payment_method,
+            buyer={'student_name': student_name, 'email': email, 'phone': phone, 'cpf_cnpj': cpf_cnpj},
+            installment_count=installments,
+        )
+        main_sale, related_sales = sales[0], sales[1:]
         
         # Cria pagamento no Asaas com valor total
         asaas_service = AsaasService()
         print(f"DEBUG: Criando pagamento de carrinho para venda {main_sale.id} com valor total {total_amount}")
-        asaas_payment = asaas_service.create_payment(main_sale, payment_method, installment_count=installment_count)
+        try:
+            asaas_payment = asaas_service.create_payment(main_sale, payment_method, installment_count=installment_count)
+        except Exception as e:
+            # Exceção tem o mesmo destino que a falha: as vendas não ficam com a marca provisória do lote
+            print(f"DEBUG: Erro ao criar pagamento de carrinho: {e}")
+            asaas_payment = None
         
         if not asaas_payment:
             # Se falhar, deleta todas as vendas e retorna erro
             print(f"DEBUG: Falha ao criar pagamento, deletando vendas do carrinho")
-            main_sale.delete()
-            for sale in related_sales:
-                sale.delete()
+            discard_checkout(sales, checkout)
             return Response({
                 'error': 'Erro ao criar pagamento no Asaas'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         print(f"DEBUG: Pagamento de carrinho criado com sucesso: {asaas_payment.asaas_id}")
         
-        # Vincula o pagamento ASAAS à venda principal
-        main_sale.asaas_payment_id = asaas_payment.asaas_id
-        main_sale.save()
-        
-        # Atualiza as vendas relacionadas com o ID do pagamento principal
-        for sale in related_sales:
-            sale.asaas_payment_id = asaas_payment.asaas_id
-            sale.save()
+        # Vincula o pagamento ASAAS a todas as vendas do carrinho (um UPDATE) e ao checkout
+        attach_checkout_payment(sales, checkout, asaas_payment.asaas_id)
         
         # Retorna dados para redirecionamento
         response_data = {
@@ -630,17 +612,92 @@ def create_cart_sale_and_redirect(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+PAID_ASAAS_STATUSES = ('RECEIVED', 'CONFIRMED', 'RECEIVED_IN_CASH')
+# Status que não mudam mais sem um webhook (pago ou estornado): não há o que consultar
+FINAL_ASAAS_STATUSES = PAID_ASAAS_STATUSES + ('REFUNDED',)
+
+
+def _current_payment_status(sale, payment):
+    """
+    Status Asaas do pagamento da venda para a página de sucesso (que faz polling).
+    Venda já paga (webhook, admin ou reconciliação) responde como paga, mesmo que o
+    AsaasPayment local esteja defasado. Senão usa o AsaasPayment local se o status é
+    final ou se foi atualizado (webhook ou consulta anterior) há menos de
+    PAYMENT_STATUS_MAX_AGE segundos; senão consulta o Asaas. Retorna None se o Asaas
+    não responder.
+    """
+    if sale.status == 'paid':
+        return payment.status if payment and payment.status in PAID_ASAAS_STATUSES else 'CONFIRMED'
+    max_age = getattr(settings, 'PAYMENT_STATUS_MAX_AGE', 15)
+    if payment and (
+        payment.status in FINAL_ASAAS_STATUSES
+        or payment.updated_at >= timezone.now() - timedelta(seconds=max_age)
+    ):
+        return payment.status
+    return _fetch_payment_status(sale.asaas_payment_id, payment, max_age)
+
+
+def _fetch_payment_status(payment_id, payment, max_age):
+    """
+    Consulta o status no Asaas com coalescência entre pollers (de qualquer worker):
+    só quem obtém a trava no cache chama a API; os demais aguardam o resultado gravado
+    no cache. O AsaasPayment local é atualizado, respondendo os próximos polls localmente.
+    """
+    result_key = f'asaas:payment-status:{payment_id}'
+    lock_key = f'{result_key}:lock'
+    remote_status = cache.get(result_key)
+    if remote_status:
+        return remote_status
+
+    if cache.add(lock_key, 1, timeout=getattr(settings, 'PAYMENT_STATUS_LOCK_TIMEOUT', 10)):
+        try:
+            payment_status = AsaasService().get_payment_status(payment_id)
+            if not payment_status:
+                return None
+            remote_status = payment_status.get('status') or (payment.status if payment else None)
+            if remote_status:
+                cache.set(result_key, remote_status, max_age)
+            if payment:
+                AsaasPayment.objects.filter(pk=payment.pk).update(status=remote_status, updated_at=timezone.now())
+            return remote_status
+        finally:
+            cache.delete(lock_key)
+
+    # Outro poller já está consultando este pagamento: aguarda o resultado dele
+    deadline = time.monotonic() + getattr(settings, 'PAYMENT_STATUS_COALESCE_WAIT', 3)
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        remote_status = cache.get(result_key)
+        if remote_status:
+            return remote_status
+        if cache.get(lock_key) is None:
+            # A consulta terminou sem resultado
+            break
+    return payment.status if payment else None
+
+
+def _requested_wait(request):
+    """Segundos de long-poll pedidos em ?wait=, limitados a PAYMENT_STATUS_MAX_WAIT (0 = sem espera)."""
+    try:
+        wait = int(request.query_params.get('wait', 0))
+    except (TypeError, ValueError):
+        return 0
+    return max(0, min(wait, getattr(settings, 'PAYMENT_STATUS_MAX_WAIT', 20)))
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_payment_status(request, sale_id):
-    """Consulta status de pagamento de uma venda"""
+    """
+    Consulta status de pagamento de uma venda. Com ?wait=<s> (long-poll) aguarda até
+    s segundos a confirmação do pagamento antes de responder.
+    """
     try:
         sale = get_object_or_404(Sale, id=sale_id)
         
         if not sale.asaas_payment_id:
             # Tenta recuperar a partir do registro de pagamento local
             try:
-                from integration_asas.models import AsaasPayment
                 payment_obj = AsaasPayment.objects.filter(sale=sale).order_by('-created_at').first()
                 if payment_obj:
                     sale.asaas_payment_id = payment_obj.asaas_id
@@ -650,21 +707,25 @@ def get_payment_status(request, sale_id):
             except Exception:
                 return Response({'error': 'Venda não possui pagamento Asaas'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Consulta status no Asaas
-        asaas_service = AsaasService()
-        payment_status = asaas_service.get_payment_status(sale.asaas_payment_id)
-        
-        if payment_status:
-            status_str = payment_status.get('status', sale.status)
-
+        # OTIMIZADO: responde do estado local (atualizado pelos webhooks) e só consulta o
+        # Asaas quando ele está defasado, uma consulta por pagamento entre pollers simultâneos
+        payment = AsaasPayment.objects.filter(asaas_id=sale.asaas_payment_id).first()
+        wait = _requested_wait(request)
+        if wait and sale.status != 'paid' and not (payment and payment.status in FINAL_ASAAS_STATUSES):
+            # Long-poll: responde assim que o webhook confirmar, sem a página repetir o polling
+            if wait_for_payment(sale.asaas_payment_id, wait):
+                sale.refresh_from_db()
+                payment = AsaasPayment.objects.filter(asaas_id=sale.asaas_payment_id).first()
+        status_str = _current_payment_status(sale, payment)
+        
+        if status_str:
             # Se o Asaas indicar pago e ainda não marcamos/entregamos acesso, faça agora
-            if status_str in ('RECEIVED', 'CONFIRMED'):
-                updated = False
+            if status_str in PAID_ASAAS_STATUSES and (sale.status != 'paid' or not sale.themembers_access_granted):
                 if sale.status != 'paid':
                     sale.status = 'paid'
-                    updated = True
-                if updated:
                     sale.save()
+                # Demais vendas do mesmo checkout (carrinho)
+                mark_checkout_paid(sale)
 
                 # Concede acesso TheMembers para todos os produtos vinculados (curso + carrinho)
                 try:
@@ -681,27 +742,19 @@ def get_payment_status(request, sale_id):
                 'cpf_cnpj': sale.cpf_cnpj or ''
             }
 
-            # Buscar links do WhatsApp dos cursos comprados
-            whatsapp_links = []
-            if sale.course:
-                # Venda individual
-                if sale.course.whatsapp_group_link:
-                    whatsapp_links.append({
-                        'course_title': sale.course.title,
-                        'whatsapp_link': sale.course.whatsapp_group_link
-                    })
-            else:
-                # Venda de carrinho - buscar todos os cursos
-                from courses.models import Course
-                cart_courses = Course.objects.filter(
-                    themembers_product_id__in=sale.cart_courses.split(',') if sale.cart_courses else []
-                )
-                for course in cart_courses:
-                    if course.whatsapp_group_link:
-                        whatsapp_links.append({
-                            'course_title': course.title,
-                            'whatsapp_link': course.whatsapp_group_link
-                        })
+            # Buscar links do WhatsApp dos cursos comprados (itens do checkout, num único JOIN)
+            courses = [item.course for item in checkout_items(sale) if item.course]
+            if not courses and sale.course:
+                # Venda sem checkout (criada pelo admin)
+                courses = [sale.course]
+            whatsapp_links = [
+                {
+                    'course_title': course.title,
+                    'whatsapp_link': course.whatsapp_group_link
+                }
+                for course in courses
+                if course.whatsapp_group_link
+            ]
 
             return Response({
                 'sale_id': sale.id,
@@ -709,7 +762,7 @@ def get_payment_status(request, sale_id):
                 'status': status_str,
                 'payment_method': sale.payment_method,
                 'value': float(sale.price),
-                'is_paid': sale.status == 'paid' or status_str in ('RECEIVED', 'CONFIRMED'),
+                'is_paid': sale.status == 'paid' or status_str in PAID_ASAAS_STATUSES,
                 'buyer': buyer,
                 'whatsapp_groups': whatsapp_links,
                 'themembers': {
@@ -728,3 +781,4 @@ def get_payment_status(request, sale_id):
         return Response({
             'error': f'Erro interno: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
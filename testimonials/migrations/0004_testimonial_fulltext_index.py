@@ -0,0 +1,33 @@
+# Generated manually for indexed full-text search (courses/search.py)
+
+from django.db import migrations
+
+
+def add_fulltext_index(apps, schema_editor):
+    # FULLTEXT só existe no MySQL; nos demais bancos a busca usa índice em memória
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    # utf8mb4_unicode_ci: busca insensível a acentos (como courses_course, ver courses 0016)
+    schema_editor.execute(
+        "ALTER TABLE testimonials_testimonial CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+    )
+    schema_editor.execute(
+        "CREATE FULLTEXT INDEX testimonials_testimonial_search_ft ON testimonials_testimonial (name, testimonial);"
+    )
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("DROP INDEX testimonials_testimonial_search_ft ON testimonials_testimonial;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testimonials', '0003_testimonial_video_testimonial_video_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
@@ -2,21 +2,27 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from courses.cache import ConditionalGetMixin
+from courses.search import FullTextSearchFilter
 from .models import Testimonial
 from .serializers import TestimonialSerializer, TestimonialListSerializer, TestimonialCreateUpdateSerializer
 
 
 # Views Públicas (API)
-class TestimonialListView(generics.ListAPIView):
+class TestimonialListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Lista depoimentos aprovados
+    Busca (?search=) indexada e ordenada por relevância (ver courses/search.py)
+    Suporta GET condicional (ETag/Last-Modified -> 304)
     """
+    conditional_uses_catalog = True  # embute dados do curso
     queryset = Testimonial.objects.filter(status='approved')
     serializer_class = TestimonialListSerializer
     permission_classes = [AllowAny]  # Acesso público
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['course', 'year']
     search_fields = ['name', 'testimonial']
+    search_weights = {'name': 2}
     ordering_fields = ['rating', 'year', 'created_at']
     ordering = ['-created_at']
 
@@ -48,6 +48,10 @@ class Command(BaseCommand):
             if not options['skip_migrations']:
                 self.stdout.write('📦 Executando migrações...')
                 call_command('migrate', verbosity=1)
+                # Tabela do DatabaseCache (cache do catálogo público)
+                call_command('createcachetable', verbosity=1)
+                # Snapshots dos cursos refletem os serializers da versão implantada
+                call_command('rebuild_course_snapshots', verbosity=1)
                 self.stdout.write(
                     self.style.SUCCESS('✅ Migrações concluídas')
                 )
@@ -71,7 +75,15 @@ class Command(BaseCommand):
             else:
                 self.stdout.write('⏭️ Pulando sincronização...')
             
-            # PASSO 4: Verificar integridade
+            # PASSO 4: Processar os webhooks do Asaas que chegaram durante o deploy
+            # (o worker process_asaas_webhooks é uma tarefa always-on, reiniciada após o deploy)
+            self.stdout.write('💳 Processando fila de webhooks do Asaas...')
+            call_command('process_asaas_webhooks', '--once', verbosity=1)
+            self.stdout.write(
+                self.style.SUCCESS('✅ Fila de webhooks processada')
+            )
+            
+            # PASSO 5: Verificar integridade
             self.stdout.write('🔍 Verificando integridade do sistema...')
             call_command('check', verbosity=1)
             self.stdout.write(
@@ -94,6 +106,11 @@ class Command(BaseCommand):
             self.stdout.write(f'   • Tempo total: {duration.total_seconds():.1f}s')
             self.stdout.write(f'   • Data/Hora: {end_time.strftime("%d/%m/%Y %H:%M:%S")}')
             
+            self.stdout.write(
+                '\n⚠️ Reinicie a always-on task do worker (python manage.py process_asaas_webhooks) e '
+                'confira os cron jobs do asaas_tasks.sh (ver SETUP_THEMEMBERS_SYNC.txt)'
+            )
+            
             if not options['skip_sync']:
                 # Mostrar produtos sincronizados
                 try: